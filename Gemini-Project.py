@@ -1,34 +1,53 @@
 import sys
 import os
-import shutil
 import sqlite3
-import pandas as pd
 
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
-    QLineEdit, QLabel, QTextEdit, QTableWidget, QTableWidgetItem,
+    QLineEdit, QLabel, QTextEdit, QTableView, QAbstractItemView,
     QFileDialog, QMessageBox, QHeaderView, QDialog, QScrollArea
 )
-from PyQt5.QtGui import QPixmap, QImage
 from PyQt5.QtCore import Qt
 
-import fitz  # PyMuPDF
-import matplotlib.pyplot as plt
+from book_model import CatalogEvents, SqlTableModel
+from checkout import GEMINI_SALES, OutOfStock, apply_basket
+from document_pool import document_pool
+from pdf_ingest import IngestJob
+from pdf_storage import PdfStorage
+from page_cache import PagePrefetcher, neighbour_pages, page_cache
+from pdf_render import fit_zoom, render_pixmap, zoom_changed
+from render_pool import shutdown_shared_pool
+from migrations import GEMINI_MIGRATIONS, migrate
+from queries import GEMINI_EXPORT, GEMINI_EXPORT_COUNT, GEMINI_PIVOTS, GEMINI_STATS
+from repository import Database
+from sales_export import FILE_FILTER, ExportError, ExportJob, report_sheets, with_extension
+from search_index import init_search_index, search_books
+from search_worker import BookSearch
+from stats_dashboard import BarPanel, StatsDashboard
+from stats_service import StatsService
+from text_index import TextHitsDialog, TextIndexer, init_text_index, search_text
+from thumbnail_store import COVER_SIZE, CoverLoader
+from write_queue import MainThreadCallbacks, WriteQueue
 
 DB_NAME = 'books.db'
 PDF_DIR = 'pdfs'
+BOOK_COLUMNS = ('id', 'title', 'author', 'price', 'description', 'quantity')
 
 
 class PDFViewer(QDialog):
-    def __init__(self, pdf_path):
+    def __init__(self, pdf_path, page=0):
         super().__init__()
         self.setWindowTitle("Чтение книги")
         self.setMinimumSize(800, 1000)
 
         self.pdf_path = pdf_path
-        self.doc = fitz.open(pdf_path)
+        # Недавно открытые книги берутся из пула уже разобранными
+        self.doc = document_pool.acquire(pdf_path)
         self.total_pages = len(self.doc)
-        self.current_page = 0
+        # Книга может открываться сразу на странице, найденной поиском по тексту
+        self.current_page = min(max(page, 0), self.total_pages - 1)
+        # Масштаб подбирается по ширине окна и плотности пикселей экрана при первом показе
+        self.zoom = None
 
         self.layout = QVBoxLayout()
 
@@ -55,18 +74,52 @@ class PDFViewer(QDialog):
         self.layout.addLayout(self.nav_layout)
         self.setLayout(self.layout)
 
-        self.render_page()
+        # Соседние страницы рендерятся заранее в фоновом потоке
+        self.prefetcher = PagePrefetcher(pdf_path, 1, self)
+        self.prefetcher.page_rendered.connect(self.on_page_prefetched)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.update_zoom()
+
+    def update_zoom(self):
+        # Страница вписывается по ширине с запасом под вертикальную полосу прокрутки;
+        # перерисовка только при заметном изменении масштаба
+        width = self.scroll_area.viewport().width() - self.scroll_area.verticalScrollBar().sizeHint().width()
+        zoom = fit_zoom(self.doc.load_page(self.current_page).rect, width,
+                        device_ratio=self.devicePixelRatioF())
+        if zoom_changed(self.zoom, zoom):
+            self.zoom = zoom
+            self.prefetcher.set_zoom(zoom)
+            self.render_page()
 
     def render_page(self):
-        page = self.doc.load_page(self.current_page)
-        pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-        img = QImage(pix.samples, pix.width, pix.height, pix.stride, QImage.Format_RGB888)
-        pixmap = QPixmap.fromImage(img)
+        key = (self.pdf_path, self.current_page, self.zoom)
+        pixmap = page_cache.get(key)
+        if pixmap is None:
+            pixmap = render_pixmap(self.doc, self.current_page, self.zoom, self.devicePixelRatioF())
+            page_cache.put(key, pixmap)
         self.image_label.setPixmap(pixmap)
         self.page_info.setText(f"Страница {self.current_page + 1} / {self.total_pages}")
         self.prev_btn.setEnabled(self.current_page > 0)
         self.next_btn.setEnabled(self.current_page < self.total_pages - 1)
 
+        self.prefetcher.request(
+            page_num for page_num in neighbour_pages(self.current_page, self.total_pages)
+            if (self.pdf_path, page_num, self.zoom) not in page_cache
+        )
+
+    def on_page_prefetched(self, key, rendered):
+        if key not in page_cache:
+            page_cache.put(key, rendered.to_pixmap(self.devicePixelRatioF()))
+
+    def done(self, result):
+        self.prefetcher.stop()
+        if self.doc is not None:
+            document_pool.release(self.doc)
+            self.doc = None
+        super().done(result)
+
     def show_prev_page(self):
         if self.current_page > 0:
             self.current_page -= 1
@@ -87,11 +140,45 @@ class LibraryApp(QWidget):
         if not os.path.exists(PDF_DIR):
             os.makedirs(PDF_DIR)
 
-        self.conn = sqlite3.connect(DB_NAME)
+        # PDF хранятся по SHA-256 содержимого, одинаковые файлы - в одном экземпляре
+        self.pdf_storage = PdfStorage(PDF_DIR)
+        self.db = Database(DB_NAME)
+        self.conn = self.db.writer
         self.init_db()
+        # Продажи записываются единственным писателем группами транзакций
+        self.write_queue = WriteQueue(self.db.path)
+        self.callbacks = MainThreadCallbacks(self)
+
+        self.book_search = BookSearch(self.db, BOOK_COLUMNS, self)
+        self.book_search.results_ready.connect(self.show_books)
+        self.book_search.cleared.connect(self.load_books)
+        self.book_search.failed.connect(lambda e: QMessageBox.warning(self, "Ошибка", f"Ошибка поиска: {e}"))
+
+        # Статистика считается в фоне; без новых продаж повторный показ берётся из кэша
+        self.stats = StatsService(self.db, GEMINI_STATS, parent=self)
+        self.stats.snapshot_ready.connect(self.on_stats_ready)
+        self.stats.failed.connect(lambda e: QMessageBox.warning(self, "Ошибка", f"Ошибка статистики: {e}"))
+        self.stats_waiting = False
+        self.stats_window = None
+
+        # Обложки берутся из дискового кэша в фоне и только для видимых строк таблицы
+        self.covers = CoverLoader(self.db, parent=self)
 
         self.create_ui()
+        self.covers.cover_ready.connect(self.book_model.refresh_row)
+
+        self.events = CatalogEvents(self)
+        self.events.book_saved.connect(self.book_model.upsert_row)
+        self.events.book_saved.connect(self.covers.invalidate)
+        self.events.book_deleted.connect(self.book_model.remove_row)
+
+        # Текст новых PDF извлекается в фоне для поиска по содержимому книг
+        self.text_indexer = TextIndexer(self.db, self)
+        self.events.book_saved.connect(self.text_indexer.schedule)
+
         self.load_books()
+        if self.has_text_index:
+            self.text_indexer.schedule()
 
     def init_db(self):
         cursor = self.conn.cursor()
@@ -119,6 +206,9 @@ class LibraryApp(QWidget):
             )
         ''')
         self.conn.commit()
+        migrate(self.conn, GEMINI_MIGRATIONS)
+        init_search_index(self.conn)
+        self.has_text_index = init_text_index(self.conn)
 
     def create_ui(self):
         layout = QVBoxLayout()
@@ -129,6 +219,7 @@ class LibraryApp(QWidget):
         self.quantity_input = QLineEdit()
         self.desc_input = QTextEdit()
         self.pdf_path = None
+        self.stored_pdf = None
 
         layout.addWidget(QLabel("Название:"))
         layout.addWidget(self.title_input)
@@ -170,9 +261,14 @@ class LibraryApp(QWidget):
         filter_layout = QHBoxLayout()
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("Поиск по названию или автору")
-        self.search_input.textChanged.connect(self.load_books)
+        self.search_input.textChanged.connect(self.book_search.request)
         filter_layout.addWidget(QLabel("Фильтр:"))
         filter_layout.addWidget(self.search_input)
+        self.text_search_input = QLineEdit()
+        self.text_search_input.setPlaceholderText("Поиск фразы в тексте книг (Enter)")
+        self.text_search_input.setEnabled(self.has_text_index)
+        self.text_search_input.returnPressed.connect(self.search_book_text)
+        filter_layout.addWidget(self.text_search_input)
         layout.addLayout(filter_layout)
 
         btn_row = QHBoxLayout()
@@ -185,9 +281,16 @@ class LibraryApp(QWidget):
         btn_row.addWidget(export_btn)
         layout.addLayout(btn_row)
 
-        self.table = QTableWidget()
-        self.table.setColumnCount(6)
-        self.table.setHorizontalHeaderLabels(["ID", "Название", "Автор", "Цена", "Описание", "Кол-во"])
+        self.book_model = SqlTableModel(
+            self.conn, 'books', BOOK_COLUMNS,
+            ["ID", "Название", "Автор", "Цена", "Описание", "Кол-во"],
+            decoration_column=1, decoration=self.covers.cover, parent=self
+        )
+        self.table = QTableView()
+        self.table.setModel(self.book_model)
+        self.table.setIconSize(COVER_SIZE)
+        self.table.verticalHeader().setDefaultSectionSize(COVER_SIZE.height() + 4)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         layout.addWidget(self.table)
 
@@ -197,10 +300,24 @@ class LibraryApp(QWidget):
     def select_pdf(self):
         path, _ = QFileDialog.getOpenFileName(self, "Выбрать PDF-файл", "", "PDF Files (*.pdf)")
         if path:
-            filename = os.path.basename(path)
-            new_path = os.path.join(PDF_DIR, filename)
-            shutil.copy(path, new_path)
-            self.pdf_path = new_path
+            # Копирование, хэширование и проверка PDF идут в фоне; книгу можно добавить,
+            # когда файл уже надёжно записан в хранилище
+            job = IngestJob(self.pdf_storage, path, self)
+            job.show_progress("Копирование PDF...", "Отмена", self)
+            job.finished.connect(self.on_pdf_stored)
+            job.failed.connect(lambda e: QMessageBox.warning(self, "Ошибка", f"Не удалось сохранить PDF: {e}"))
+            job.start()
+
+    def on_pdf_stored(self, result):
+        # Прежний выбранный файл больше не нужен: без книги его удалит сборщик мусора
+        self.release_pdf()
+        self.stored_pdf = result.stored
+        self.pdf_path = result.stored.path
+
+    def release_pdf(self):
+        if self.stored_pdf is not None:
+            self.pdf_storage.release(self.db, self.stored_pdf)
+            self.stored_pdf = None
 
     def add_book(self):
         title = self.title_input.text().strip()
@@ -221,11 +338,15 @@ class LibraryApp(QWidget):
             return
 
         cursor = self.conn.cursor()
+        # Ссылка на файл хранилища записывается в той же транзакции, что и книга
+        self.pdf_storage.register(self.conn, self.stored_pdf)
         cursor.execute(
             "INSERT INTO books (title, author, price, description, pdf_path, quantity) VALUES (?, ?, ?, ?, ?, ?)",
             (title, author, price_val, desc, self.pdf_path, quantity_val)
         )
         self.conn.commit()
+        # Файл теперь держит ссылка из книги
+        self.release_pdf()
 
         self.title_input.clear()
         self.author_input.clear()
@@ -234,7 +355,7 @@ class LibraryApp(QWidget):
         self.quantity_input.clear()
         self.pdf_path = None
 
-        self.load_books()
+        self.events.book_saved.emit(cursor.lastrowid)
 
     def edit_book(self):
         book_id = self.get_selected_book_id()
@@ -261,34 +382,25 @@ class LibraryApp(QWidget):
             (title, author, price_val, desc, quantity_val, book_id)
         )
         self.conn.commit()
-        self.load_books()
+        self.events.book_saved.emit(book_id)
 
     def load_books(self):
-        filter_text = self.search_input.text().lower()
-        cursor = self.conn.cursor()
+        # Синхронная перезагрузка отменяет отложенный фоновый поиск
+        self.book_search.cancel()
+        filter_text = self.search_input.text().strip()
         if filter_text:
-            query = '''
-                SELECT id, title, author, price, description, quantity
-                FROM books
-                WHERE LOWER(title) LIKE ? OR LOWER(author) LIKE ? OR CAST(price AS TEXT) LIKE ?
-                OR CAST(quantity AS TEXT) LIKE ? OR LOWER(description) LIKE ?
-            '''
-            params = tuple(f'%{filter_text}%' for _ in range(5))
-            cursor.execute(query, params)
+            self.show_books(search_books(self.conn, BOOK_COLUMNS, filter_text))
         else:
-            cursor.execute("SELECT id, title, author, price, description, quantity FROM books")
+            self.book_model.reload()
 
-        rows = cursor.fetchall()
-        self.table.setRowCount(len(rows))
-        for i, row in enumerate(rows):
-            for j, value in enumerate(row):
-                self.table.setItem(i, j, QTableWidgetItem(str(value)))
+    def show_books(self, rows):
+        self.book_model.set_rows(rows)
 
     def get_selected_book_id(self):
-        row = self.table.currentRow()
+        row = self.table.currentIndex().row()
         if row == -1:
             return None
-        return int(self.table.item(row, 0).text())
+        return self.book_model.row_data(row)[0]
 
     def delete_book(self):
         book_id = self.get_selected_book_id()
@@ -300,7 +412,29 @@ class LibraryApp(QWidget):
             cursor = self.conn.cursor()
             cursor.execute("DELETE FROM books WHERE id=?", (book_id,))
             self.conn.commit()
-            self.load_books()
+            self.events.book_deleted.emit(book_id)
+            # PDF удаляется с диска, только если на него больше не ссылается ни одна книга
+            self.pdf_storage.collect_garbage(self.db, document_pool.discard)
+
+    def search_book_text(self):
+        text = self.text_search_input.text().strip()
+        if not text:
+            return
+        with self.db.reader() as conn:
+            hits = search_text(conn, text)
+        if not hits:
+            QMessageBox.information(self, "Поиск", "В тексте книг ничего не найдено.")
+            return
+        dialog = TextHitsDialog(hits, f"Поиск в тексте: {text}", "стр. {page}", self)
+        dialog.hit_activated.connect(self.open_text_hit)
+        dialog.exec_()
+
+    def open_text_hit(self, hit):
+        if os.path.exists(hit.pdf_path):
+            viewer = PDFViewer(hit.pdf_path, hit.page)
+            viewer.exec_()
+        else:
+            QMessageBox.warning(self, "Ошибка", "Файл PDF не найден.")
 
     def open_pdf_internal(self):
         book_id = self.get_selected_book_id()
@@ -323,21 +457,38 @@ class LibraryApp(QWidget):
             QMessageBox.warning(self, "Ошибка", "Выберите книгу.")
             return
 
-        cursor = self.conn.cursor()
-        cursor.execute("INSERT INTO sales (book_id) VALUES (?)", (book_id,))
-        self.conn.commit()
+        # Остаток проверяется и списывается одним условным UPDATE; результат приходит,
+        # когда продажа уже записана на диск
+        future = self.write_queue.submit(apply_basket, GEMINI_SALES, [(book_id, 1)])
+        self.callbacks.watch(future, lambda done: self.on_book_sold(book_id, done))
+
+    def on_book_sold(self, book_id, future):
+        try:
+            sold = future.result()
+        except OutOfStock:
+            QMessageBox.warning(self, "Ошибка", "Книги нет в наличии.")
+            return
+        except sqlite3.Error as e:
+            QMessageBox.warning(self, "Ошибка", f"Не удалось оформить продажу: {e}")
+            return
+        self.events.sale_recorded.emit(sold[0].sale_ids[0], book_id)
+        self.events.book_saved.emit(book_id)
         QMessageBox.information(self, "Продажа", "Книга успешно продана.")
 
     def show_statistics(self):
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT b.title, COUNT(s.id), SUM(COALESCE(b.price, 0))
-            FROM sales s
-            JOIN books b ON s.book_id = b.id
-            GROUP BY s.book_id
-        ''')
-        data = cursor.fetchall()
-
+        # Устаревший снимок показывается сразу, свежий перерисует то же окно, когда будет готов
+        snapshot = self.stats.request()
+        self.stats_waiting = self.stats.refreshing()
+        if snapshot is not None:
+            self.draw_statistics(snapshot)
+
+    def on_stats_ready(self, snapshot):
+        if self.stats_waiting:
+            self.stats_waiting = False
+            self.draw_statistics(snapshot)
+
+    def draw_statistics(self, snapshot):
+        data = snapshot.results['by_book']
         if not data:
             QMessageBox.information(self, "Статистика", "Продаж пока нет.")
             self.export_btn.setEnabled(False)
@@ -346,44 +497,62 @@ class LibraryApp(QWidget):
         self.export_btn.setEnabled(True)
         titles, sold_counts, revenues = zip(*data)
 
-        self.sales_df = pd.DataFrame({
-            "Название книги": titles,
-            "Количество продаж": sold_counts,
-            "Выручка (₽)": revenues
-        })
-
         avg_check = sum(revenues) / sum(sold_counts)
 
-        plt.figure(figsize=(10, 6))
-
-        plt.subplot(2, 1, 1)
-        plt.bar(titles, revenues)
-        plt.title("Выручка по книгам")
-        plt.ylabel("₽")
-        plt.xticks(rotation=45, ha='right')
-
-        plt.subplot(2, 1, 2)
-        plt.bar(titles, sold_counts)
-        plt.title("Количество проданных экземпляров")
-        plt.ylabel("Шт.")
-        plt.xticks(rotation=45, ha='right')
-
-        plt.tight_layout()
-        plt.suptitle(f"📈 Средний чек: {avg_check:.2f} ₽", fontsize=10, y=1.03)
-        plt.show(block=False)
+        if self.stats_window is None:
+            self.build_stats_window()
+        self.revenue_bars.update(titles, revenues)
+        self.count_bars.update(titles, sold_counts)
+        self.stats_dashboard.set_caption(f"📈 Средний чек: {avg_check:.2f} ₽", fontsize=10)
+        self.stats_dashboard.refresh()
+        self.stats_window.show()
+        self.stats_window.raise_()
+
+    def build_stats_window(self):
+        # Окно и графики создаются один раз, дальше обновляются только высоты столбцов
+        self.stats_window = QWidget()
+        self.stats_window.setWindowTitle("Статистика продаж")
+        layout = QVBoxLayout(self.stats_window)
+        self.stats_dashboard = StatsDashboard(figsize=(10, 6))
+        figure = self.stats_dashboard.figure
+        self.revenue_bars = self.stats_dashboard.add(BarPanel(figure.add_subplot(2, 1, 1), "Выручка по книгам", ylabel="₽"))
+        self.count_bars = self.stats_dashboard.add(
+            BarPanel(figure.add_subplot(2, 1, 2), "Количество проданных экземпляров", ylabel="Шт."))
+        layout.addWidget(self.stats_dashboard)
 
     def export_statistics(self):
-        if not hasattr(self, 'sales_df') or self.sales_df.empty:
+        if not self.export_btn.isEnabled():
             QMessageBox.information(self, "Экспорт", "Нет данных для экспорта.")
             return
 
-        path, _ = QFileDialog.getSaveFileName(self, "Сохранить Excel-файл", "sales_report.xlsx", "Excel Files (*.xlsx)")
-        if path:
-            try:
-                self.sales_df.to_excel(path, index=False)
-                QMessageBox.information(self, "Экспорт", f"Файл успешно сохранён:\n{path}")
-            except Exception as e:
-                QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить файл:\n{e}")
+        path, selected = QFileDialog.getSaveFileName(self, "Сохранить отчёт", "sales_report.xlsx", FILE_FILTER)
+        if not path:
+            return
+        path = with_extension(path, selected)
+
+        # Excel получает сводные листы по книгам, авторам, дням и месяцам и все продажи;
+        # отчёт строится в фоне, сводки считает SQLite
+        try:
+            sheets = report_sheets(path, GEMINI_PIVOTS, ("Продажи", GEMINI_EXPORT))
+        except ExportError as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить файл:\n{e}")
+            return
+        job = ExportJob(self.db, sheets, path, GEMINI_EXPORT_COUNT, self)
+        job.show_progress("Формирование отчёта...", "Отмена", self)
+        job.finished.connect(lambda rows: QMessageBox.information(self, "Экспорт", f"Файл успешно сохранён:\n{path}"))
+        job.failed.connect(lambda e: QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить файл:\n{e}"))
+        job.start()
+
+    def closeEvent(self, event):
+        if self.stats_window is not None:
+            self.stats_window.close()
+        self.text_indexer.stop()
+        shutdown_shared_pool()
+        self.release_pdf()
+        self.write_queue.close()
+        document_pool.close_all()
+        self.db.close()
+        event.accept()
 
 
 if __name__ == "__main__":
@@ -2,16 +2,34 @@ import sys
 import os
 import sqlite3
 from datetime import datetime
-import pandas as pd
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-                             QTableWidget, QTableWidgetItem, QLineEdit, QPushButton,
+                             QTableView, QAbstractItemView, QLineEdit, QPushButton,
                              QFormLayout, QFileDialog, QMessageBox, QHeaderView, QTabWidget,
-                             QDialog, QScrollArea, QLabel)
+                             QDialog, QLabel)
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap, QImage
-import fitz  # PyMuPDF для рендеринга PDF
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+
+from book_model import CatalogEvents, SqlTableModel
+from checkout import GROK_SALES, OutOfStock, apply_basket
+from document_pool import document_pool
+from pdf_ingest import IngestJob
+from pdf_storage import PdfStorage
+from lazy_pdf_view import LazyPdfView
+from migrations import GROK_MIGRATIONS, migrate
+from queries import GROK_EXPORT, GROK_EXPORT_COUNT, GROK_HAS_SALES, GROK_STATS
+from render_pool import shutdown_shared_pool
+from repository import Database
+from search_index import init_search_index, search_books
+from sales_export import FILE_FILTER, ExportJob, with_extension
+from search_worker import BookSearch
+from stats_dashboard import BarPanel, PiePanel, StatsDashboard
+from stats_service import StatsService
+from text_index import TextHitsDialog, TextIndexer, init_text_index, search_text
+from thumbnail_store import COVER_SIZE, CoverLoader
+from write_queue import MainThreadCallbacks, WriteQueue
+
+DB_NAME = 'library.db'
+PDF_DIR = 'library_pdfs'
+BOOK_COLUMNS = ('id', 'title', 'author', 'price', 'quantity', 'description')
 
 class LibraryApp(QMainWindow):
     def __init__(self):
@@ -20,8 +38,20 @@ class LibraryApp(QMainWindow):
         self.setGeometry(100, 100, 1000, 600)
 
         # Инициализация базы данных
-        self.conn = sqlite3.connect('library.db')
+        self.db = Database(DB_NAME)
+        # Выбранные PDF копируются в хранилище по SHA-256, одинаковые файлы - в одном экземпляре
+        self.pdf_storage = PdfStorage(PDF_DIR)
+        self.conn = self.db.writer
         self.create_tables()
+        # Продажи записываются единственным писателем группами транзакций
+        self.write_queue = WriteQueue(self.db.path)
+        self.callbacks = MainThreadCallbacks(self)
+
+        # Поиск по фильтру выполняется в фоне с задержкой между нажатиями клавиш
+        self.book_search = BookSearch(self.db, BOOK_COLUMNS, self)
+        self.book_search.results_ready.connect(self.show_books)
+        self.book_search.cleared.connect(self.load_books)
+        self.book_search.failed.connect(lambda e: QMessageBox.warning(self, "Search Error", e))
 
         # Основной виджет с вкладками
         self.main_widget = QTabWidget()
@@ -69,11 +99,28 @@ class LibraryApp(QMainWindow):
         self.filter_input.setPlaceholderText("Filter by title, author, price, quantity, or description")
         self.filter_input.textChanged.connect(self.filter_books)
         self.filter_layout.addWidget(self.filter_input)
+        # Поиск фразы внутри текста PDF (по Enter), результаты - книга и страница
+        self.text_search_input = QLineEdit()
+        self.text_search_input.setPlaceholderText("Search inside book text (press Enter)")
+        self.text_search_input.setEnabled(self.has_text_index)
+        self.text_search_input.returnPressed.connect(self.search_book_text)
+        self.filter_layout.addWidget(self.text_search_input)
 
         # Таблица для отображения книг
-        self.table = QTableWidget()
-        self.table.setColumnCount(6)
-        self.table.setHorizontalHeaderLabels(["ID", "Title", "Author", "Price", "Quantity", "Description"])
+        # Таблица показывает модель, которая подгружает строки из БД порциями при прокрутке
+        # Обложки берутся из дискового кэша в фоне и только для видимых строк
+        self.covers = CoverLoader(self.db, parent=self)
+        self.book_model = SqlTableModel(
+            self.conn, 'books', BOOK_COLUMNS,
+            ["ID", "Title", "Author", "Price", "Quantity", "Description"],
+            decoration_column=1, decoration=self.covers.cover, parent=self
+        )
+        self.covers.cover_ready.connect(self.book_model.refresh_row)
+        self.table = QTableView()
+        self.table.setModel(self.book_model)
+        self.table.setIconSize(COVER_SIZE)
+        self.table.verticalHeader().setDefaultSectionSize(COVER_SIZE.height() + 4)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.table.doubleClicked.connect(self.open_pdf)
 
@@ -91,7 +138,24 @@ class LibraryApp(QMainWindow):
         self.export_button.clicked.connect(self.export_to_excel)
         self.stats_layout.addWidget(self.stats_button)
         self.stats_layout.addWidget(self.export_button)
-        self.stats_canvas = None
+        # Графики и сводка создаются один раз и только обновляются
+        self.stats_dashboard = StatsDashboard(figsize=(12, 5))
+        figure = self.stats_dashboard.figure
+        self.top_bars = self.stats_dashboard.add(BarPanel(
+            figure.add_subplot(1, 2, 1), "Top 5 Books Sold", xlabel="Book Title", ylabel="Number of Sales"))
+        self.revenue_pie = self.stats_dashboard.add(PiePanel(figure.add_subplot(1, 2, 2), 5, "Revenue Share by Book"))
+        self.stats_dashboard.hide()
+        self.stats_layout.addWidget(self.stats_dashboard)
+        self.stats_summary = QLabel()
+        self.stats_summary.setStyleSheet("font-size: 14px; font-weight: bold;")
+        self.stats_summary.hide()
+        self.stats_layout.addWidget(self.stats_summary)
+
+        # Статистика считается в фоне; без новых продаж повторный показ берётся из кэша
+        self.stats = StatsService(self.db, GROK_STATS, parent=self)
+        self.stats.snapshot_ready.connect(self.on_stats_ready)
+        self.stats.failed.connect(lambda e: QMessageBox.warning(self, "Statistics Error", e))
+        self.stats_waiting = False
 
         # Изначально отключение кнопки экспорта
         self.update_export_button_state()
@@ -100,8 +164,21 @@ class LibraryApp(QMainWindow):
         self.main_widget.addTab(self.books_widget, "Books")
         self.main_widget.addTab(self.stats_widget, "Statistics")
 
+        # Изменения книг применяются к таблице точечно, без полной перезагрузки
+        self.events = CatalogEvents(self)
+        self.events.book_saved.connect(self.book_model.upsert_row)
+        self.events.book_saved.connect(self.covers.invalidate)
+        self.events.book_deleted.connect(self.book_model.remove_row)
+        self.events.sale_recorded.connect(lambda sale_id, book_id: self.export_button.setEnabled(True))
+
+        # Текст новых и изменённых PDF извлекается в фоне для поиска по содержимому
+        self.text_indexer = TextIndexer(self.db, self)
+        self.events.book_saved.connect(self.text_indexer.schedule)
+
         # Загрузка начальных данных
         self.load_books()
+        if self.has_text_index:
+            self.text_indexer.schedule()
 
     def create_tables(self):
         cursor = self.conn.cursor()
@@ -126,6 +203,9 @@ class LibraryApp(QMainWindow):
             )
         ''')
         self.conn.commit()
+        migrate(self.conn, GROK_MIGRATIONS)
+        init_search_index(self.conn)
+        self.has_text_index = init_text_index(self.conn)
 
     def add_book(self):
         title = self.title_input.text()
@@ -153,13 +233,37 @@ class LibraryApp(QMainWindow):
             QMessageBox.warning(self, "Input Error", "Quantity must be a non-negative integer!")
             return
 
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            INSERT INTO books (title, author, price, quantity, description, pdf_path)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (title, author, price, quantity, description, pdf_path))
-        self.conn.commit()
+        def insert_book(result):
+            cursor = self.conn.cursor()
+            self.pdf_storage.register(self.conn, result.stored)
+            cursor.execute('''
+                INSERT INTO books (title, author, price, quantity, description, pdf_path)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (title, author, price, quantity, description, result.stored.path))
+            self.conn.commit()
+            self.clear_book_form()
+            self.events.book_saved.emit(cursor.lastrowid)
+
+        # Строка книги записывается только после того, как PDF скопирован и проверен в фоне
+        self.store_pdf(pdf_path, insert_book)
+
+    def store_pdf(self, pdf_path, on_stored, parent=None):
+        # Индикатор привязан к окну, из которого начато сохранение: модальный диалог иначе его заблокирует
+        parent = parent or self
+        job = IngestJob(self.pdf_storage, pdf_path, self)
+        job.show_progress("Copying PDF...", "Cancel", parent)
+        job.finished.connect(lambda result: self.on_pdf_stored(result, on_stored))
+        job.failed.connect(lambda e: QMessageBox.warning(parent, "File Error", f"Could not store PDF: {e}"))
+        job.start()
+
+    def on_pdf_stored(self, result, on_stored):
+        try:
+            on_stored(result)
+        finally:
+            # Книга записана (файл держит её ссылка) или запись не удалась (файл удалит сборщик мусора)
+            self.pdf_storage.release(self.db, result.stored)
 
+    def clear_book_form(self):
         self.title_input.clear()
         self.author_input.clear()
         self.price_input.clear()
@@ -167,16 +271,13 @@ class LibraryApp(QMainWindow):
         self.description_input.clear()
         self.pdf_path_input.clear()
 
-        self.load_books()
-        self.update_export_button_state()
-
     def edit_book(self):
-        selected = self.table.selectedItems()
-        if not selected:
+        book = self.selected_book()
+        if book is None:
             QMessageBox.warning(self, "Selection Error", "Please select a book to edit!")
             return
 
-        book_id = self.table.item(self.table.currentRow(), 0).text()
+        book_id = book[0]
         cursor = self.conn.cursor()
         cursor.execute("SELECT title, author, price, quantity, description, pdf_path FROM books WHERE id = ?", (book_id,))
         book_data = cursor.fetchone()
@@ -232,24 +333,38 @@ class LibraryApp(QMainWindow):
             QMessageBox.warning(self, "Input Error", "Quantity must be a non-negative integer!")
             return
 
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            UPDATE books
-            SET title = ?, author = ?, price = ?, quantity = ?, description = ?, pdf_path = ?
-            WHERE id = ?
-        ''', (title, author, price, quantity, description, pdf_path, book_id))
-        self.conn.commit()
-        self.load_books()
-        self.update_export_button_state()
-        dialog.accept()
+        def update_book(result=None):
+            cursor = self.conn.cursor()
+            new_path = pdf_path
+            if result is not None:
+                self.pdf_storage.register(self.conn, result.stored)
+                new_path = result.stored.path
+            cursor.execute('''
+                UPDATE books
+                SET title = ?, author = ?, price = ?, quantity = ?, description = ?, pdf_path = ?
+                WHERE id = ?
+            ''', (title, author, price, quantity, description, new_path, book_id))
+            self.conn.commit()
+            self.events.book_saved.emit(book_id)
+            # Прежний PDF мог остаться без ссылок
+            self.pdf_storage.collect_garbage(self.db, document_pool.discard)
+            dialog.accept()
+
+        current = self.conn.execute("SELECT pdf_path FROM books WHERE id = ?", (book_id,)).fetchone()
+        if self.pdf_storage.is_managed(pdf_path) or (current is not None and pdf_path == current[0]):
+            # PDF не менялся: старый внешний путь остаётся как есть, даже если файла уже нет
+            update_book()
+        else:
+            # Выбран новый файл: сначала он копируется в хранилище
+            self.store_pdf(pdf_path, update_book, dialog)
 
     def delete_book(self):
-        selected = self.table.selectedItems()
-        if not selected:
+        book = self.selected_book()
+        if book is None:
             QMessageBox.warning(self, "Selection Error", "Please select a book to delete!")
             return
 
-        book_id = self.table.item(self.table.currentRow(), 0).text()
+        book_id = book[0]
         reply = QMessageBox.question(self, "Confirm Deletion",
                                    f"Are you sure you want to delete book ID {book_id}?",
                                    QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
@@ -259,32 +374,36 @@ class LibraryApp(QMainWindow):
             cursor.execute("DELETE FROM books WHERE id = ?", (book_id,))
             cursor.execute("DELETE FROM sales WHERE book_id = ?", (book_id,))
             self.conn.commit()
-            self.load_books()
+            self.events.book_deleted.emit(book_id)
+            self.pdf_storage.collect_garbage(self.db, document_pool.discard)
             self.update_export_button_state()
 
     def sell_book(self):
-        selected = self.table.selectedItems()
-        if not selected:
+        book = self.selected_book()
+        if book is None:
             QMessageBox.warning(self, "Selection Error", "Please select a book to sell!")
             return
 
-        book_id = self.table.item(self.table.currentRow(), 0).text()
-        quantity = int(self.table.item(self.table.currentRow(), 4).text())
-        if quantity <= 0:
+        book_id = book[0]
+        # Остаток в таблице мог устареть: его проверяет и списывает условный UPDATE в транзакции продажи,
+        # а результат приходит, когда продажа уже записана на диск
+        future = self.write_queue.submit(apply_basket, GROK_SALES, [(book_id, 1)])
+        self.callbacks.watch(future, lambda done: self.on_book_sold(book_id, done))
+
+    def on_book_sold(self, book_id, future):
+        try:
+            sold = future.result()
+        except OutOfStock:
             QMessageBox.warning(self, "Stock Error", "No copies available to sell!")
             return
+        except sqlite3.Error as e:
+            QMessageBox.warning(self, "Database Error", f"Could not record the sale: {e}")
+            return
 
-        price = float(self.table.item(self.table.currentRow(), 3).text())
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            INSERT INTO sales (book_id, sale_date, amount)
-            VALUES (?, ?, ?)
-        ''', (book_id, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), price))
-        cursor.execute("UPDATE books SET quantity = quantity - 1 WHERE id = ?", (book_id,))
-        self.conn.commit()
-        QMessageBox.information(self, "Success", f"Book ID {book_id} sold for {price}!")
-        self.load_books()
-        self.update_export_button_state()
+        line = sold[0]
+        self.events.sale_recorded.emit(line.sale_ids[0], book_id)
+        self.events.book_saved.emit(book_id)
+        QMessageBox.information(self, "Success", f"Book ID {book_id} sold for {line.price}!")
 
     def browse_pdf(self, input_field=None):
         file_path, _ = QFileDialog.getOpenFileName(self, "Select PDF File", "", "PDF Files (*.pdf)")
@@ -295,94 +414,82 @@ class LibraryApp(QMainWindow):
                 self.pdf_path_input.setText(file_path)
 
     def load_books(self, filter_text=""):
-        cursor = self.conn.cursor()
-        query = "SELECT id, title, author, price, quantity, description FROM books"
-        params = []
-        if filter_text:
-            query += """
-                WHERE title LIKE ? 
-                OR author LIKE ? 
-                OR description LIKE ?
-                OR CAST(price AS TEXT) LIKE ?
-                OR CAST(quantity AS TEXT) LIKE ?
-            """
-            params = [f'%{filter_text}%'] * 5
-
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        self.table.setRowCount(len(rows))
-
-        for row_idx, row_data in enumerate(rows):
-            for col_idx, data in enumerate(row_data):
-                self.table.setItem(row_idx, col_idx, QTableWidgetItem(str(data)))
+        self.book_search.cancel()
+        if filter_text.strip():
+            self.show_books(search_books(self.conn, BOOK_COLUMNS, filter_text))
+        else:
+            self.book_model.reload()
+
+    def show_books(self, rows):
+        self.book_model.set_rows(rows)
+
+    def selected_book(self):
+        if not self.table.selectionModel().hasSelection():
+            return None
+        return self.book_model.row_data(self.table.currentIndex().row())
 
     def filter_books(self):
-        filter_text = self.filter_input.text()
-        self.load_books(filter_text)
+        self.book_search.request(self.filter_input.text())
+
+    def search_book_text(self):
+        text = self.text_search_input.text().strip()
+        if not text:
+            return
+        with self.db.reader() as conn:
+            hits = search_text(conn, text)
+        if not hits:
+            QMessageBox.information(self, "Text Search", "No matches in indexed book text.")
+            return
+        dialog = TextHitsDialog(hits, f"Text Search: {text}", "p. {page}", self)
+        dialog.hit_activated.connect(lambda hit: self.show_pdf(hit.pdf_path, hit.title, hit.page))
+        dialog.exec_()
 
     def open_pdf(self, index):
         row = index.row()
         cursor = self.conn.cursor()
-        cursor.execute("SELECT pdf_path, title FROM books WHERE id = ?", (self.table.item(row, 0).text(),))
+        cursor.execute("SELECT pdf_path, title FROM books WHERE id = ?", (self.book_model.row_data(row)[0],))
         result = cursor.fetchone()
         pdf_path, title = result
+        self.show_pdf(pdf_path, title)
 
+    def show_pdf(self, pdf_path, title, page=0):
         if pdf_path and os.path.exists(pdf_path):
             try:
-                pdf_document = fitz.open(pdf_path)
                 pdf_dialog = QDialog(self)
                 pdf_dialog.setWindowTitle(f"PDF Viewer - {title}")
                 pdf_dialog.setGeometry(150, 150, 600, 400)
                 layout = QVBoxLayout(pdf_dialog)
 
-                scroll_area = QScrollArea()
-                scroll_area.setWidgetResizable(True)
-                container = QWidget()
-                container_layout = QVBoxLayout(container)
-
-                for page_num in range(pdf_document.page_count):
-                    page = pdf_document.load_page(page_num)
-                    pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-                    img = QImage(pix.samples, pix.width, pix.height, pix.stride, QImage.Format_RGB888)
-                    pixmap = QPixmap.fromImage(img)
-                    label = QLabel()
-                    label.setPixmap(pixmap)
-                    container_layout.addWidget(label)
-
-                scroll_area.setWidget(container)
-                layout.addWidget(scroll_area)
+                # Страницы рендерятся по мере прокрутки, а не все сразу при открытии
+                pdf_view = LazyPdfView(pdf_path, page=page)
+                layout.addWidget(pdf_view)
                 pdf_dialog.exec_()
-                pdf_document.close()
+                pdf_view.close_document()
             except Exception as e:
                 QMessageBox.warning(self, "Error", f"Could not open PDF: {str(e)}")
         else:
             QMessageBox.warning(self, "Error", "PDF file not found!")
 
     def show_statistics(self):
-        button_index = self.stats_layout.indexOf(self.stats_button)
-        export_button_index = self.stats_layout.indexOf(self.export_button)
-        for i in reversed(range(self.stats_layout.count())):
-            if i != button_index and i != export_button_index:
-                widget = self.stats_layout.itemAt(i).widget()
-                if widget:
-                    widget.deleteLater()
-
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT SUM(amount), COUNT(id) FROM sales")
-        result = cursor.fetchone()
-        total_revenue, total_sales = result if result else (0.0, 0)
+        # Устаревший снимок показывается сразу, свежий заменит его, когда будет готов
+        snapshot = self.stats.request()
+        self.stats_waiting = self.stats.refreshing()
+        if snapshot is not None:
+            self.draw_statistics(snapshot)
+
+    def on_stats_ready(self, snapshot):
+        if self.stats_waiting:
+            self.stats_waiting = False
+            self.draw_statistics(snapshot)
+
+    def draw_statistics(self, snapshot):
+        totals = snapshot.results['totals']
+        # Топ-5 считается по индексу продаж, а не перебором всех книг
+        stats = snapshot.results['top_books']
+
+        total_revenue, total_sales = totals[0] if totals else (0.0, 0)
         avg_check = total_revenue / total_sales if total_sales > 0 else 0.0
 
-        cursor.execute('''
-            SELECT b.title, COUNT(s.id) as sales_count, SUM(s.amount) as total_revenue
-            FROM books b
-            LEFT JOIN sales s ON b.id = s.book_id
-            GROUP BY b.id
-            ORDER BY sales_count DESC
-            LIMIT 5
-        ''')
-        stats = cursor.fetchall()
-
         if total_sales == 0:
             QMessageBox.information(self, "Statistics", "No sales data available.")
             return
@@ -395,62 +502,49 @@ class LibraryApp(QMainWindow):
         sales_counts = [row[1] for row in stats]
         revenues = [row[2] or 0 for row in stats]
 
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 5))
-        ax1.bar(titles, sales_counts)
-        ax1.set_title("Top 5 Books Sold")
-        ax1.set_xlabel("Book Title")
-        ax1.set_ylabel("Number of Sales")
-        ax1.tick_params(axis='x', rotation=45)
-
-        ax2.pie(revenues, labels=titles, autopct='%1.1f%%')
-        ax2.set_title("Revenue Share by Book")
-
-        plt.tight_layout()
-        self.stats_canvas = FigureCanvas(fig)
-        self.stats_layout.addWidget(self.stats_canvas)
+        self.top_bars.update(titles, sales_counts)
+        self.revenue_pie.update(titles, revenues)
+        self.stats_dashboard.show()
+        self.stats_dashboard.refresh()
 
-        summary = (
+        self.stats_summary.setText(
             f"Total Revenue: ${total_revenue:.2f}\n"
             f"Total Sales: {total_sales}\n"
             f"Average Check: ${avg_check:.2f}\n"
             f"Top Book: {titles[0] if titles else 'N/A'}"
         )
-        summary_label = QLabel(summary)
-        summary_label.setStyleSheet("font-size: 14px; font-weight: bold;")
-        self.stats_layout.addWidget(summary_label)
+        self.stats_summary.show()
 
     def update_export_button_state(self):
         cursor = self.conn.cursor()
-        cursor.execute("SELECT COUNT(id) FROM sales")
-        total_sales = cursor.fetchone()[0]
-        self.export_button.setEnabled(total_sales > 0)
+        cursor.execute(GROK_HAS_SALES)
+        has_sales = cursor.fetchone()[0]
+        self.export_button.setEnabled(bool(has_sales))
 
     def export_to_excel(self):
         if not self.export_button.isEnabled():
             QMessageBox.warning(self, "Export Error", "No sales data available to export.")
             return
 
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT b.title, s.sale_date, s.amount
-            FROM sales s
-            JOIN books b ON s.book_id = b.id
-            ORDER BY s.sale_date DESC
-        ''')
-        sales_data = cursor.fetchall()
-
-        if not sales_data:
-            QMessageBox.warning(self, "Export Error", "No sales data available to export.")
+        file_path, selected = QFileDialog.getSaveFileName(self, "Export Sales", f"sales_statistics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx", FILE_FILTER)
+        if not file_path:
             return
+        file_path = with_extension(file_path, selected)
 
-        df = pd.DataFrame(sales_data, columns=['Title', 'Sale Date', 'Amount'])
-        file_path, _ = QFileDialog.getSaveFileName(self, "Save Excel File", f"sales_statistics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx", "Excel Files (*.xlsx)")
-        if file_path:
-            df.to_excel(file_path, index=False)
-            QMessageBox.information(self, "Success", f"Statistics exported to {file_path}")
+        # Продажи выгружаются в фоне порциями, вся таблица в память не загружается
+        job = ExportJob(self.db, [("Sales", GROK_EXPORT)], file_path, GROK_EXPORT_COUNT, self)
+        job.show_progress("Exporting sales...", "Cancel", self)
+        job.finished.connect(
+            lambda rows: QMessageBox.information(self, "Success", f"{rows} sales exported to {file_path}"))
+        job.failed.connect(lambda e: QMessageBox.warning(self, "Export Error", e))
+        job.start()
 
     def closeEvent(self, event):
-        self.conn.close()
+        self.text_indexer.stop()
+        shutdown_shared_pool()
+        self.write_queue.close()
+        document_pool.close_all()
+        self.db.close()
         event.accept()
 
 if __name__ == '__main__':
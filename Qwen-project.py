@@ -1,31 +1,79 @@
 import sys
 import sqlite3
 import os
-import shutil
-from datetime import datetime
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-                             QLabel, QLineEdit, QPushButton, QTableWidget, QTableWidgetItem,
+                             QLabel, QLineEdit, QPushButton, QTableView,
                              QFileDialog, QMessageBox, QAbstractItemView, QTabWidget,
                              QTextEdit, QDialog, QFormLayout, QSpinBox, QComboBox,
-                             QGroupBox, QGridLayout, QHeaderView)
-from PyQt5.QtCore import Qt
+                             QGroupBox, QGridLayout, QHeaderView, QGraphicsScene, QGraphicsView,
+                             QListWidget)
+from PyQt5.QtCore import Qt, QRectF, QTimer
 import fitz  # PyMuPDF
-from PyQt5.QtGui import QPixmap, QImage
-import pandas as pd
+
+from book_model import CatalogEvents, SqlTableModel
+from checkout import QWEN_SALES, OutOfStock, apply_basket
+from document_pool import document_pool
+from pdf_ingest import IngestJob
+from pdf_storage import PdfStorage
+from page_cache import PagePrefetcher, neighbour_pages, page_cache
+from pdf_render import MAX_PAGE_ZOOM, fit_zoom, render_pixmap, tile_grid, zoom_changed
+from render_pool import RenderService, shutdown_shared_pool
+from bulk_import import ImportJob
+from migrations import QWEN_MIGRATIONS, migrate
+from queries import QWEN_DAILY_WINDOW, QWEN_EXPORT, QWEN_EXPORT_COUNT, QWEN_PIVOTS, QWEN_STATS
+from repository import Database
+from sales_export import FILE_FILTER, ExportError, ExportJob, report_sheets, with_extension
+from sales_timeline import TimelineNavigator, build_timeline
+from stats_dashboard import SeriesPanel, StatsDashboard
+from stats_service import StatsService
+from text_index import TextHitsDialog, TextIndexer, init_text_index, search_text
+from thumbnail_store import COVER_SIZE, CoverLoader
+from write_queue import MainThreadCallbacks, WriteQueue
+
+# Название книги в элементе списка продаж - для вставки нового элемента по алфавиту
+TITLE_ROLE = Qt.UserRole + 1
+# Шаг масштабирования кнопками «+» / «−»
+ZOOM_STEP = 1.25
+
+
+def daily_timeline(results):
+    # Шаг и прореживание графика за всю историю считаются в фоне вместе со снимком статистики
+    return build_timeline(results['daily'])
 
 
 class PDFViewer(QDialog):
-    def __init__(self, pdf_path, parent=None):
+    def __init__(self, pdf_path, parent=None, page=0):
         super().__init__(parent)
         self.setWindowTitle("Просмотр PDF")
         self.setGeometry(200, 200, 800, 900)
         self.pdf_path = pdf_path
         self.current_page = 0
+        # Страница, на которой открыть книгу (например, найденная поиском по тексту)
+        self.start_page = page
         self.doc = None
         self.total_pages = 0
 
+        # Координаты сцены - пункты PDF. Страница целиком рендерится в масштабе «по размеру окна»
+        # с учётом плотности пикселей экрана; при увеличении поверх неё рисуются только видимые тайлы
+        self.page_rect = None
+        self.page_item = None
+        self.page_zoom = None
+        self.tile_items = {}
+        self.tile_jobs = {}
+        self.tile_zoom = None
+        self.fit_mode = True
+        # Тайлы рендерятся в пуле процессов, а не в GUI-потоке
+        self.render_service = RenderService(parent=self)
+        self.render_service.rendered.connect(self.on_tile_rendered)
+        self.prefetcher = PagePrefetcher(pdf_path, 1, self)
+        self.prefetcher.page_rendered.connect(self.on_page_prefetched)
+
+        self.tile_timer = QTimer(self)
+        self.tile_timer.setSingleShot(True)
+        self.tile_timer.setInterval(50)
+        self.tile_timer.timeout.connect(self.update_tiles)
+
         self.init_ui()
         self.load_pdf()
 
@@ -44,20 +92,35 @@ class PDFViewer(QDialog):
 
         self.page_label = QLabel("Страница: 0/0")
         nav_layout.addWidget(self.page_label)
+
+        zoom_out_btn = QPushButton("−")
+        zoom_out_btn.clicked.connect(lambda: self.scale_view(1 / ZOOM_STEP))
+        nav_layout.addWidget(zoom_out_btn)
+
+        zoom_in_btn = QPushButton("+")
+        zoom_in_btn.clicked.connect(lambda: self.scale_view(ZOOM_STEP))
+        nav_layout.addWidget(zoom_in_btn)
+
+        fit_btn = QPushButton("По размеру окна")
+        fit_btn.clicked.connect(self.fit_page)
+        nav_layout.addWidget(fit_btn)
         layout.addLayout(nav_layout)
 
         # Просмотр PDF
         self.scene = QGraphicsScene()
         self.view = QGraphicsView(self.scene)
+        self.view.setDragMode(QGraphicsView.ScrollHandDrag)
+        self.view.horizontalScrollBar().valueChanged.connect(self.tile_timer.start)
+        self.view.verticalScrollBar().valueChanged.connect(self.tile_timer.start)
         layout.addWidget(self.view)
 
         self.setLayout(layout)
 
     def load_pdf(self):
         try:
-            self.doc = fitz.open(self.pdf_path)
+            self.doc = document_pool.acquire(self.pdf_path)
             self.total_pages = len(self.doc)
-            self.display_page(0)
+            self.display_page(min(max(self.start_page, 0), self.total_pages - 1))
         except Exception as e:
             QMessageBox.warning(self, "Ошибка", f"Не удалось загрузить PDF: {str(e)}")
 
@@ -65,19 +128,148 @@ class PDFViewer(QDialog):
         if not self.doc or page_num < 0 or page_num >= self.total_pages:
             return
 
-        page = self.doc.load_page(page_num)
-        pix = page.get_pixmap()
-        img = QImage(pix.samples, pix.width, pix.height, pix.stride, QImage.Format_RGB888)
-        pixmap = QPixmap.fromImage(img)
-
+        self.current_page = page_num
+        self.page_rect = self.doc.load_page(page_num).rect
         self.scene.clear()
-        self.scene.addPixmap(pixmap)
-        self.view.fitInView(self.scene.sceneRect(), Qt.KeepAspectRatio)
+        self.page_item = None
+        self.tile_items = {}
+        self.cancel_tile_jobs()
+        self.scene.setSceneRect(QRectF(0, 0, self.page_rect.width, self.page_rect.height))
+        if self.fit_mode:
+            self.view.fitInView(self.scene.sceneRect(), Qt.KeepAspectRatio)
+        self.update_page_pixmap()
+        self.update_tiles()
 
-        self.current_page = page_num
         self.page_label.setText(f"Страница: {self.current_page + 1}/{self.total_pages}")
         self.update_buttons()
 
+        self.prefetcher.request(
+            num for num in neighbour_pages(page_num, self.total_pages)
+            if (self.pdf_path, num, self.page_zoom) not in page_cache
+        )
+
+    def fit_zoom(self):
+        # Пикселей устройства на пункт PDF, если страница вписана в окно
+        viewport = self.view.viewport()
+        return min(fit_zoom(self.page_rect, viewport.width(), viewport.height(), self.devicePixelRatioF()),
+                   MAX_PAGE_ZOOM)
+
+    def view_zoom(self):
+        return round(self.view.transform().m11() * self.devicePixelRatioF(), 2)
+
+    def update_page_pixmap(self):
+        zoom = self.fit_zoom()
+        if self.page_item is not None and not zoom_changed(self.page_zoom, zoom):
+            return
+        if zoom_changed(self.page_zoom, zoom):
+            self.page_zoom = zoom
+            self.prefetcher.set_zoom(zoom)
+
+        key = (self.pdf_path, self.current_page, self.page_zoom)
+        pixmap = page_cache.get(key)
+        if pixmap is None:
+            pixmap = render_pixmap(self.doc, self.current_page, self.page_zoom)
+            page_cache.put(key, pixmap)
+
+        if self.page_item is None:
+            self.page_item = self.scene.addPixmap(pixmap)
+            self.page_item.setTransformationMode(Qt.SmoothTransformation)
+        else:
+            self.page_item.setPixmap(pixmap)
+        self.page_item.setScale(1 / self.page_zoom)
+
+    def update_tiles(self):
+        if self.page_rect is None:
+            return
+        zoom = self.view_zoom()
+        # Пока картинки страницы хватает для текущего масштаба, тайлы не нужны
+        if not zoom_changed(self.page_zoom, zoom) or zoom < self.page_zoom:
+            zoom = None
+        if zoom is None or zoom_changed(self.tile_zoom, zoom):
+            for item in self.tile_items.values():
+                self.scene.removeItem(item)
+            self.tile_items = {}
+            self.cancel_tile_jobs()
+            self.tile_zoom = zoom
+        if self.tile_zoom is None:
+            return
+
+        visible = self.view.mapToScene(self.view.viewport().rect()).boundingRect()
+        area = fitz.Rect(visible.left(), visible.top(), visible.right(), visible.bottom())
+        wanted = set()
+        for col, row, rect in tile_grid(self.page_rect, area, self.tile_zoom):
+            wanted.add((col, row))
+            if (col, row) in self.tile_items or (col, row) in self.tile_jobs:
+                continue
+            key = (self.pdf_path, self.current_page, self.tile_zoom, col, row)
+            pixmap = page_cache.get(key)
+            if pixmap is not None:
+                self.add_tile(col, row, rect, pixmap)
+            else:
+                job = self.render_service.submit(key, self.pdf_path, self.current_page, self.tile_zoom, clip=rect)
+                self.tile_jobs[(col, row)] = (job, rect)
+
+        # Тайлы, ушедшие из видимой области, убираются со сцены (в кэше они остаются),
+        # а их незавершённый рендер отменяется
+        for tile in set(self.tile_items) - wanted:
+            self.scene.removeItem(self.tile_items.pop(tile))
+        for tile in set(self.tile_jobs) - wanted:
+            self.tile_jobs.pop(tile)[0].cancel()
+
+    def add_tile(self, col, row, rect, pixmap):
+        item = self.scene.addPixmap(pixmap)
+        item.setScale(1 / self.tile_zoom)
+        item.setPos(rect.x0, rect.y0)
+        item.setZValue(1)
+        self.tile_items[(col, row)] = item
+
+    def on_tile_rendered(self, key, result):
+        if result is None:
+            return
+        pixmap = result.to_pixmap()
+        page_cache.put(key, pixmap)
+        _, page_num, zoom, col, row = key
+        if page_num == self.current_page and zoom == self.tile_zoom and (col, row) in self.tile_jobs:
+            _, rect = self.tile_jobs.pop((col, row))
+            self.add_tile(col, row, rect, pixmap)
+
+    def cancel_tile_jobs(self):
+        for job, _ in self.tile_jobs.values():
+            job.cancel()
+        self.tile_jobs = {}
+
+    def scale_view(self, factor):
+        if self.page_rect is None:
+            return
+        self.fit_mode = False
+        self.view.scale(factor, factor)
+        self.tile_timer.start()
+
+    def fit_page(self):
+        if self.page_rect is None:
+            return
+        self.fit_mode = True
+        self.view.fitInView(self.scene.sceneRect(), Qt.KeepAspectRatio)
+        self.update_page_pixmap()
+        self.update_tiles()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.fit_mode:
+            self.fit_page()
+
+    def on_page_prefetched(self, key, rendered):
+        if key not in page_cache:
+            page_cache.put(key, rendered.to_pixmap())
+
+    def done(self, result):
+        self.prefetcher.stop()
+        self.cancel_tile_jobs()
+        if self.doc is not None:
+            document_pool.release(self.doc)
+            self.doc = None
+        super().done(result)
+
     def update_buttons(self):
         self.prev_btn.setEnabled(self.current_page > 0)
         self.next_btn.setEnabled(self.current_page < self.total_pages - 1)
@@ -181,15 +373,42 @@ class BookStoreApp(QMainWindow):
         self.setGeometry(100, 100, 1200, 800)
 
         self.init_db()
+        # Продажи записываются единственным писателем группами транзакций
+        self.write_queue = WriteQueue(self.db.path)
+        self.callbacks = MainThreadCallbacks(self)
+        # Статистика считается в фоне и кэшируется до следующего изменения продаж или каталога
+        self.stats = StatsService(self.db, QWEN_STATS, daily_timeline, parent=self)
+        self.stats.failed.connect(
+            lambda e: QMessageBox.warning(self, "Ошибка", f"Ошибка загрузки статистики: {e}"))
+        self.stats_dialog = None
         self.init_ui()
+
+        # После изменений обновляем только затронутые строки таблиц и списка продаж
+        self.events = CatalogEvents(self)
+        self.events.book_saved.connect(self.books_model.upsert_row)
+        self.events.book_saved.connect(self.covers.invalidate)
+        self.events.book_saved.connect(self.patch_sales_combo)
+        self.events.book_deleted.connect(self.books_model.remove_row)
+        self.events.book_deleted.connect(self.patch_sales_combo)
+        self.events.sale_recorded.connect(lambda sale_id, book_id: self.sales_model.upsert_row(sale_id))
+
+        # Текст новых и изменённых PDF извлекается в фоне для поиска по содержимому книг
+        self.text_indexer = TextIndexer(self.db, self)
+        self.events.book_saved.connect(self.text_indexer.schedule)
+
         self.load_books()
+        self.load_sales()
+        if self.has_text_index:
+            self.text_indexer.schedule()
 
     def init_db(self):
-        self.conn = sqlite3.connect('bookstore.db')
-        self.cursor = self.conn.cursor()
+        # Общий слой доступа к БД: одно соединение на запись и пул соединений на чтение
+        self.db = Database('bookstore.db')
+        self.conn = self.db.writer
+        cursor = self.conn.cursor()
 
         # Создаем таблицы, если они не существуют
-        self.cursor.execute("""
+        cursor.execute("""
                             CREATE TABLE IF NOT EXISTS books
                             (
                                 id
@@ -224,7 +443,7 @@ class BookStoreApp(QMainWindow):
                             )
                             """)
 
-        self.cursor.execute("""
+        cursor.execute("""
                             CREATE TABLE IF NOT EXISTS sales
                             (
                                 id
@@ -256,9 +475,13 @@ class BookStoreApp(QMainWindow):
                             """)
 
         self.conn.commit()
+        migrate(self.conn, QWEN_MIGRATIONS)
+        self.has_text_index = init_text_index(self.conn)
 
         if not os.path.exists('book_pdfs'):
             os.makedirs('book_pdfs')
+        # PDF хранятся по SHA-256 содержимого, одинаковые файлы - в одном экземпляре
+        self.pdf_storage = PdfStorage('book_pdfs')
 
     def init_ui(self):
         self.central_widget = QWidget()
@@ -299,14 +522,34 @@ class BookStoreApp(QMainWindow):
         view_btn.clicked.connect(self.view_pdf)
         btn_layout.addWidget(view_btn)
 
+        import_btn = QPushButton("Импорт каталога")
+        import_btn.clicked.connect(self.import_catalog)
+        btn_layout.addWidget(import_btn)
+
         layout.addLayout(btn_layout)
 
-        # Таблица книг
-        self.books_table = QTableWidget()
-        self.books_table.setColumnCount(7)
-        self.books_table.setHorizontalHeaderLabels(
-            ["ID", "Название", "Автор", "Цена", "Кол-во", "Дата добавления", "PDF"]
+        # Поиск фразы внутри текста PDF: результат - книга и страница
+        self.text_search_input = QLineEdit()
+        self.text_search_input.setPlaceholderText("Поиск фразы в тексте книг (Enter)")
+        self.text_search_input.setEnabled(self.has_text_index)
+        self.text_search_input.returnPressed.connect(self.search_book_text)
+        layout.addWidget(self.text_search_input)
+
+        # Таблица книг: строки подгружаются из БД порциями по мере прокрутки,
+        # обложки - из дискового кэша в фоне и только для видимых строк
+        self.covers = CoverLoader(self.db, parent=self)
+        self.books_model = SqlTableModel(
+            self.conn, 'books',
+            ("id", "title", "author", "price", "quantity",
+             "strftime('%d.%m.%Y', added_date)", "pdf_path"),
+            ["ID", "Название", "Автор", "Цена", "Кол-во", "Дата добавления", "PDF"],
+            order_by=("title", "id"), decoration_column=1, decoration=self.covers.cover, parent=self
         )
+        self.covers.cover_ready.connect(self.books_model.refresh_row)
+        self.books_table = QTableView()
+        self.books_table.setModel(self.books_model)
+        self.books_table.setIconSize(COVER_SIZE)
+        self.books_table.verticalHeader().setDefaultSectionSize(COVER_SIZE.height() + 4)
         self.books_table.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.books_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.books_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
@@ -329,18 +572,36 @@ class BookStoreApp(QMainWindow):
         self.sale_qty.setRange(1, 100)
         form.addRow("Количество:", self.sale_qty)
 
+        # Корзина: все позиции оформляются одной транзакцией
+        basket_btn = QPushButton("Добавить в корзину")
+        basket_btn.clicked.connect(self.add_to_basket)
+        form.addRow(basket_btn)
+
+        self.basket = []
+        self.basket_list = QListWidget()
+        self.basket_list.setMaximumHeight(100)
+        form.addRow("Корзина:", self.basket_list)
+
+        clear_basket_btn = QPushButton("Очистить корзину")
+        clear_basket_btn.clicked.connect(self.clear_basket)
+        form.addRow(clear_basket_btn)
+
         sell_btn = QPushButton("Оформить продажу")
         sell_btn.clicked.connect(self.sell_book)
         form.addRow(sell_btn)
 
         layout.addLayout(form)
 
-        # Таблица продаж
-        self.sales_table = QTableWidget()
-        self.sales_table.setColumnCount(6)
-        self.sales_table.setHorizontalHeaderLabels(
-            ["Дата", "ID книги", "Название", "Цена", "Кол-во", "Сумма"]
+        # Таблица продаж, новые сверху
+        right = Qt.AlignRight | Qt.AlignVCenter
+        self.sales_model = SqlTableModel(
+            self.conn, 'sales',
+            ("strftime('%d.%m.%Y %H:%M', date)", "book_id", "book_title", "price", "quantity", "total"),
+            ["Дата", "ID книги", "Название", "Цена", "Кол-во", "Сумма"],
+            order_by=("date", "id"), descending=True, alignments={3: right, 5: right}, parent=self
         )
+        self.sales_table = QTableView()
+        self.sales_table.setModel(self.sales_model)
         self.sales_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
         layout.addWidget(self.sales_table)
 
@@ -351,46 +612,67 @@ class BookStoreApp(QMainWindow):
 
     def load_books(self):
         try:
-            self.cursor.execute("""
-                                SELECT id,
-                                       title,
-                                       author,
-                                       price,
-                                       quantity,
-                                       strftime('%d.%m.%Y', added_date) as added_date,
-                                       pdf_path
-                                FROM books
-                                ORDER BY title
-                                """)
-            books = self.cursor.fetchall()
-
-            self.books_table.setRowCount(len(books))
-            for row_idx, book in enumerate(books):
-                for col_idx, value in enumerate(book):
-                    item = QTableWidgetItem(str(value))
-                    self.books_table.setItem(row_idx, col_idx, item)
-
+            self.books_model.reload()
             self.update_sales_combo()
 
         except sqlite3.Error as e:
             QMessageBox.warning(self, "Ошибка", f"Не удалось загрузить книги: {str(e)}")
 
+    def selected_book(self):
+        rows = self.books_table.selectionModel().selectedRows()
+        if not rows:
+            return None
+        return self.books_model.row_data(rows[0].row())
+
     def update_sales_combo(self):
+        cursor = self.conn.cursor()
         self.sale_combo.clear()
-        self.cursor.execute("""
+        cursor.execute("""
                             SELECT id, title, quantity, price
                             FROM books
                             WHERE quantity > 0
                             ORDER BY title
                             """)
 
-        for book in self.cursor.fetchall():
-            self.sale_combo.addItem(
-                f"{book[1]} (ID: {book[0]}, {book[2]} шт., {book[3]} руб.)",
-                book[0]
-            )
+        for book in cursor.fetchall():
+            self.sale_combo.addItem(self.sales_combo_text(book), book[0])
+            self.sale_combo.setItemData(self.sale_combo.count() - 1, book[1], TITLE_ROLE)
+
+    def sales_combo_text(self, book):
+        return f"{book[1]} (ID: {book[0]}, {book[2]} шт., {book[3]} руб.)"
+
+    def patch_sales_combo(self, book_id):
+        cursor = self.conn.cursor()
+        index = self.sale_combo.findData(book_id)
+        cursor.execute("""
+                            SELECT id, title, quantity, price
+                            FROM books
+                            WHERE id = ?
+                            """, (book_id,))
+        book = cursor.fetchone()
+
+        # Книга удалена или закончилась - убираем из списка продаж
+        if not book or book[2] <= 0:
+            if index >= 0:
+                self.sale_combo.removeItem(index)
+            return
+
+        if index >= 0 and self.sale_combo.itemData(index, TITLE_ROLE) == book[1]:
+            self.sale_combo.setItemText(index, self.sales_combo_text(book))
+            return
+        if index >= 0:
+            self.sale_combo.removeItem(index)
+
+        position = self.sale_combo.count()
+        for i in range(self.sale_combo.count()):
+            if self.sale_combo.itemData(i, TITLE_ROLE) > book[1]:
+                position = i
+                break
+        self.sale_combo.insertItem(position, self.sales_combo_text(book), book[0])
+        self.sale_combo.setItemData(position, book[1], TITLE_ROLE)
 
     def add_book(self):
+        cursor = self.conn.cursor()
         dialog = BookEditor()
         if dialog.exec_() == QDialog.Accepted:
             data = dialog.get_data()
@@ -407,48 +689,64 @@ class BookStoreApp(QMainWindow):
                 QMessageBox.warning(self, "Ошибка", "Некорректная цена!")
                 return
 
-            # Копируем PDF
-            new_pdf_path = ""
-            if data['pdf_path']:
+            def insert_book(result=None):
+                new_pdf_path = ""
                 try:
-                    filename = f"{data['title'][:50]}_{data['author'][:50]}.pdf"
-                    filename = "".join(c for c in filename if c.isalnum() or c in (' ', '.', '_')).rstrip()
-                    new_pdf_path = os.path.join('book_pdfs', filename)
-                    shutil.copy2(data['pdf_path'], new_pdf_path)
-                except Exception as e:
-                    QMessageBox.warning(self, "Ошибка", f"Не удалось скопировать PDF: {str(e)}")
-                    return
-
-            try:
-                self.cursor.execute("""
-                                    INSERT INTO books
-                                        (title, author, price, description, pdf_path, quantity)
-                                    VALUES (?, ?, ?, ?, ?, ?)
-                                    """, (data['title'], data['author'], price,
-                                          data['description'], new_pdf_path, data['quantity']))
-
-                self.conn.commit()
-                self.load_books()
-                QMessageBox.information(self, "Успех", "Книга успешно добавлена!")
-
-            except sqlite3.Error as e:
-                QMessageBox.warning(self, "Ошибка", f"Ошибка базы данных: {str(e)}")
+                    if result is not None:
+                        self.pdf_storage.register(self.conn, result.stored)
+                        new_pdf_path = result.stored.path
+                    cursor.execute("""
+                                        INSERT INTO books
+                                            (title, author, price, description, pdf_path, quantity)
+                                        VALUES (?, ?, ?, ?, ?, ?)
+                                        """, (data['title'], data['author'], price,
+                                              data['description'], new_pdf_path, data['quantity']))
+
+                    self.conn.commit()
+                    self.events.book_saved.emit(cursor.lastrowid)
+                    QMessageBox.information(self, "Успех", "Книга успешно добавлена!")
+
+                except sqlite3.Error as e:
+                    self.conn.rollback()
+                    QMessageBox.warning(self, "Ошибка", f"Ошибка базы данных: {str(e)}")
+
+            # Книга записывается только после того, как PDF скопирован в хранилище
+            if data['pdf_path']:
+                self.store_pdf(data['pdf_path'], insert_book)
+            else:
+                insert_book()
+
+    def store_pdf(self, pdf_path, on_stored):
+        # Копирование, хэширование и проверка PDF идут в фоне с индикатором и кнопкой отмены
+        job = IngestJob(self.pdf_storage, pdf_path, self)
+        job.show_progress("Копирование PDF...", "Отмена", self)
+        job.finished.connect(lambda result: self.on_pdf_stored(result, on_stored))
+        job.failed.connect(lambda e: QMessageBox.warning(self, "Ошибка", f"Не удалось скопировать PDF: {e}"))
+        job.start()
+
+    def on_pdf_stored(self, result, on_stored):
+        try:
+            on_stored(result)
+        finally:
+            # Книга записана (файл держит её ссылка) или запись не удалась (файл удалит сборщик мусора)
+            self.pdf_storage.release(self.db, result.stored)
 
     def edit_book(self):
-        selected = self.books_table.selectedItems()
-        if not selected:
+        cursor = self.conn.cursor()
+        book = self.selected_book()
+        if book is None:
             QMessageBox.warning(self, "Ошибка", "Выберите книгу для редактирования!")
             return
 
-        book_id = self.books_table.item(selected[0].row(), 0).text()
+        book_id = book[0]
 
-        self.cursor.execute("""
+        cursor.execute("""
                             SELECT title, author, price, quantity, description, pdf_path
                             FROM books
                             WHERE id = ?
                             """, (book_id,))
 
-        book = self.cursor.fetchone()
+        book = cursor.fetchone()
         if not book:
             QMessageBox.warning(self, "Ошибка", "Книга не найдена!")
             return
@@ -478,50 +776,57 @@ class BookStoreApp(QMainWindow):
                 QMessageBox.warning(self, "Ошибка", "Некорректная цена!")
                 return
 
-            # Обновляем PDF если он был изменен
-            new_pdf_path = book_data['pdf_path']
-            if new_data['pdf_path'] and new_data['pdf_path'] != book_data['pdf_path']:
+            def update_book(result=None):
+                new_pdf_path = book_data['pdf_path']
                 try:
-                    if os.path.exists(book_data['pdf_path']):
-                        os.remove(book_data['pdf_path'])
-
-                    filename = f"{new_data['title'][:50]}_{new_data['author'][:50]}.pdf"
-                    filename = "".join(c for c in filename if c.isalnum() or c in (' ', '.', '_')).rstrip()
-                    new_pdf_path = os.path.join('book_pdfs', filename)
-                    shutil.copy2(new_data['pdf_path'], new_pdf_path)
-                except Exception as e:
-                    QMessageBox.warning(self, "Ошибка", f"Не удалось обновить PDF: {str(e)}")
+                    if result is not None:
+                        self.pdf_storage.register(self.conn, result.stored)
+                        new_pdf_path = result.stored.path
+                    cursor.execute("""
+                                        UPDATE books
+                                        SET title       = ?,
+                                            author      = ?,
+                                            price       = ?,
+                                            quantity    = ?,
+                                            description = ?,
+                                            pdf_path    = ?
+                                        WHERE id = ?
+                                        """, (new_data['title'], new_data['author'], price,
+                                              new_data['quantity'], new_data['description'],
+                                              new_pdf_path, book_id))
+
+                    self.conn.commit()
+                except sqlite3.Error as e:
+                    self.conn.rollback()
+                    QMessageBox.warning(self, "Ошибка", f"Ошибка базы данных: {str(e)}")
                     return
 
-            try:
-                self.cursor.execute("""
-                                    UPDATE books
-                                    SET title       = ?,
-                                        author      = ?,
-                                        price       = ?,
-                                        quantity    = ?,
-                                        description = ?,
-                                        pdf_path    = ?
-                                    WHERE id = ?
-                                    """, (new_data['title'], new_data['author'], price,
-                                          new_data['quantity'], new_data['description'],
-                                          new_pdf_path, book_id))
-
-                self.conn.commit()
-                self.load_books()
+                if result is not None:
+                    # Файл, скопированный до появления хранилища, принадлежит только этой книге;
+                    # файлы хранилища удаляет сборщик, когда на них не остаётся ссылок
+                    old_path = book_data['pdf_path']
+                    if old_path and not self.pdf_storage.is_managed(old_path) and os.path.exists(old_path):
+                        document_pool.discard(old_path)
+                        os.remove(old_path)
+                self.events.book_saved.emit(book_id)
+                self.pdf_storage.collect_garbage(self.db, document_pool.discard)
                 QMessageBox.information(self, "Успех", "Данные книги обновлены!")
 
-            except sqlite3.Error as e:
-                QMessageBox.warning(self, "Ошибка", f"Ошибка базы данных: {str(e)}")
+            # Обновляем PDF если он был изменен
+            if new_data['pdf_path'] and new_data['pdf_path'] != book_data['pdf_path']:
+                self.store_pdf(new_data['pdf_path'], update_book)
+            else:
+                update_book()
 
     def delete_book(self):
-        selected = self.books_table.selectedItems()
-        if not selected:
+        cursor = self.conn.cursor()
+        book = self.selected_book()
+        if book is None:
             QMessageBox.warning(self, "Ошибка", "Выберите книгу для удаления!")
             return
 
-        book_id = self.books_table.item(selected[0].row(), 0).text()
-        book_title = self.books_table.item(selected[0].row(), 1).text()
+        book_id = book[0]
+        book_title = book[1]
 
         reply = QMessageBox.question(
             self, "Подтверждение",
@@ -531,28 +836,57 @@ class BookStoreApp(QMainWindow):
 
         if reply == QMessageBox.Yes:
             try:
-                # Удаляем PDF файл
-                pdf_path = self.books_table.item(selected[0].row(), 6).text()
-                if pdf_path and os.path.exists(pdf_path):
+                # Удаляем PDF, скопированный до появления хранилища
+                pdf_path = book[6]
+                if pdf_path and not self.pdf_storage.is_managed(pdf_path) and os.path.exists(pdf_path):
+                    document_pool.discard(pdf_path)
                     os.remove(pdf_path)
 
                 # Удаляем книгу из БД
-                self.cursor.execute("DELETE FROM books WHERE id = ?", (book_id,))
+                cursor.execute("DELETE FROM books WHERE id = ?", (book_id,))
                 self.conn.commit()
 
-                self.load_books()
+                self.events.book_deleted.emit(book_id)
+                # Файл хранилища удаляется, только если на него больше не ссылается ни одна книга
+                self.pdf_storage.collect_garbage(self.db, document_pool.discard)
                 QMessageBox.information(self, "Успех", "Книга успешно удалена!")
 
             except sqlite3.Error as e:
                 QMessageBox.warning(self, "Ошибка", f"Ошибка базы данных: {str(e)}")
 
+    def import_catalog(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Выберите каталог", "", "Каталог (*.csv *.jsonl *.ndjson)"
+        )
+        if not path:
+            return
+
+        # Импорт идёт в фоне пачками; каталог перечитывается, когда он закончен или прерван
+        job = ImportJob(self.db, path, self)
+        job.show_progress("Импорт каталога... Загружено книг:", "Отмена", self)
+        job.finished.connect(self.on_catalog_imported)
+        job.cancelled.connect(self.on_catalog_imported)
+        job.failed.connect(lambda e: QMessageBox.warning(self, "Ошибка", f"Ошибка импорта: {e}"))
+        job.failed.connect(lambda e: self.load_books())
+        job.start()
+
+    def on_catalog_imported(self, result):
+        self.load_books()
+        QMessageBox.information(
+            self, "Импорт",
+            ("Импорт прерван\n" if result['cancelled'] else "")
+            + f"Импортировано книг: {result['imported']}\n"
+            f"Пропущено строк: {result['skipped']}\n"
+            f"Скорость: {result['rows_per_sec']:.0f} строк/с"
+        )
+
     def view_pdf(self):
-        selected = self.books_table.selectedItems()
-        if not selected:
+        book = self.selected_book()
+        if book is None:
             QMessageBox.warning(self, "Ошибка", "Выберите книгу для просмотра!")
             return
 
-        pdf_path = self.books_table.item(selected[0].row(), 6).text()
+        pdf_path = book[6]
         if not pdf_path:
             QMessageBox.warning(self, "Ошибка", "Для этой книги нет PDF файла!")
             return
@@ -564,226 +898,195 @@ class BookStoreApp(QMainWindow):
         viewer = PDFViewer(pdf_path, self)
         viewer.exec_()
 
-    def sell_book(self):
+    def search_book_text(self):
+        text = self.text_search_input.text().strip()
+        if not text:
+            return
+        with self.db.reader() as conn:
+            hits = search_text(conn, text)
+        if not hits:
+            QMessageBox.information(self, "Поиск", "В тексте книг ничего не найдено.")
+            return
+        dialog = TextHitsDialog(hits, f"Поиск в тексте: {text}", "стр. {page}", self)
+        dialog.hit_activated.connect(self.open_text_hit)
+        dialog.exec_()
+
+    def open_text_hit(self, hit):
+        if not os.path.exists(hit.pdf_path):
+            QMessageBox.warning(self, "Ошибка", "PDF файл не найден!")
+            return
+        viewer = PDFViewer(hit.pdf_path, self, hit.page)
+        viewer.exec_()
+
+    def add_to_basket(self):
         if self.sale_combo.count() == 0:
             QMessageBox.warning(self, "Ошибка", "Нет доступных книг для продажи!")
             return
 
         book_id = self.sale_combo.currentData()
         qty = self.sale_qty.value()
+        title = self.sale_combo.itemData(self.sale_combo.currentIndex(), TITLE_ROLE)
+        self.basket.append((book_id, qty))
+        self.basket_list.addItem(f"{title} (ID: {book_id}) × {qty}")
 
-        # Получаем данные о книге
-        self.cursor.execute("""
-                            SELECT title, price, quantity
-                            FROM books
-                            WHERE id = ?
-                            """, (book_id,))
-
-        book = self.cursor.fetchone()
-        if not book:
-            QMessageBox.warning(self, "Ошибка", "Книга не найдена!")
-            return
+    def clear_basket(self):
+        self.basket = []
+        self.basket_list.clear()
 
-        title, price, available = book
-
-        if qty > available:
-            QMessageBox.warning(
-                self, "Ошибка",
-                f"Недостаточно книг в наличии! Доступно: {available}"
-            )
-            return
+    def sell_book(self):
+        # Пустая корзина - продаётся книга, выбранная в форме
+        basket = self.basket
+        if not basket:
+            if self.sale_combo.count() == 0:
+                QMessageBox.warning(self, "Ошибка", "Нет доступных книг для продажи!")
+                return
+            basket = [(self.sale_combo.currentData(), self.sale_qty.value())]
 
-        # Оформляем продажу
-        total = price * qty
-        date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # Остатки проверяются и списываются условным UPDATE; вся корзина - одна транзакция.
+        # Результат приходит, когда продажа уже записана на диск
+        future = self.write_queue.submit(apply_basket, QWEN_SALES, list(basket))
+        self.callbacks.watch(future, self.on_basket_sold)
 
+    def on_basket_sold(self, future):
         try:
-            # Добавляем запись о продаже
-            self.cursor.execute("""
-                                INSERT INTO sales
-                                    (book_id, book_title, date, quantity, price, total)
-                                VALUES (?, ?, ?, ?, ?, ?)
-                                """, (book_id, title, date, qty, price, total))
-
-            # Обновляем количество книг
-            self.cursor.execute("""
-                                UPDATE books
-                                SET quantity = quantity - ?
-                                WHERE id = ?
-                                """, (qty, book_id))
-
-            self.conn.commit()
-
-            # Обновляем интерфейс
-            self.load_books()
-            self.load_sales()
-
-            QMessageBox.information(
-                self, "Успех",
-                f"Продажа оформлена!\n{title}\n{qty} шт. × {price} руб. = {total} руб."
-            )
+            sold = future.result()
+
+        except OutOfStock as e:
+            if e.available is None:
+                QMessageBox.warning(self, "Ошибка", "Книга не найдена!")
+            else:
+                QMessageBox.warning(
+                    self, "Ошибка",
+                    f"Недостаточно книг в наличии (ID: {e.book_id})! Доступно: {e.available}"
+                )
+            return
 
         except sqlite3.Error as e:
             QMessageBox.warning(self, "Ошибка", f"Ошибка базы данных: {str(e)}")
+            return
+
+        self.clear_basket()
+
+        # Обновляем интерфейс
+        for line in sold:
+            for sale_id in line.sale_ids:
+                self.events.sale_recorded.emit(sale_id, line.book_id)
+            self.events.book_saved.emit(line.book_id)
+
+        lines = "\n".join(f"{line.title}: {line.quantity} шт. × {line.price} руб. = {line.total} руб."
+                          for line in sold)
+        QMessageBox.information(
+            self, "Успех",
+            f"Продажа оформлена!\n{lines}\nИтого: {sum(line.total for line in sold)} руб."
+        )
 
     def load_sales(self):
         try:
-            self.cursor.execute("""
-                                SELECT strftime('%d.%m.%Y %H:%M', date) as date,
-                    book_id,
-                    book_title,
-                    price,
-                    quantity,
-                    total
-                                FROM sales
-                                ORDER BY date DESC
-                                    LIMIT 100
-                                """)
-            sales = self.cursor.fetchall()
-
-            self.sales_table.setRowCount(len(sales))
-            for row_idx, sale in enumerate(sales):
-                for col_idx, value in enumerate(sale):
-                    item = QTableWidgetItem(str(value))
-                    if col_idx in (3, 5):  # Цена и сумма
-                        item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-                    self.sales_table.setItem(row_idx, col_idx, item)
+            self.sales_model.reload()
 
         except sqlite3.Error as e:
             QMessageBox.warning(self, "Ошибка", f"Не удалось загрузить продажи: {str(e)}")
 
     def show_stats(self):
         try:
-            # Получаем основные метрики
-            self.cursor.execute("""
-                                SELECT COUNT(*)      as total_sales,
-                                       SUM(quantity) as total_books,
-                                       SUM(total)    as total_amount,
-                                       AVG(total)    as avg_check
-                                FROM sales
-                                """)
-            stats = self.cursor.fetchone()
-
-            # Получаем топ-5 книг
-            self.cursor.execute("""
-                                SELECT book_title, SUM(quantity) as total_qty, SUM(total) as total_sum
-                                FROM sales
-                                GROUP BY book_title
-                                ORDER BY total_qty DESC LIMIT 5
-                                """)
-            top_books = self.cursor.fetchall()
-
-            # Создаем диалог для отображения статистики
-            dialog = QDialog(self)
-            dialog.setWindowTitle("Статистика продаж")
-            dialog.setGeometry(200, 200, 800, 600)
-
-            layout = QVBoxLayout()
-
-            # Основные метрики
-            metrics = QGroupBox("Ключевые показатели")
-            metrics_layout = QFormLayout()
-
-            metrics_layout.addRow("Общая выручка:", QLabel(f"{stats[2]:.2f} руб."))
-            metrics_layout.addRow("Продано книг:", QLabel(str(stats[1])))
-            metrics_layout.addRow("Средний чек:", QLabel(f"{stats[3]:.2f} руб."))
-
-            top_text = "\n".join([f"{i + 1}. {book[0]} - {book[1]} шт. ({book[2]:.2f} руб.)"
-                                  for i, book in enumerate(top_books)])
-            metrics_layout.addRow("Топ-5 книг:", QLabel(top_text if top_books else "Нет данных"))
-
-            metrics.setLayout(metrics_layout)
-            layout.addWidget(metrics)
-
-            # Графики
-            fig = plt.figure(figsize=(10, 5))
-            canvas = FigureCanvas(fig)
-
-            # График продаж по дням
-            self.cursor.execute("""
-                                SELECT date (date) as day, SUM (total) as daily_total
-                                FROM sales
-                                GROUP BY day
-                                ORDER BY day
-                                """)
-            sales_data = self.cursor.fetchall()
-
-            if sales_data:
-                dates = [row[0] for row in sales_data]
-                amounts = [row[1] for row in sales_data]
-
-                ax = fig.add_subplot(111)
-                ax.bar(dates, amounts)
-                ax.set_title('Продажи по дням')
-                ax.set_xlabel('Дата')
-                ax.set_ylabel('Сумма (руб)')
-                plt.xticks(rotation=45)
-                fig.tight_layout()
-
-            layout.addWidget(canvas)
-
-            # Кнопка экспорта
-            if stats[0] > 0:  # Если есть данные для экспорта
-                export_btn = QPushButton("Экспорт в Excel")
-                export_btn.clicked.connect(lambda: self.export_stats_to_excel(dialog))
-                layout.addWidget(export_btn)
-
-            dialog.setLayout(layout)
-            dialog.exec_()
-
+            snapshot = self.stats.request()
         except sqlite3.Error as e:
             QMessageBox.warning(self, "Ошибка", f"Ошибка загрузки статистики: {str(e)}")
+            return
+
+        # Диалог и график создаются один раз; новый снимок только обновляет значения
+        if self.stats_dialog is None:
+            self.build_stats_dialog()
+        # Пока считается свежий снимок, показывается прежний
+        if snapshot is not None:
+            self.fill_stats(snapshot)
+        self.stats_dialog.exec_()
+
+    def build_stats_dialog(self):
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Статистика продаж")
+        dialog.setGeometry(200, 200, 800, 600)
+
+        layout = QVBoxLayout()
+
+        # Основные метрики
+        metrics = QGroupBox("Ключевые показатели")
+        metrics_layout = QFormLayout()
+        self.revenue_label = QLabel("Загрузка...")
+        self.books_sold_label = QLabel("Загрузка...")
+        self.avg_check_label = QLabel("Загрузка...")
+        self.top_books_label = QLabel("Загрузка...")
+        metrics_layout.addRow("Общая выручка:", self.revenue_label)
+        metrics_layout.addRow("Продано книг:", self.books_sold_label)
+        metrics_layout.addRow("Средний чек:", self.avg_check_label)
+        metrics_layout.addRow("Топ-5 книг:", self.top_books_label)
+        metrics.setLayout(metrics_layout)
+        layout.addWidget(metrics)
+
+        # График продаж по дням
+        self.stats_dashboard = StatsDashboard(figsize=(10, 5))
+        self.daily_series = self.stats_dashboard.add(SeriesPanel(
+            self.stats_dashboard.figure.add_subplot(111), 'Продажи по дням',
+            xlabel='Дата', ylabel='Сумма (руб)', dates=True))
+        # Масштаб и прокрутка графика перечитывают только видимый диапазон дней
+        self.timeline = TimelineNavigator(self.db, QWEN_DAILY_WINDOW, self.stats_dashboard, self.daily_series, self)
+        layout.addWidget(NavigationToolbar(self.stats_dashboard, dialog))
+        layout.addWidget(self.stats_dashboard)
+
+        # Кнопка экспорта
+        self.stats_export_btn = QPushButton("Экспорт в Excel")
+        self.stats_export_btn.clicked.connect(lambda: self.export_stats_to_excel(dialog))
+        self.stats_export_btn.hide()
+        layout.addWidget(self.stats_export_btn)
+
+        dialog.setLayout(layout)
+        self.stats_dialog = dialog
+        self.stats.snapshot_ready.connect(self.fill_stats)
+
+    def fill_stats(self, snapshot):
+        stats = snapshot.results['totals'][0]
+        top_books = snapshot.results['top_books']
+
+        self.revenue_label.setText(f"{stats[2]:.2f} руб.")
+        self.books_sold_label.setText(str(stats[1]))
+        self.avg_check_label.setText(f"{stats[3]:.2f} руб.")
+        top_text = "\n".join([f"{i + 1}. {book[0]} - {book[1]} шт. ({book[2]:.2f} руб.)"
+                              for i, book in enumerate(top_books)])
+        self.top_books_label.setText(top_text if top_books else "Нет данных")
+
+        self.timeline.show(snapshot.data)
+
+        self.stats_export_btn.setVisible(stats[0] > 0)  # Если есть данные для экспорта
 
     def export_stats_to_excel(self, parent):
-        try:
-            # Получаем все данные о продажах
-            self.cursor.execute("""
-                                SELECT
-                                    date as "Дата продажи", book_id as "ID книги", book_title as "Название книги", price as "Цена", quantity as "Количество", total as "Сумма"
-                                FROM sales
-                                ORDER BY date DESC
-                                """)
-            sales_data = self.cursor.fetchall()
-            columns = [desc[0] for desc in self.cursor.description]
-
-            # Создаем DataFrame
-            df = pd.DataFrame(sales_data, columns=columns)
-
-            # Выбираем файл для сохранения
-            file_path, _ = QFileDialog.getSaveFileName(
-                parent, "Сохранить как", "Статистика_продаж.xlsx",
-                "Excel Files (*.xlsx)"
-            )
-
-            if file_path:
-                # Сохраняем в Excel
-                writer = pd.ExcelWriter(file_path, engine='xlsxwriter')
-                df.to_excel(writer, sheet_name='Продажи', index=False)
-
-                # Добавляем сводные таблицы
-                workbook = writer.book
-                worksheet = writer.sheets['Продажи']
-
-                # Форматирование
-                header_format = workbook.add_format({
-                    'bold': True,
-                    'text_wrap': True,
-                    'valign': 'top',
-                    'border': 1
-                })
-
-                for col_num, value in enumerate(df.columns.values):
-                    worksheet.write(0, col_num, value, header_format)
-                    worksheet.set_column(col_num, col_num, max(len(value), 12))
-
-                writer.save()
-                QMessageBox.information(parent, "Успех", "Данные успешно экспортированы")
+        # Выбираем файл для сохранения
+        file_path, selected = QFileDialog.getSaveFileName(
+            parent, "Сохранить как", "Статистика_продаж.xlsx", FILE_FILTER
+        )
+        if not file_path:
+            return
+        file_path = with_extension(file_path, selected)
 
-        except Exception as e:
-            QMessageBox.warning(parent, "Ошибка", f"Ошибка экспорта: {str(e)}")
+        # В Excel рядом с продажами - сводные листы по книгам, авторам, дням и месяцам, посчитанные SQLite.
+        # Всё выгружается в фоне порциями: в памяти не больше одной порции строк
+        try:
+            sheets = report_sheets(file_path, QWEN_PIVOTS, ('Продажи', QWEN_EXPORT))
+        except ExportError as e:
+            QMessageBox.warning(parent, "Ошибка", f"Ошибка экспорта: {e}")
+            return
+        job = ExportJob(self.db, sheets, file_path, QWEN_EXPORT_COUNT, self)
+        job.show_progress("Экспорт продаж...", "Отмена", parent)
+        job.finished.connect(lambda rows: QMessageBox.information(
+            parent, "Успех", f"Данные успешно экспортированы (строк: {rows})"))
+        job.failed.connect(lambda e: QMessageBox.warning(parent, "Ошибка", f"Ошибка экспорта: {e}"))
+        job.start()
 
     def closeEvent(self, event):
-        self.conn.close()
+        self.text_indexer.stop()
+        shutdown_shared_pool()
+        self.write_queue.close()
+        document_pool.close_all()
+        self.db.close()
         event.accept()
 
 
@@ -0,0 +1,104 @@
+import threading
+from typing import Callable
+
+from PyQt5.QtCore import QObject, QRunnable, Qt, QThreadPool, pyqtSignal
+from PyQt5.QtWidgets import QProgressDialog
+
+# Долгая операция в фоне с окном прогресса: копирование PDF (pdf_ingest.py), экспорт продаж
+# (sales_export.py), импорт каталога (bulk_import.py). Подкласс реализует work() - она выполняется
+# в потоке пула, - а исключения, которыми work() сообщает об отмене, перечисляет в cancelled_errors.
+# После finished, failed или cancelled задание закрывает окно прогресса и удаляет себя.
+
+
+class _JobSignals(QObject):
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal(object)
+
+
+class _JobTask(QRunnable):
+    def __init__(self, job):
+        super().__init__()
+        self.job = job
+
+    def run(self):
+        job = self.job
+        try:
+            result = job.work(job.stop.is_set)
+        except job.cancelled_errors:
+            job.signals.cancelled.emit(None)
+        except Exception as e:
+            job.signals.failed.emit(str(e))
+        else:
+            (job.signals.cancelled if job.was_cancelled(result) else job.signals.finished).emit(result)
+
+
+class BackgroundJob(QObject):
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    # Результат прерванной операции, если она его возвращает (иначе None)
+    cancelled = pyqtSignal(object)
+
+    cancelled_errors = ()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.stop = threading.Event()
+        self.dialog = None
+        self.percent = -1
+
+        self.signals = _JobSignals(self)
+        self.signals.progress.connect(self.progress)
+        self.signals.finished.connect(self.finished)
+        self.signals.failed.connect(self.failed)
+        self.signals.cancelled.connect(self.cancelled)
+        for signal in (self.signals.finished, self.signals.failed, self.signals.cancelled):
+            signal.connect(self.done)
+
+    @classmethod
+    def pool(cls) -> QThreadPool:
+        # У каждого вида заданий свой пул из одного потока: копирования, экспорты и импорты
+        # упираются в диск или в единственного писателя базы, так что идут по одному
+        pool = cls.__dict__.get('_pool')
+        if pool is None:
+            pool = cls._pool = QThreadPool()
+            pool.setMaxThreadCount(1)
+        return pool
+
+    def work(self, cancelled: Callable[[], bool]):
+        # Выполняется в потоке пула
+        raise NotImplementedError
+
+    def was_cancelled(self, result) -> bool:
+        return False
+
+    def report_percent(self, done: int, total: int):
+        # Сигнал только при смене процента, а не на каждую порцию
+        percent = done * 100 // total if total else 100
+        if percent != self.percent:
+            self.percent = percent
+            self.signals.progress.emit(percent)
+
+    def show_progress(self, label: str, cancel_text: str, parent=None, maximum: int = 100):
+        # maximum = 0 - индикатор без шкалы
+        self.dialog = QProgressDialog(label, cancel_text, 0, maximum, parent)
+        self.dialog.setWindowModality(Qt.WindowModal)
+        self.dialog.setMinimumDuration(300)
+        self.dialog.canceled.connect(self.cancel)
+        if maximum:
+            self.progress.connect(self.dialog.setValue)
+
+    def start(self):
+        self.pool().start(_JobTask(self))
+
+    def cancel(self):
+        self.stop.set()
+
+    def done(self, *args):
+        if self.dialog is not None:
+            self.dialog.reset()
+            self.dialog.deleteLater()
+            self.dialog = None
+        self.deleteLater()
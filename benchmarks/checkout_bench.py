@@ -0,0 +1,123 @@
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict
+
+from checkout import QWEN_SALES, OutOfStock, checkout
+from repository import BUSY_TIMEOUT_MS, configure_connection
+from sales_summary import QWEN_SUMMARY
+
+# Нагрузочный тест оформления продаж (checkout.py): несколько касс продают одновременно,
+# в конце проверяется, что остатки согласованы с продажами.
+# Запуск из корня репозитория: python -m benchmarks.checkout_bench
+
+BENCH_SCHEMA = '''
+    CREATE TABLE books (
+        id INTEGER PRIMARY KEY,
+        title TEXT NOT NULL,
+        price REAL,
+        quantity INTEGER NOT NULL
+    );
+    CREATE TABLE sales (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        book_id INTEGER,
+        book_title TEXT,
+        date TEXT,
+        quantity INTEGER,
+        price REAL,
+        total REAL
+    );
+'''
+
+
+def create_bench_db(path: str, books: int, stock: int):
+    # Схема Qwen вместе с триггерами сводных таблиц: в замер входит и их обновление
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.executescript(BENCH_SCHEMA + QWEN_SUMMARY['schema'])
+    conn.executemany('INSERT INTO books (id, title, price, quantity) VALUES (?, ?, ?, ?)',
+                     ((i, f'Книга {i}', 100.0 + i % 50, stock) for i in range(1, books + 1)))
+    conn.commit()
+    conn.close()
+
+
+def run_benchmark(path: str, tills: int, seconds: float, books: int, stock: int, basket_size: int) -> Dict:
+    create_bench_db(path, books, stock)
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    totals = {'baskets': 0, 'copies': 0, 'rejected': 0}
+
+    def till(seed: int):
+        # Каждая касса - отдельное соединение, как отдельный процесс или рабочее место
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None,
+                               check_same_thread=False)
+        configure_connection(conn)
+        rng = random.Random(seed)
+        baskets = copies = rejected = 0
+        try:
+            while not stop.is_set():
+                basket = [(rng.randint(1, books), rng.randint(1, 3)) for _ in range(basket_size)]
+                try:
+                    sold = checkout(conn, QWEN_SALES, basket)
+                except OutOfStock:
+                    rejected += 1
+                    continue
+                baskets += 1
+                copies += sum(line.quantity for line in sold)
+        finally:
+            conn.close()
+            with lock:
+                totals['baskets'] += baskets
+                totals['copies'] += copies
+                totals['rejected'] += rejected
+
+    threads = [threading.Thread(target=till, args=(seed,)) for seed in range(tills)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    # Проверка: продано ровно столько, сколько списано, и ни один остаток не ушёл в минус
+    conn = sqlite3.connect(path)
+    try:
+        sold, = conn.execute('SELECT COALESCE(SUM(quantity), 0) FROM sales').fetchone()
+        left, lowest = conn.execute('SELECT SUM(quantity), MIN(quantity) FROM books').fetchone()
+    finally:
+        conn.close()
+    totals.update(
+        seconds=elapsed,
+        consistent=sold == books * stock - left == totals['copies'] and lowest >= 0,
+    )
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест оформления продаж несколькими кассами')
+    parser.add_argument('--tills', type=int, default=4, help='число одновременных касс (потоков)')
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--books', type=int, default=1000)
+    parser.add_argument('--stock', type=int, default=50, help='начальный остаток каждой книги')
+    parser.add_argument('--basket', type=int, default=3, help='позиций в корзине')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        result = run_benchmark(os.path.join(directory, 'checkout.db'), args.tills, args.seconds,
+                               args.books, args.stock, args.basket)
+    seconds = result['seconds']
+    print(f"Касс: {args.tills}, корзин: {result['baskets']} ({result['baskets'] / seconds:.0f} в секунду), "
+          f"экземпляров: {result['copies']} ({result['copies'] / seconds:.0f} в секунду)")
+    print(f"Отказов (нет в наличии): {result['rejected']}, "
+          f"остатки согласованы: {'да' if result['consistent'] else 'НЕТ'}")
+
+
+if __name__ == '__main__':
+    main()
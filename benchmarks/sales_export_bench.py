@@ -0,0 +1,122 @@
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from typing import Optional, Sequence, Tuple
+
+from migrations import QWEN_MIGRATIONS
+from queries import (GEMINI_EXPORT, GEMINI_EXPORT_COUNT, GEMINI_PIVOTS, QWEN_EXPORT, QWEN_EXPORT_COUNT,
+                     QWEN_PIVOTS)
+from sales_export import BATCH_ROWS, export_sheets, report_sheets
+from sales_summary import QWEN_SUMMARY, rebuild_script
+
+# Экспорт продаж (sales_export.py) из командной строки: из существующей базы или из временной
+# базы bookstore.db с заданным числом продаж, с замером времени и пика памяти процесса.
+# Запуск из корня репозитория: python -m benchmarks.sales_export_bench
+
+# Отчёты для командной строки: сводные листы, лист сырых продаж и число продаж
+REPORTS = {
+    'gemini': (GEMINI_PIVOTS, ('Продажи', GEMINI_EXPORT), GEMINI_EXPORT_COUNT),
+    'qwen': (QWEN_PIVOTS, ('Продажи', QWEN_EXPORT), QWEN_EXPORT_COUNT),
+}
+
+BENCH_SCHEMA = '''
+    CREATE TABLE books (
+        id INTEGER PRIMARY KEY,
+        title TEXT NOT NULL,
+        author TEXT NOT NULL,
+        price REAL,
+        quantity INTEGER
+    );
+    CREATE TABLE sales (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        book_id INTEGER,
+        book_title TEXT,
+        date TEXT,
+        quantity INTEGER,
+        price REAL,
+        total REAL
+    );
+'''
+
+
+def create_bench_db(path: str, books: int, sales: int):
+    # База в схеме bookstore.db: продажи за десять лет генерируются одним запросом, а индексы
+    # и сводные таблицы строятся после вставки, как при миграции существующей базы
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.executescript(BENCH_SCHEMA)
+        conn.executemany('INSERT INTO books (id, title, author, price, quantity) VALUES (?, ?, ?, ?, 0)',
+                         ((i, f'Книга {i}', f'Автор {i % 97}', 100.0 + i % 50) for i in range(1, books + 1)))
+        conn.execute('''
+            WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i + 1 < :sales)
+            INSERT INTO sales (book_id, book_title, date, quantity, price, total)
+            SELECT b.id, b.title,
+                   datetime('2015-01-01', '+' || (n.i * 3650 / :sales) || ' days', '+' || (n.i % 86400) || ' seconds'),
+                   1 + n.i % 3, b.price, b.price * (1 + n.i % 3)
+            FROM n JOIN books b ON b.id = 1 + n.i % :books
+        ''', {'sales': sales, 'books': books})
+        conn.commit()
+        conn.executescript(f'BEGIN; {QWEN_MIGRATIONS[0]}; {QWEN_SUMMARY["schema"]}; '
+                           f'{rebuild_script(QWEN_SUMMARY)} COMMIT;')
+    finally:
+        conn.close()
+
+
+def rss_peak_mb() -> float:
+    # resource есть только в POSIX; ru_maxrss - в килобайтах на Linux
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_export(database: str, output: str, sheets: Sequence[Tuple[str, str]], count_sql: Optional[str],
+               batch_rows: int):
+    conn = sqlite3.connect(f'file:{database}?mode=ro', uri=True)
+    try:
+        started = time.perf_counter()
+        results = export_sheets(conn, sheets, output, count_sql, batch_rows=batch_rows)
+        elapsed = time.perf_counter() - started
+    finally:
+        conn.close()
+    for result in results:
+        print(f'  {result.sheet}: строк {result.rows}, {result.seconds:.1f} с')
+    rows = sum(result.rows for result in results)
+    print(f'Строк: {rows}, {elapsed:.1f} с ({rows / elapsed if elapsed else 0:.0f} строк в секунду), '
+          f'пик памяти процесса: {rss_peak_mb():.0f} МБ')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Потоковый экспорт продаж и отчёта со сводными листами')
+    parser.add_argument('output', help='файл .xlsx, .csv или .parquet')
+    parser.add_argument('--database', help='books.db | library.db | bookstore.db')
+    parser.add_argument('--report', choices=REPORTS, help='отчёт со сводными листами вместо одного запроса')
+    parser.add_argument('--sql', default='SELECT * FROM sales', help='запрос, строки которого выгружаются')
+    parser.add_argument('--bench-sales', type=int,
+                        help='создать временную базу bookstore.db с этим числом продаж и выгрузить отчёт qwen')
+    parser.add_argument('--bench-books', type=int, default=10000)
+    parser.add_argument('--batch', type=int, default=BATCH_ROWS, help='строк в одной порции fetchmany')
+    args = parser.parse_args()
+
+    if args.bench_sales:
+        pivots, raw, count_sql = REPORTS['qwen']
+        with tempfile.TemporaryDirectory() as directory:
+            database = os.path.join(directory, 'bookstore.db')
+            started = time.perf_counter()
+            create_bench_db(database, args.bench_books, args.bench_sales)
+            print(f'База с {args.bench_sales} продажами создана за {time.perf_counter() - started:.1f} с')
+            run_export(database, args.output, report_sheets(args.output, pivots, raw), count_sql, args.batch)
+        return
+
+    if not args.database:
+        parser.error('нужна --database или --bench-sales')
+    if args.report:
+        pivots, raw, count_sql = REPORTS[args.report]
+        run_export(args.database, args.output, report_sheets(args.output, pivots, raw), count_sql, args.batch)
+    else:
+        run_export(args.database, args.output, [('Продажи', args.sql)], None, args.batch)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from sales_timeline import MAX_POINTS, build_timeline
+
+# Сколько точек остаётся на графике продаж (sales_timeline.py) после выбора шага и прореживания.
+# Запуск из корня репозитория: python -m benchmarks.sales_timeline_bench
+
+def main():
+    parser = argparse.ArgumentParser(description='Сравнение числа точек графика продаж до и после прореживания')
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--points', type=int, default=MAX_POINTS)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    start = date(2020, 1, 1)
+    rows = [((start + timedelta(days=i)).isoformat(), rng.uniform(0, 10000)) for i in range(365 * args.years)]
+    for label, first in (('вся история', rows[0][0]), ('последний месяц', rows[-30][0])):
+        window = [row for row in rows if row[0] >= first]
+        started = time.perf_counter()
+        timeline = build_timeline(window, first, window[-1][0], args.points)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f'{label}: дней {len(window)}, шаг {timeline.bucket}, точек {len(timeline.days)}, {elapsed:.1f} мс')
+
+
+if __name__ == '__main__':
+    main()
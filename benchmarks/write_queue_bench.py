@@ -0,0 +1,84 @@
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Optional
+
+from benchmarks.checkout_bench import create_bench_db
+from checkout import QWEN_SALES, apply_basket, checkout
+from repository import BUSY_TIMEOUT_MS, configure_connection
+from write_queue import MAX_DELAY, WriteQueue
+
+# Сравнение коммита на каждую продажу с групповой фиксацией через WriteQueue (write_queue.py).
+# Запуск из корня репозитория: python -m benchmarks.write_queue_bench
+
+def run_benchmark(path: str, tills: int, seconds: float, books: int, max_delay: Optional[float]) -> tuple:
+    # max_delay=None - каждая касса фиксирует свою продажу сама (тоже с synchronous=FULL)
+    create_bench_db(path, books, 10 ** 9)
+    write_queue = WriteQueue(path, max_delay) if max_delay is not None else None
+    stop = threading.Event()
+    lock = threading.Lock()
+    sold = [0]
+
+    def till(seed: int):
+        rng = random.Random(seed)
+        conn = None
+        if write_queue is None:
+            conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None,
+                                   check_same_thread=False)
+            configure_connection(conn)
+            conn.execute('PRAGMA synchronous = FULL')
+        count = 0
+        try:
+            while not stop.is_set():
+                basket = [(rng.randint(1, books), 1)]
+                if write_queue is None:
+                    checkout(conn, QWEN_SALES, basket)
+                else:
+                    # Касса ждёт подтверждения записи, как и при собственном коммите
+                    write_queue.submit(apply_basket, QWEN_SALES, basket).result()
+                count += 1
+        finally:
+            if conn is not None:
+                conn.close()
+            with lock:
+                sold[0] += count
+
+    threads = [threading.Thread(target=till, args=(seed,)) for seed in range(tills)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    commits = sold[0]
+    if write_queue is not None:
+        write_queue.close()
+        commits = write_queue.commits
+    return sold[0], elapsed, commits
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сравнение коммита на каждую продажу и групповой фиксации')
+    parser.add_argument('--tills', type=int, default=8, help='число одновременных касс (потоков)')
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--books', type=int, default=1000)
+    parser.add_argument('--delay', type=float, default=MAX_DELAY * 1000, help='окно группы, мс')
+    parser.add_argument('--dir', default=None, help='каталог для тестовой базы (диск, а не tmpfs)')
+    args = parser.parse_args()
+
+    for label, max_delay in (('коммит на продажу', None), (f'группы, окно {args.delay:g} мс', args.delay / 1000)):
+        with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+            sold, seconds, commits = run_benchmark(os.path.join(directory, 'sales.db'), args.tills,
+                                                   args.seconds, args.books, max_delay)
+        print(f'{label}: {sold / seconds:.0f} продаж в секунду, '
+              f'{sold / commits if commits else 0:.1f} продаж на коммит')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+import sqlite3
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, QObject, Qt, QVariant, pyqtSignal
+
+BATCH_SIZE = 256
+
+
+class CatalogEvents(QObject):
+    # Точечные уведомления об изменениях вместо полной перезагрузки таблиц
+    book_saved = pyqtSignal(int)
+    book_deleted = pyqtSignal(int)
+    sale_recorded = pyqtSignal(int, int)
+
+
+class SqlTableModel(QAbstractTableModel):
+    def __init__(self, conn: sqlite3.Connection, table: str, columns: Sequence[str],
+                 headers: Sequence[str], order_by: Sequence[str] = ('id',), descending: bool = False,
+                 alignments: Optional[Dict[int, int]] = None, batch_size: int = BATCH_SIZE,
+                 id_column: int = 0, decoration_column: Optional[int] = None,
+                 decoration: Optional[Callable[[int], object]] = None, parent=None):
+        super().__init__(parent)
+        self.conn = conn
+        self.table = table
+        self.columns = tuple(columns)
+        self.headers = tuple(headers)
+        # Ключ сортировки должен быть уникальным и заканчиваться на id:
+        # по последнему элементу ключа модель находит строку при точечном обновлении
+        self.order_by = tuple(f'{table}.{column}' for column in order_by)
+        self.descending = descending
+        self.alignments = alignments or {}
+        self.batch_size = batch_size
+        self.id_column = id_column
+        # Картинка (например, обложка) по id строки; запрашивается только для отрисовываемых строк
+        self.decoration_column = decoration_column
+        self.decoration = decoration
+
+        self.rows: List[Tuple] = []
+        self.keys: List[Optional[Tuple]] = []
+        self.ids: List[int] = []
+        self.last_key: Optional[Tuple] = None
+        self.exhausted = True
+        self.static = False
+
+    def reload(self):
+        self.beginResetModel()
+        self.rows = []
+        self.keys = []
+        self.ids = []
+        self.last_key = None
+        self.exhausted = False
+        self.static = False
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    def set_rows(self, rows: Sequence[Tuple]):
+        # Готовый результат поиска: догружать нечего
+        self.beginResetModel()
+        self.rows = [tuple(row) for row in rows]
+        self.keys = [None] * len(self.rows)
+        self.ids = [row[self.id_column] for row in self.rows]
+        self.last_key = None
+        self.exhausted = True
+        self.static = True
+        self.endResetModel()
+
+    def _fetch_batch(self) -> List[Tuple]:
+        direction = 'DESC' if self.descending else 'ASC'
+        select = ', '.join(self.order_by + self.columns)
+        order = ', '.join(f'{key} {direction}' for key in self.order_by)
+        sql = f'SELECT {select} FROM {self.table}'
+        params: list = []
+        if self.last_key is not None:
+            # Keyset-пагинация: продолжаем с последнего ключа, без OFFSET
+            keys = ', '.join(self.order_by)
+            placeholders = ', '.join('?' for _ in self.order_by)
+            sql += f" WHERE ({keys}) {'<' if self.descending else '>'} ({placeholders})"
+            params.extend(self.last_key)
+        sql += f' ORDER BY {order} LIMIT ?'
+        params.append(self.batch_size)
+        return self.conn.execute(sql, params).fetchall()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.exhausted:
+            return
+        batch = self._fetch_batch()
+        if len(batch) < self.batch_size:
+            self.exhausted = True
+        if not batch:
+            return
+        key_size = len(self.order_by)
+        self.last_key = batch[-1][:key_size]
+        first = len(self.rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(batch) - 1)
+        for row in batch:
+            self.keys.append(row[:key_size])
+            self.ids.append(row[key_size - 1])
+            self.rows.append(row[key_size:])
+        self.endInsertRows()
+
+    def _fetch_row(self, row_id: int) -> Optional[Tuple]:
+        select = ', '.join(self.order_by + self.columns)
+        return self.conn.execute(
+            f'SELECT {select} FROM {self.table} WHERE {self.table}.id = ?', (row_id,)
+        ).fetchone()
+
+    def _insert_position(self, key: Tuple) -> int:
+        low, high = 0, len(self.keys)
+        while low < high:
+            middle = (low + high) // 2
+            if (self.keys[middle] > key) if self.descending else (self.keys[middle] < key):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _find(self, row_id: int) -> int:
+        try:
+            return self.ids.index(row_id)
+        except ValueError:
+            return -1
+
+    def _remove_at(self, position: int):
+        self.beginRemoveRows(QModelIndex(), position, position)
+        del self.rows[position]
+        del self.keys[position]
+        del self.ids[position]
+        self.endRemoveRows()
+
+    def upsert_row(self, row_id: int):
+        row = self._fetch_row(row_id)
+        position = self._find(row_id)
+        if row is None:
+            if position >= 0:
+                self._remove_at(position)
+            return
+
+        key_size = len(self.order_by)
+        key, values = row[:key_size], row[key_size:]
+        if position >= 0:
+            if self.static or self.keys[position] == key:
+                self.rows[position] = values
+                self.dataChanged.emit(self.index(position, 0),
+                                      self.index(position, len(self.columns) - 1))
+                return
+            # Изменился ключ сортировки - строка переезжает на новое место
+            self._remove_at(position)
+        elif self.static:
+            # Результат поиска: новая строка может не подходить под фильтр
+            return
+
+        position = self._insert_position(key)
+        if position == len(self.rows) and not self.exhausted:
+            # Строка за пределами загруженного окна, её подгрузит fetchMore
+            return
+        self.beginInsertRows(QModelIndex(), position, position)
+        self.rows.insert(position, values)
+        self.keys.insert(position, key)
+        self.ids.insert(position, row_id)
+        self.endInsertRows()
+
+    def refresh_row(self, row_id: int):
+        # Данные строки не менялись, но её нужно перерисовать (например, загрузилась обложка)
+        position = self._find(row_id)
+        if position >= 0:
+            self.dataChanged.emit(self.index(position, 0), self.index(position, len(self.columns) - 1))
+
+    def remove_row(self, row_id: int):
+        position = self._find(row_id)
+        if position >= 0:
+            self._remove_at(position)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+        if role == Qt.DisplayRole:
+            value = self.rows[index.row()][index.column()]
+            return '' if value is None else str(value)
+        if role == Qt.TextAlignmentRole and index.column() in self.alignments:
+            return self.alignments[index.column()]
+        if role == Qt.DecorationRole and index.column() == self.decoration_column and self.decoration:
+            image = self.decoration(self.ids[index.row()])
+            return QVariant() if image is None else image
+        return QVariant()
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.headers[section]
+        return QVariant()
+
+    def row_data(self, row: int) -> Tuple:
+        return self.rows[row]
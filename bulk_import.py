@@ -0,0 +1,190 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+from collections import Counter
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from background_job import BackgroundJob
+from repository import BUSY_TIMEOUT_MS, Database, configure_connection
+from search_index import FTS_TABLE, has_search_index
+
+BATCH_SIZE = 10000
+
+# Один и тот же текст запроса: sqlite3 берёт подготовленный оператор из кэша соединения,
+# а executemany выполняет его для всей пачки без повторной компиляции
+INSERT_SQL = '''
+    INSERT INTO books (title, author, price, description, pdf_path, quantity)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+
+def read_rows(path: str) -> Iterator[Dict]:
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.jsonl', '.ndjson'):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+    else:
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            yield from csv.DictReader(f)
+
+
+def to_record(row: Dict) -> Optional[Tuple]:
+    title = str(row.get('title') or '').strip()
+    author = str(row.get('author') or '').strip()
+    if not title or not author:
+        return None
+    try:
+        price = float(row.get('price') or 0)
+        quantity = int(row.get('quantity') or 0)
+    except (TypeError, ValueError):
+        return None
+    return (title, author, price, row.get('description') or '', row.get('pdf_path') or '', quantity)
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    # Своё соединение на запись: писатель Database принадлежит GUI-потоку,
+    # а при конфликте с ним пачка ждёт busy_timeout
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+    configure_connection(conn)
+    return conn
+
+
+def insert_chunk(conn, chunk: List[Tuple]):
+    # Построчные триггеры AFTER INSERT ON books молчат, пока import_state.active = 1 (см. migrations.py),
+    # а их работа делается одним запросом на пачку. Флаг ставится и снимается внутри транзакции пачки:
+    # другие соединения его не видят, а при сбое он откатывается вместе с книгами, так что
+    # полнотекстовый индекс, счётчики ссылок на PDF и версия каталога не расходятся с books
+    conn.execute('UPDATE import_state SET active = 1')
+    last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM books').fetchone()[0]
+    conn.executemany(INSERT_SQL, chunk)
+    if has_search_index(conn):
+        conn.execute(f'''
+            INSERT INTO {FTS_TABLE} (rowid, title, author, description)
+            SELECT id, title, author, description FROM books WHERE id > ?
+        ''', (last_id,))
+    refs = Counter(record[4] for record in chunk if record[4])
+    conn.executemany('UPDATE pdf_blobs SET refcount = refcount + ? WHERE path = ?',
+                     ((count, path) for path, count in refs.items()))
+    # Одна новая версия на пачку, а не на каждую книгу
+    conn.execute("UPDATE data_versions SET version = version + 1 WHERE name = 'books'")
+    conn.execute('UPDATE import_state SET active = 0')
+
+
+def import_rows(db: Database, rows: Iterable[Dict], batch_size: int = BATCH_SIZE,
+                progress: Optional[Callable[[int, float], None]] = None,
+                cancelled: Optional[Callable[[], bool]] = None) -> Dict:
+    # Каждая пачка - отдельная транзакция BEGIN IMMEDIATE на своём соединении,
+    # так что запись из GUI-потока ждёт не дольше одной пачки. При отмене уже записанные
+    # пачки остаются, а результат помечается 'cancelled'
+    started = time.perf_counter()
+    imported = 0
+    skipped = 0
+
+    def records():
+        nonlocal skipped
+        for row in rows:
+            record = to_record(row)
+            if record is None:
+                skipped += 1
+            else:
+                yield record
+
+    stream = records()
+    stopped = False
+    conn = _connect(db.path)
+    try:
+        while True:
+            if cancelled is not None and cancelled():
+                stopped = True
+                break
+            chunk = list(islice(stream, batch_size))
+            if not chunk:
+                break
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                insert_chunk(conn, chunk)
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            imported += len(chunk)
+            if progress:
+                progress(imported, imported / (time.perf_counter() - started))
+    finally:
+        conn.close()
+
+    seconds = time.perf_counter() - started
+    return {
+        'imported': imported,
+        'skipped': skipped,
+        'seconds': seconds,
+        'rows_per_sec': imported / seconds if seconds > 0 else 0.0,
+        'cancelled': stopped,
+    }
+
+
+def import_catalog(db: Database, path: str, batch_size: int = BATCH_SIZE,
+                   progress: Optional[Callable[[int, float], None]] = None,
+                   cancelled: Optional[Callable[[], bool]] = None) -> Dict:
+    return import_rows(db, read_rows(path), batch_size, progress, cancelled)
+
+
+class ImportJob(BackgroundJob):
+    # cancelled получает результат с числом уже импортированных книг: записанные пачки не откатываются
+
+    def __init__(self, db: Database, path: str, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.path = path
+        self.label = ''
+
+    def work(self, cancelled) -> Dict:
+        return import_catalog(self.db, self.path, progress=self.report_count, cancelled=cancelled)
+
+    def was_cancelled(self, result: Dict) -> bool:
+        return result['cancelled']
+
+    def report_count(self, count: int, speed: float):
+        self.signals.progress.emit(count)
+
+    def show_progress(self, label: str, cancel_text: str, parent=None):
+        # Число строк каталога заранее неизвестно: индикатор без шкалы, в подписи - сколько загружено
+        self.label = label
+        super().show_progress(label, cancel_text, parent, maximum=0)
+        self.progress.connect(self.show_count)
+
+    def show_count(self, count: int):
+        if self.dialog is not None:
+            self.dialog.setLabelText(f'{self.label} {count}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Массовый импорт каталога книг (CSV или JSON Lines)')
+    parser.add_argument('database', help='файл базы данных, например bookstore.db')
+    parser.add_argument('catalog', help='CSV с заголовком или .jsonl с полями title, author, price, ...')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    def report(count, speed):
+        print(f'\rИмпортировано: {count} ({speed:,.0f} строк/с)', end='', file=sys.stderr)
+
+    db = Database(args.database)
+    try:
+        result = import_catalog(db, args.catalog, args.batch_size, report)
+    finally:
+        db.close()
+    print(file=sys.stderr)
+    print(f"Импортировано {result['imported']}, пропущено {result['skipped']} "
+          f"за {result['seconds']:.2f} с ({result['rows_per_sec']:,.0f} строк/с)")
+
+
+if __name__ == '__main__':
+    main()
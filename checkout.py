@@ -0,0 +1,124 @@
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Продажа списывает остаток одним условным UPDATE ... WHERE quantity >= ?: проверка и списание
+# атомарны, поэтому две кассы не продадут последний экземпляр дважды, а RETURNING сразу отдаёт
+# название, цену и новый остаток без второго запроса. BEGIN IMMEDIATE берёт блокировку записи
+# в начале транзакции, и корзина из нескольких позиций фиксируется целиком или не фиксируется вовсе.
+
+# RETURNING появился в SQLite 3.35; в старых версиях строка книги читается отдельным SELECT
+HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Как записывается продажа в каждом приложении. per_copy - строка sales на каждый экземпляр
+# (в таблице нет количества), иначе одна строка на позицию корзины
+
+# Gemini-Project.py (books.db): дата продажи - значение по умолчанию
+GEMINI_SALES = {
+    'insert': 'INSERT INTO sales (book_id) VALUES (:book_id)',
+    'per_copy': True,
+}
+
+# Grok-project.py (library.db)
+GROK_SALES = {
+    'insert': 'INSERT INTO sales (book_id, sale_date, amount) VALUES (:book_id, :date, :price)',
+    'per_copy': True,
+}
+
+# Qwen-project.py (bookstore.db)
+QWEN_SALES = {
+    'insert': '''
+        INSERT INTO sales (book_id, book_title, date, quantity, price, total)
+        VALUES (:book_id, :title, :date, :quantity, :price, :total)
+    ''',
+    'per_copy': False,
+}
+
+
+class BasketLine(NamedTuple):
+    book_id: int
+    quantity: int
+
+
+class SoldLine(NamedTuple):
+    book_id: int
+    title: str
+    quantity: int
+    price: float
+    remaining: int
+    sale_ids: Tuple[int, ...]
+
+    @property
+    def total(self) -> float:
+        return self.price * self.quantity
+
+
+class OutOfStock(Exception):
+    def __init__(self, book_id: int, requested: int, available: Optional[int]):
+        super().__init__(f'книга {book_id}: запрошено {requested}, в наличии {available or 0}')
+        self.book_id = book_id
+        self.requested = requested
+        # None - книги нет в каталоге
+        self.available = available
+
+
+def merge_lines(basket: Iterable[Tuple[int, int]]) -> List[BasketLine]:
+    # Одна книга в нескольких строках корзины списывается одним UPDATE
+    quantities: Dict[int, int] = {}
+    for book_id, quantity in basket:
+        if quantity <= 0:
+            raise ValueError(f'некорректное количество: {quantity}')
+        quantities[book_id] = quantities.get(book_id, 0) + quantity
+    return [BasketLine(book_id, quantity) for book_id, quantity in quantities.items()]
+
+
+def take_stock(conn: sqlite3.Connection, book_id: int, quantity: int) -> Tuple[str, float, int]:
+    if HAS_RETURNING:
+        rows = conn.execute('''
+            UPDATE books SET quantity = quantity - ?
+            WHERE id = ? AND quantity >= ?
+            RETURNING title, price, quantity
+        ''', (quantity, book_id, quantity)).fetchall()
+        row = rows[0] if rows else None
+    else:
+        cursor = conn.execute('UPDATE books SET quantity = quantity - ? WHERE id = ? AND quantity >= ?',
+                              (quantity, book_id, quantity))
+        row = None
+        if cursor.rowcount:
+            row = conn.execute('SELECT title, price, quantity FROM books WHERE id = ?', (book_id,)).fetchone()
+    if row is None:
+        available = conn.execute('SELECT quantity FROM books WHERE id = ?', (book_id,)).fetchone()
+        raise OutOfStock(book_id, quantity, available[0] if available else None)
+    return row
+
+
+def apply_basket(conn: sqlite3.Connection, sales: Dict, basket: Iterable[Tuple[int, int]],
+                 date: Optional[str] = None) -> List[SoldLine]:
+    # Транзакцией не управляет: её открывает checkout() или вызывающий (например, точкой сохранения)
+    date = date or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    sold = []
+    for book_id, quantity in merge_lines(basket):
+        title, price, remaining = take_stock(conn, book_id, quantity)
+        price = price or 0.0
+        params = {'book_id': book_id, 'title': title, 'date': date, 'price': price}
+        if sales['per_copy']:
+            params.update(quantity=1, total=price)
+            sale_ids = tuple(conn.execute(sales['insert'], params).lastrowid for _ in range(quantity))
+        else:
+            params.update(quantity=quantity, total=price * quantity)
+            sale_ids = (conn.execute(sales['insert'], params).lastrowid,)
+        sold.append(SoldLine(book_id, title, quantity, price, remaining, sale_ids))
+    return sold
+
+
+def checkout(conn: sqlite3.Connection, sales: Dict, basket: Iterable[Tuple[int, int]],
+             date: Optional[str] = None) -> List[SoldLine]:
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        sold = apply_basket(conn, sales, basket, date)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return sold
+
@@ -0,0 +1,99 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict
+
+import fitz  # PyMuPDF
+
+# Открытые документы PyMuPDF переиспользуются между открытиями книги: повторный fitz.open
+# заново разбирает xref и дерево страниц. Число открытых файлов ограничено, а документы,
+# которые сейчас читают, не вытесняются.
+
+MAX_DOCUMENTS = 8
+
+
+class _Entry:
+    __slots__ = ('doc', 'signature', 'users', 'detached')
+
+    def __init__(self, doc: fitz.Document, signature):
+        self.doc = doc
+        self.signature = signature
+        self.users = 0
+        self.detached = False
+
+
+class DocumentPool:
+    def __init__(self, max_documents: int = MAX_DOCUMENTS):
+        self.max_documents = max_documents
+        self.lock = threading.Lock()
+        self.entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        # id(doc) -> запись, в том числе отсоединённые (файл заменён, а документ ещё читают)
+        self.by_doc: Dict[int, _Entry] = {}
+
+    @staticmethod
+    def _signature(path: str):
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def acquire(self, path: str) -> fitz.Document:
+        key = os.path.abspath(path)
+        signature = self._signature(key)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.signature != signature:
+                # Файл изменился с момента открытия: старый документ закроется, когда его отпустят
+                self._detach(key)
+                entry = None
+            if entry is None:
+                entry = _Entry(fitz.open(key), signature)
+                self.entries[key] = entry
+                self.by_doc[id(entry.doc)] = entry
+            entry.users += 1
+            self.entries.move_to_end(key)
+            self._evict()
+            return entry.doc
+
+    def release(self, doc: fitz.Document):
+        with self.lock:
+            entry = self.by_doc.get(id(doc))
+            if entry is None:
+                return
+            entry.users -= 1
+            if entry.detached and entry.users <= 0:
+                self._close(entry)
+            else:
+                self._evict()
+
+    def discard(self, path: str):
+        # Перед удалением или заменой файла: на Windows открытый файл нельзя удалить
+        with self.lock:
+            self._detach(os.path.abspath(path))
+
+    def close_all(self):
+        with self.lock:
+            for entry in list(self.by_doc.values()):
+                self._close(entry)
+            self.entries.clear()
+
+    def _detach(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        entry.detached = True
+        if entry.users <= 0:
+            self._close(entry)
+
+    def _evict(self):
+        # Вытесняются самые давно открытые документы, которые сейчас никто не читает
+        excess = len(self.entries) - self.max_documents
+        for key in [key for key, entry in self.entries.items() if entry.users <= 0][:max(excess, 0)]:
+            self._close(self.entries.pop(key))
+
+    def _close(self, entry: _Entry):
+        self.by_doc.pop(id(entry.doc), None)
+        if not entry.doc.is_closed:
+            entry.doc.close()
+
+
+# Общий пул для всех окон просмотра приложения
+document_pool = DocumentPool()
@@ -0,0 +1,168 @@
+from typing import Dict, List
+
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QPixmap
+from PyQt5.QtWidgets import QLabel, QScrollArea, QVBoxLayout, QWidget
+
+from document_pool import document_pool
+from page_cache import PagePrefetcher, page_cache
+from pdf_render import MAX_PAGE_ZOOM, fit_zoom, render_pixmap, zoom_changed
+
+# Превью рисуется в четверть полного масштаба (1/16 пикселей)
+PREVIEW_FACTOR = 0.25
+# Отрисовываются страницы в пределах одного экрана от видимой области,
+# а картинки страниц дальше трёх экранов отпускаются
+RENDER_MARGIN = 1
+RELEASE_MARGIN = 3
+SCROLL_DELAY = 50
+
+
+class LazyPdfView(QScrollArea):
+    def __init__(self, pdf_path: str, parent=None, page: int = 0):
+        super().__init__(parent)
+        self.pdf_path = pdf_path
+        # Страница, к которой прокрутить при первом показе (например, найденная поиском по тексту)
+        self.start_page = page
+        self.doc = document_pool.acquire(pdf_path)
+        self.setWidgetResizable(True)
+        self.setAlignment(Qt.AlignHCenter)
+
+        # Заглушки сразу получают размер страницы, поэтому полоса прокрутки
+        # с самого начала соответствует всему документу
+        container = QWidget()
+        self.page_layout = QVBoxLayout(container)
+        self.rects = []
+        self.labels: List[QLabel] = []
+        for page_num in range(self.doc.page_count):
+            self.rects.append(self.doc.load_page(page_num).rect)
+            label = QLabel()
+            label.setAlignment(Qt.AlignCenter)
+            label.setStyleSheet("background-color: #e0e0e0;")
+            self.page_layout.addWidget(label, 0, Qt.AlignHCenter)
+            self.labels.append(label)
+        self.setWidget(container)
+
+        # Масштаб рендера (пикселей устройства на пункт PDF) подбирается по ширине окна
+        # и плотности пикселей экрана; до первого показа страницы имеют размер 1:1
+        self.zoom = None
+        self.layout_pages(self.devicePixelRatioF())
+
+        # Страница -> масштаб показанной картинки (превью или полный)
+        self.shown: Dict[int, float] = {}
+
+        self.prefetcher = PagePrefetcher(pdf_path, self.zoom, self)
+        self.prefetcher.page_rendered.connect(self.on_page_rendered)
+
+        self.update_timer = QTimer(self)
+        self.update_timer.setSingleShot(True)
+        self.update_timer.setInterval(SCROLL_DELAY)
+        self.update_timer.timeout.connect(self.update_pages)
+        self.verticalScrollBar().valueChanged.connect(self.update_timer.start)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.start_page:
+            # Положение заглушек известно только после раскладки, которая выполнится в цикле событий
+            QTimer.singleShot(0, lambda page=self.start_page: self.scroll_to_page(page))
+            self.start_page = 0
+        self.update_timer.start()
+
+    def scroll_to_page(self, page_num: int):
+        if 0 <= page_num < len(self.labels):
+            self.verticalScrollBar().setValue(self.labels[page_num].y())
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.update_timer.start()
+
+    def page_distance(self, label: QLabel, top: int, bottom: int) -> float:
+        # Расстояние от страницы до видимой области в высотах экрана (0 - страница видна)
+        height = max(self.viewport().height(), 1)
+        if label.y() + label.height() < top:
+            return (top - label.y() - label.height()) / height
+        if label.y() > bottom:
+            return (label.y() - bottom) / height
+        return 0
+
+    def layout_pages(self, zoom: float):
+        self.zoom = zoom
+        ratio = self.devicePixelRatioF()
+        for rect, label in zip(self.rects, self.labels):
+            label.setFixedSize(int(rect.width * zoom / ratio), int(rect.height * zoom / ratio))
+
+    def update_zoom(self):
+        # Самая широкая страница вписывается по ширине; при изменении масштаба меньше порога
+        # уже отрисованные страницы остаются как есть
+        margins = self.page_layout.contentsMargins()
+        width = (self.viewport().width() - margins.left() - margins.right()
+                 - self.verticalScrollBar().sizeHint().width())
+        widest = max(self.rects, key=lambda rect: rect.width, default=None)
+        if widest is None or width <= 0:
+            return
+        zoom = min(fit_zoom(widest, width, device_ratio=self.devicePixelRatioF()), MAX_PAGE_ZOOM)
+        if not zoom_changed(self.zoom, zoom):
+            return
+        self.layout_pages(zoom)
+        for page_num in self.shown:
+            self.labels[page_num].clear()
+        self.shown.clear()
+        self.prefetcher.set_zoom(zoom)
+
+    def update_pages(self):
+        self.update_zoom()
+        top = self.verticalScrollBar().value()
+        bottom = top + self.viewport().height()
+        wanted = []
+        for page_num, label in enumerate(self.labels):
+            distance = self.page_distance(label, top, bottom)
+            if distance > RELEASE_MARGIN:
+                if page_num in self.shown:
+                    label.clear()
+                    del self.shown[page_num]
+            elif distance <= RENDER_MARGIN and self.shown.get(page_num) != self.zoom:
+                wanted.append((distance, page_num))
+
+        # Ближайшие страницы рендерятся первыми; пока полная версия готовится в фоне,
+        # показывается уменьшенная копия
+        pages = [page_num for _, page_num in sorted(wanted)]
+        for page_num in pages:
+            pixmap = page_cache.get((self.pdf_path, page_num, self.zoom))
+            if pixmap is not None:
+                self.show_page(page_num, pixmap, self.zoom)
+            elif page_num not in self.shown:
+                self.show_page(page_num, self.preview(page_num), self.preview_zoom())
+        self.prefetcher.request(page_num for page_num in pages if self.shown[page_num] != self.zoom)
+
+    def preview_zoom(self) -> float:
+        return round(self.zoom * PREVIEW_FACTOR, 2)
+
+    def preview(self, page_num: int) -> QPixmap:
+        key = (self.pdf_path, page_num, self.preview_zoom())
+        pixmap = page_cache.get(key)
+        if pixmap is None:
+            pixmap = render_pixmap(self.doc, page_num, self.preview_zoom())
+            page_cache.put(key, pixmap)
+        return pixmap
+
+    def show_page(self, page_num: int, pixmap: QPixmap, zoom: float):
+        label = self.labels[page_num]
+        ratio = self.devicePixelRatioF()
+        if zoom != self.zoom:
+            # Превью растягивается до размера страницы
+            pixmap = pixmap.scaled(label.size() * ratio, Qt.IgnoreAspectRatio, Qt.FastTransformation)
+        pixmap.setDevicePixelRatio(ratio)
+        label.setPixmap(pixmap)
+        self.shown[page_num] = zoom
+
+    def on_page_rendered(self, key, rendered):
+        pixmap = rendered.to_pixmap(self.devicePixelRatioF())
+        page_cache.put(key, pixmap)
+        _, page_num, zoom = key
+        # Пока страница рендерилась, её могли прокрутить далеко и отпустить или сменился масштаб
+        if page_num in self.shown and zoom == self.zoom:
+            self.show_page(page_num, pixmap, zoom)
+
+    def close_document(self):
+        self.update_timer.stop()
+        self.prefetcher.stop()
+        document_pool.release(self.doc)
@@ -0,0 +1,342 @@
+import sqlite3
+from typing import Sequence
+
+# Номер последней применённой миграции хранится в PRAGMA user_version.
+# Миграции только добавляются в конец списка, уже выпущенные не меняются: их SQL записан здесь
+# как есть, а не собирается из констант модулей, которые могут измениться в следующих версиях.
+
+# Хранилище PDF (pdf_storage.py): одна запись на файл и счётчик книг, которые на него ссылаются
+PDF_BLOBS = '''
+    CREATE TABLE IF NOT EXISTS pdf_blobs (
+        sha256 TEXT PRIMARY KEY,
+        path TEXT NOT NULL UNIQUE,
+        size INTEGER NOT NULL,
+        refcount INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS idx_pdf_blobs_refcount ON pdf_blobs(refcount);
+
+    CREATE TRIGGER IF NOT EXISTS pdf_blobs_ai AFTER INSERT ON books WHEN new.pdf_path IS NOT NULL BEGIN
+        UPDATE pdf_blobs SET refcount = refcount + 1 WHERE path = new.pdf_path;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS pdf_blobs_au AFTER UPDATE OF pdf_path ON books
+    WHEN old.pdf_path IS NOT new.pdf_path BEGIN
+        UPDATE pdf_blobs SET refcount = refcount - 1 WHERE path = old.pdf_path;
+        UPDATE pdf_blobs SET refcount = refcount + 1 WHERE path = new.pdf_path;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS pdf_blobs_ad AFTER DELETE ON books WHEN old.pdf_path IS NOT NULL BEGIN
+        UPDATE pdf_blobs SET refcount = refcount - 1 WHERE path = old.pdf_path;
+    END;
+
+    UPDATE pdf_blobs SET refcount = (SELECT COUNT(*) FROM books WHERE books.pdf_path = pdf_blobs.path);
+'''
+
+# Версии данных (sales_summary.py): кэши статистики сверяют их вместо пересчёта
+DATA_VERSIONS = '''
+    CREATE TABLE IF NOT EXISTS data_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO data_versions (name, version) VALUES ('sales', 0), ('books', 0);
+
+    CREATE TRIGGER IF NOT EXISTS data_versions_sales_ai AFTER INSERT ON sales BEGIN
+        UPDATE data_versions SET version = version + 1 WHERE name = 'sales';
+    END;
+    CREATE TRIGGER IF NOT EXISTS data_versions_sales_au AFTER UPDATE ON sales BEGIN
+        UPDATE data_versions SET version = version + 1 WHERE name = 'sales';
+    END;
+    CREATE TRIGGER IF NOT EXISTS data_versions_sales_ad AFTER DELETE ON sales BEGIN
+        UPDATE data_versions SET version = version + 1 WHERE name = 'sales';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS data_versions_books_ai AFTER INSERT ON books BEGIN
+        UPDATE data_versions SET version = version + 1 WHERE name = 'books';
+    END;
+    CREATE TRIGGER IF NOT EXISTS data_versions_books_au AFTER UPDATE OF title, author, price ON books BEGIN
+        UPDATE data_versions SET version = version + 1 WHERE name = 'books';
+    END;
+    CREATE TRIGGER IF NOT EXISTS data_versions_books_ad AFTER DELETE ON books BEGIN
+        UPDATE data_versions SET version = version + 1 WHERE name = 'books';
+    END;
+'''
+
+# Массовый импорт каталога (bulk_import.py): пока в транзакции пачки active = 1, построчные триггеры
+# AFTER INSERT ON books молчат, а их работу импорт делает одним запросом на пачку.
+# Триггер полнотекстового индекса пересоздаёт init_search_index() уже с этим условием
+IMPORT_STATE = '''
+    CREATE TABLE IF NOT EXISTS import_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        active INTEGER NOT NULL DEFAULT 0
+    );
+    INSERT OR IGNORE INTO import_state (id, active) VALUES (1, 0);
+
+    DROP TRIGGER IF EXISTS data_versions_books_ai;
+    CREATE TRIGGER data_versions_books_ai AFTER INSERT ON books
+    WHEN NOT EXISTS (SELECT 1 FROM import_state WHERE active) BEGIN
+        UPDATE data_versions SET version = version + 1 WHERE name = 'books';
+    END;
+
+    DROP TRIGGER IF EXISTS pdf_blobs_ai;
+    CREATE TRIGGER pdf_blobs_ai AFTER INSERT ON books
+    WHEN new.pdf_path IS NOT NULL AND NOT EXISTS (SELECT 1 FROM import_state WHERE active) BEGIN
+        UPDATE pdf_blobs SET refcount = refcount + 1 WHERE path = new.pdf_path;
+    END;
+
+    DROP TRIGGER IF EXISTS books_fts_ai;
+'''
+
+# Gemini-Project.py (books.db)
+GEMINI_MIGRATIONS = (
+    '''
+    CREATE INDEX IF NOT EXISTS idx_sales_book ON sales(book_id);
+    CREATE INDEX IF NOT EXISTS idx_sales_date ON sales(date);
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS sales_by_book (
+        book_id INTEGER PRIMARY KEY,
+        sales_count INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_sales_by_book_count ON sales_by_book(sales_count);
+
+    CREATE TRIGGER IF NOT EXISTS sales_summary_ai AFTER INSERT ON sales BEGIN
+        INSERT INTO sales_by_book (book_id, sales_count) VALUES (new.book_id, 1)
+        ON CONFLICT (book_id) DO UPDATE SET sales_count = sales_count + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS sales_summary_ad AFTER DELETE ON sales BEGIN
+        UPDATE sales_by_book SET sales_count = sales_count - 1 WHERE book_id = old.book_id;
+        DELETE FROM sales_by_book WHERE book_id = old.book_id AND sales_count <= 0;
+    END;
+
+    DELETE FROM sales_by_book;
+    INSERT INTO sales_by_book SELECT book_id, COUNT(*) FROM sales GROUP BY book_id;
+    ''',
+    PDF_BLOBS,
+    DATA_VERSIONS,
+    # Сводные листы отчёта по дням и месяцам читают продажи из индекса, без сортировки
+    'CREATE INDEX IF NOT EXISTS idx_sales_day ON sales(date(date), book_id);',
+    IMPORT_STATE,
+)
+
+# Grok-project.py (library.db)
+GROK_MIGRATIONS = (
+    '''
+    CREATE INDEX IF NOT EXISTS idx_sales_book ON sales(book_id, amount);
+    CREATE INDEX IF NOT EXISTS idx_sales_date ON sales(sale_date);
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS sales_totals (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        sales_count INTEGER NOT NULL,
+        amount REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS sales_by_book (
+        book_id INTEGER PRIMARY KEY,
+        sales_count INTEGER NOT NULL,
+        amount REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_sales_by_book_count ON sales_by_book(sales_count);
+    CREATE TABLE IF NOT EXISTS sales_by_day (
+        day TEXT PRIMARY KEY,
+        sales_count INTEGER NOT NULL,
+        amount REAL NOT NULL
+    );
+
+    CREATE TRIGGER IF NOT EXISTS sales_summary_ai AFTER INSERT ON sales BEGIN
+        INSERT INTO sales_totals (id, sales_count, amount) VALUES (1, 1, COALESCE(new.amount, 0))
+        ON CONFLICT (id) DO UPDATE SET
+            sales_count = sales_count + 1, amount = amount + excluded.amount;
+        INSERT INTO sales_by_book (book_id, sales_count, amount) VALUES (new.book_id, 1, COALESCE(new.amount, 0))
+        ON CONFLICT (book_id) DO UPDATE SET
+            sales_count = sales_count + 1, amount = amount + excluded.amount;
+        INSERT INTO sales_by_day (day, sales_count, amount) VALUES (date(new.sale_date), 1, COALESCE(new.amount, 0))
+        ON CONFLICT (day) DO UPDATE SET
+            sales_count = sales_count + 1, amount = amount + excluded.amount;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS sales_summary_ad AFTER DELETE ON sales BEGIN
+        UPDATE sales_totals SET
+            sales_count = sales_count - 1, amount = amount - COALESCE(old.amount, 0)
+        WHERE id = 1;
+        UPDATE sales_by_book SET
+            sales_count = sales_count - 1, amount = amount - COALESCE(old.amount, 0)
+        WHERE book_id = old.book_id;
+        DELETE FROM sales_by_book WHERE book_id = old.book_id AND sales_count <= 0;
+        UPDATE sales_by_day SET
+            sales_count = sales_count - 1, amount = amount - COALESCE(old.amount, 0)
+        WHERE day = date(old.sale_date);
+        DELETE FROM sales_by_day WHERE day = date(old.sale_date) AND sales_count <= 0;
+    END;
+
+    DELETE FROM sales_totals;
+    INSERT INTO sales_totals SELECT 1, COUNT(*), COALESCE(SUM(amount), 0) FROM sales;
+    DELETE FROM sales_by_book;
+    INSERT INTO sales_by_book SELECT book_id, COUNT(*), COALESCE(SUM(amount), 0) FROM sales GROUP BY book_id;
+    DELETE FROM sales_by_day;
+    INSERT INTO sales_by_day
+        SELECT date(sale_date), COUNT(*), COALESCE(SUM(amount), 0)
+        FROM sales GROUP BY date(sale_date);
+    ''',
+    PDF_BLOBS,
+    DATA_VERSIONS,
+    IMPORT_STATE,
+)
+
+# Qwen-project.py (bookstore.db)
+QWEN_MIGRATIONS = (
+    '''
+    CREATE INDEX IF NOT EXISTS idx_sales_title ON sales(book_title, quantity, total);
+    CREATE INDEX IF NOT EXISTS idx_sales_day ON sales(date(date), total);
+    CREATE INDEX IF NOT EXISTS idx_sales_date ON sales(date);
+    CREATE INDEX IF NOT EXISTS idx_books_title ON books(title);
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS sales_totals (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        sales_count INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        total REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS sales_by_book (
+        book_title TEXT PRIMARY KEY,
+        sales_count INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        total REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_sales_by_book_quantity ON sales_by_book(quantity);
+    CREATE TABLE IF NOT EXISTS sales_by_day (
+        day TEXT PRIMARY KEY,
+        sales_count INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        total REAL NOT NULL
+    );
+
+    CREATE TRIGGER IF NOT EXISTS sales_summary_ai AFTER INSERT ON sales BEGIN
+        INSERT INTO sales_totals (id, sales_count, quantity, total)
+        VALUES (1, 1, COALESCE(new.quantity, 0), COALESCE(new.total, 0))
+        ON CONFLICT (id) DO UPDATE SET
+            sales_count = sales_count + 1,
+            quantity = quantity + excluded.quantity,
+            total = total + excluded.total;
+        INSERT INTO sales_by_book (book_title, sales_count, quantity, total)
+        VALUES (new.book_title, 1, COALESCE(new.quantity, 0), COALESCE(new.total, 0))
+        ON CONFLICT (book_title) DO UPDATE SET
+            sales_count = sales_count + 1,
+            quantity = quantity + excluded.quantity,
+            total = total + excluded.total;
+        INSERT INTO sales_by_day (day, sales_count, quantity, total)
+        VALUES (date(new.date), 1, COALESCE(new.quantity, 0), COALESCE(new.total, 0))
+        ON CONFLICT (day) DO UPDATE SET
+            sales_count = sales_count + 1,
+            quantity = quantity + excluded.quantity,
+            total = total + excluded.total;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS sales_summary_ad AFTER DELETE ON sales BEGIN
+        UPDATE sales_totals SET
+            sales_count = sales_count - 1,
+            quantity = quantity - COALESCE(old.quantity, 0),
+            total = total - COALESCE(old.total, 0)
+        WHERE id = 1;
+        UPDATE sales_by_book SET
+            sales_count = sales_count - 1,
+            quantity = quantity - COALESCE(old.quantity, 0),
+            total = total - COALESCE(old.total, 0)
+        WHERE book_title = old.book_title;
+        DELETE FROM sales_by_book WHERE book_title = old.book_title AND sales_count <= 0;
+        UPDATE sales_by_day SET
+            sales_count = sales_count - 1,
+            quantity = quantity - COALESCE(old.quantity, 0),
+            total = total - COALESCE(old.total, 0)
+        WHERE day = date(old.date);
+        DELETE FROM sales_by_day WHERE day = date(old.date) AND sales_count <= 0;
+    END;
+
+    DELETE FROM sales_totals;
+    INSERT INTO sales_totals
+        SELECT 1, COUNT(*), COALESCE(SUM(quantity), 0), COALESCE(SUM(total), 0) FROM sales;
+    DELETE FROM sales_by_book;
+    INSERT INTO sales_by_book
+        SELECT book_title, COUNT(*), COALESCE(SUM(quantity), 0), COALESCE(SUM(total), 0)
+        FROM sales GROUP BY book_title;
+    DELETE FROM sales_by_day;
+    INSERT INTO sales_by_day
+        SELECT date(date), COUNT(*), COALESCE(SUM(quantity), 0), COALESCE(SUM(total), 0)
+        FROM sales GROUP BY date(date);
+    ''',
+    PDF_BLOBS,
+    DATA_VERSIONS,
+    IMPORT_STATE,
+    # Продажа без названия: NULL в PRIMARY KEY не конфликтует в upsert, и такие продажи
+    # размножали строки сводки. Ключом стало COALESCE(book_title, '')
+    '''
+    DROP TRIGGER IF EXISTS sales_summary_ai;
+    DROP TRIGGER IF EXISTS sales_summary_ad;
+    DROP TABLE IF EXISTS sales_by_book;
+    CREATE TABLE sales_by_book (
+        book_title TEXT NOT NULL PRIMARY KEY,
+        sales_count INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        total REAL NOT NULL
+    );
+    CREATE INDEX idx_sales_by_book_quantity ON sales_by_book(quantity);
+
+    CREATE TRIGGER sales_summary_ai AFTER INSERT ON sales BEGIN
+        INSERT INTO sales_totals (id, sales_count, quantity, total)
+        VALUES (1, 1, COALESCE(new.quantity, 0), COALESCE(new.total, 0))
+        ON CONFLICT (id) DO UPDATE SET
+            sales_count = sales_count + 1,
+            quantity = quantity + excluded.quantity,
+            total = total + excluded.total;
+        INSERT INTO sales_by_book (book_title, sales_count, quantity, total)
+        VALUES (COALESCE(new.book_title, ''), 1, COALESCE(new.quantity, 0), COALESCE(new.total, 0))
+        ON CONFLICT (book_title) DO UPDATE SET
+            sales_count = sales_count + 1,
+            quantity = quantity + excluded.quantity,
+            total = total + excluded.total;
+        INSERT INTO sales_by_day (day, sales_count, quantity, total)
+        VALUES (date(new.date), 1, COALESCE(new.quantity, 0), COALESCE(new.total, 0))
+        ON CONFLICT (day) DO UPDATE SET
+            sales_count = sales_count + 1,
+            quantity = quantity + excluded.quantity,
+            total = total + excluded.total;
+    END;
+
+    CREATE TRIGGER sales_summary_ad AFTER DELETE ON sales BEGIN
+        UPDATE sales_totals SET
+            sales_count = sales_count - 1,
+            quantity = quantity - COALESCE(old.quantity, 0),
+            total = total - COALESCE(old.total, 0)
+        WHERE id = 1;
+        UPDATE sales_by_book SET
+            sales_count = sales_count - 1,
+            quantity = quantity - COALESCE(old.quantity, 0),
+            total = total - COALESCE(old.total, 0)
+        WHERE book_title = COALESCE(old.book_title, '');
+        DELETE FROM sales_by_book WHERE book_title = COALESCE(old.book_title, '') AND sales_count <= 0;
+        UPDATE sales_by_day SET
+            sales_count = sales_count - 1,
+            quantity = quantity - COALESCE(old.quantity, 0),
+            total = total - COALESCE(old.total, 0)
+        WHERE day = date(old.date);
+        DELETE FROM sales_by_day WHERE day = date(old.date) AND sales_count <= 0;
+    END;
+
+    INSERT INTO sales_by_book
+        SELECT COALESCE(book_title, ''), COUNT(*), COALESCE(SUM(quantity), 0), COALESCE(SUM(total), 0)
+        FROM sales GROUP BY 1;
+    ''',
+)
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, migrations: Sequence[str]) -> int:
+    version = schema_version(conn)
+    for number, script in enumerate(migrations[version:], start=version + 1):
+        # Скрипт миграции и новый номер версии применяются одной транзакцией
+        conn.executescript(f'BEGIN; {script}; PRAGMA user_version = {number}; COMMIT;')
+    return schema_version(conn)
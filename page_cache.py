@@ -0,0 +1,109 @@
+import threading
+from collections import OrderedDict
+from typing import Hashable, Iterable, Optional
+
+import fitz  # PyMuPDF
+from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtGui import QPixmap
+
+from pdf_render import render_page
+
+CACHE_BYTES = 256 * 1024 * 1024
+PREFETCH_PAGES = 2
+
+
+class PageCache:
+    def __init__(self, max_bytes: int = CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.items: 'OrderedDict[Hashable, QPixmap]' = OrderedDict()
+        self.size = 0
+
+    @staticmethod
+    def pixmap_bytes(pixmap: QPixmap) -> int:
+        return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+
+    def __contains__(self, key) -> bool:
+        return key in self.items
+
+    def get(self, key) -> Optional[QPixmap]:
+        pixmap = self.items.get(key)
+        if pixmap is not None:
+            self.items.move_to_end(key)
+        return pixmap
+
+    def put(self, key, pixmap: QPixmap):
+        if key in self.items:
+            self.size -= self.pixmap_bytes(self.items.pop(key))
+        self.items[key] = pixmap
+        self.size += self.pixmap_bytes(pixmap)
+        # Вытесняем давно не использованные страницы, но последнюю оставляем всегда
+        while self.size > self.max_bytes and len(self.items) > 1:
+            _, evicted = self.items.popitem(last=False)
+            self.size -= self.pixmap_bytes(evicted)
+
+    def discard_document(self, pdf_path: str):
+        for key in [key for key in self.items if key[0] == pdf_path]:
+            self.size -= self.pixmap_bytes(self.items.pop(key))
+
+
+# Общий кэш для всех окон просмотра: повторно открытая книга тоже берётся из памяти
+page_cache = PageCache()
+
+
+class PagePrefetcher(QThread):
+    # (ключ кэша, RenderedPage): растр передаётся вместе с буфером PyMuPDF, без копии
+    page_rendered = pyqtSignal(object, object)
+
+    def __init__(self, pdf_path: str, zoom: float, parent=None):
+        super().__init__(parent)
+        self.pdf_path = pdf_path
+        self.zoom = zoom
+        self.pending = []
+        self.stopped = False
+        self.condition = threading.Condition()
+
+    def set_zoom(self, zoom: float):
+        # Очередь в старом масштабе больше не нужна
+        with self.condition:
+            self.zoom = zoom
+            self.pending = []
+
+    def request(self, pages: Iterable[int]):
+        # Новый запрос заменяет старую очередь: после перелистывания важны новые соседи
+        with self.condition:
+            self.pending = list(pages)
+            self.condition.notify()
+        if not self.isRunning():
+            self.start(QThread.LowPriority)
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        self.wait()
+
+    def run(self):
+        # Свой экземпляр документа: объекты PyMuPDF нельзя использовать из двух потоков
+        doc = fitz.open(self.pdf_path)
+        try:
+            while True:
+                with self.condition:
+                    while not self.pending and not self.stopped:
+                        self.condition.wait()
+                    if self.stopped:
+                        return
+                    page_num = self.pending.pop(0)
+                    zoom = self.zoom
+                rendered = render_page(doc, page_num, zoom)
+                self.page_rendered.emit((self.pdf_path, page_num, zoom), rendered)
+        finally:
+            doc.close()
+
+
+def neighbour_pages(current: int, total: int, count: int = PREFETCH_PAGES):
+    pages = []
+    for offset in range(1, count + 1):
+        for page_num in (current + offset, current - offset):
+            if 0 <= page_num < total:
+                pages.append(page_num)
+    return pages
@@ -0,0 +1,52 @@
+from typing import NamedTuple
+
+import fitz  # PyMuPDF
+
+from background_job import BackgroundJob
+from pdf_storage import IngestCancelled, PdfStorage, StoredPdf
+
+# Добавление PDF в хранилище в фоне: копирование с хэшированием, проверка PyMuPDF и fsync
+# выполняются вне GUI-потока, а строку книги приложение записывает только по сигналу finished,
+# то есть когда файл уже надёжно лежит на диске.
+
+
+class IngestError(Exception):
+    pass
+
+
+class IngestResult(NamedTuple):
+    stored: StoredPdf
+    page_count: int
+
+
+def validate_pdf(path: str) -> int:
+    try:
+        doc = fitz.open(path, filetype='pdf')
+    except Exception as e:
+        raise IngestError(f'файл не открывается как PDF: {e}')
+    try:
+        if doc.needs_pass or doc.is_encrypted:
+            raise IngestError('PDF защищён паролем')
+        if doc.page_count == 0:
+            raise IngestError('в PDF нет страниц')
+        return doc.page_count
+    finally:
+        doc.close()
+
+
+def ingest(storage: PdfStorage, src: str, progress=None, cancelled=None) -> IngestResult:
+    pages = []
+    stored = storage.store(src, progress, cancelled, validate=lambda path: pages.append(validate_pdf(path)))
+    return IngestResult(stored, pages[0])
+
+
+class IngestJob(BackgroundJob):
+    cancelled_errors = (IngestCancelled,)
+
+    def __init__(self, storage: PdfStorage, src: str, parent=None):
+        super().__init__(parent)
+        self.storage = storage
+        self.src = src
+
+    def work(self, cancelled) -> IngestResult:
+        return ingest(self.storage, self.src, self.report_percent, cancelled)
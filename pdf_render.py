@@ -0,0 +1,155 @@
+import argparse
+import math
+import sys
+import threading
+import time
+from typing import List, Tuple
+
+import fitz  # PyMuPDF
+from PyQt5 import sip
+from PyQt5.QtGui import QImage, QPixmap
+
+# Растр PyMuPDF передаётся в Qt без промежуточных копий: QImage смотрит прямо в буфер
+# fitz.Pixmap, а единственная копия - преобразование в QPixmap (родной формат экрана).
+# Раньше страница копировалась трижды: pix.samples -> bytes, QImage.copy(), QPixmap.fromImage.
+
+# Количество компонентов на пиксель -> формат QImage (рендер всегда в RGB или градациях серого)
+_FORMATS = {
+    (1, False): QImage.Format_Grayscale8,
+    (3, False): QImage.Format_RGB888,
+    (4, True): QImage.Format_RGBA8888,
+}
+
+# Страница перерисовывается, только если нужный масштаб отличается от текущего больше чем на 15%
+ZOOM_THRESHOLD = 0.15
+# Масштаб (пикселей устройства на пункт PDF), выше которого страница целиком не растеризуется,
+# а рисуются только видимые тайлы
+MAX_PAGE_ZOOM = 4
+TILE_SIZE = 1024
+
+
+class RenderStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.renders = 0
+        self.raster_bytes = 0
+        self.bytes_copied = 0
+
+    def record(self, raster_bytes: int = 0, bytes_copied: int = 0, renders: int = 0):
+        with self.lock:
+            self.renders += renders
+            self.raster_bytes += raster_bytes
+            self.bytes_copied += bytes_copied
+
+    def copied_per_render(self) -> float:
+        return self.bytes_copied / self.renders if self.renders else 0.0
+
+    def __str__(self):
+        mb = 1024 * 1024
+        return (f'рендеров: {self.renders}, растр: {self.raster_bytes / mb:.1f} МБ, '
+                f'скопировано: {self.bytes_copied / mb:.1f} МБ '
+                f'({self.copied_per_render() / mb:.2f} МБ на страницу)')
+
+
+render_stats = RenderStats()
+
+
+def image_format(n: int, alpha: bool) -> QImage.Format:
+    fmt = _FORMATS.get((n, bool(alpha)))
+    if fmt is None:
+        raise ValueError(f'Неподдерживаемый формат растра: n={n}, alpha={alpha}')
+    return fmt
+
+
+def image_to_pixmap(image: QImage, device_ratio: float = 1.0) -> QPixmap:
+    # Вызывается только в GUI-потоке: QPixmap нельзя создавать в фоновых потоках
+    pixmap = QPixmap.fromImage(image)
+    pixmap.setDevicePixelRatio(device_ratio)
+    render_stats.record(bytes_copied=pixmap.width() * pixmap.height() * pixmap.depth() // 8)
+    return pixmap
+
+
+class RenderedPage:
+    # QImage не владеет памятью, поэтому fitz.Pixmap хранится рядом с ним:
+    # буфер жив, пока жив этот объект (в том числе при передаче между потоками через сигнал)
+    __slots__ = ('pix', 'image')
+
+    def __init__(self, pix: fitz.Pixmap):
+        fmt = image_format(pix.n, pix.alpha)
+        self.pix = pix
+        raster_bytes = pix.stride * pix.height
+        if hasattr(pix, 'samples_ptr'):
+            # Строки растра могут быть выровнены не по 4 байтам, поэтому stride передаётся явно
+            data = sip.voidptr(pix.samples_ptr, raster_bytes)
+            render_stats.record(raster_bytes=raster_bytes, renders=1)
+        else:
+            # Старые версии PyMuPDF отдают только копию буфера в виде bytes
+            data = pix.samples
+            render_stats.record(raster_bytes=raster_bytes, bytes_copied=raster_bytes, renders=1)
+        self.image = QImage(data, pix.width, pix.height, pix.stride, fmt)
+
+    def to_pixmap(self, device_ratio: float = 1.0) -> QPixmap:
+        return image_to_pixmap(self.image, device_ratio)
+
+
+def render_page(doc, page_num: int, zoom: float, clip=None) -> RenderedPage:
+    return RenderedPage(doc.load_page(page_num).get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip))
+
+
+def render_pixmap(doc, page_num: int, zoom: float, device_ratio: float = 1.0, clip=None) -> QPixmap:
+    return render_page(doc, page_num, zoom, clip).to_pixmap(device_ratio)
+
+
+def fit_zoom(page_rect, width: float, height: float = 0, device_ratio: float = 1.0) -> float:
+    # Масштаб, при котором страница вписывается в область width x height логических пикселей
+    # (height = 0 - только по ширине), в пикселях устройства на пункт PDF.
+    # Округление до сотых не даёт ключам кэша плодиться из-за дробных размеров окна
+    scale = width / page_rect.width
+    if height > 0:
+        scale = min(scale, height / page_rect.height)
+    return max(round(scale * device_ratio, 2), 0.01)
+
+
+def zoom_changed(current, wanted: float, threshold: float = ZOOM_THRESHOLD) -> bool:
+    return current is None or abs(wanted / current - 1) > threshold
+
+
+def tile_grid(page_rect, visible, zoom: float, tile_size: int = TILE_SIZE) -> List[Tuple[int, int, fitz.Rect]]:
+    # Видимая часть страницы (в пунктах PDF) делится на тайлы по сетке, привязанной к странице,
+    # чтобы при прокрутке уже отрисованные тайлы брались из кэша по (колонка, строка)
+    side = tile_size / zoom
+    area = fitz.Rect(visible) & page_rect
+    if area.is_empty:
+        return []
+    tiles = []
+    for row in range(int(area.y0 // side), math.ceil(area.y1 / side)):
+        for col in range(int(area.x0 // side), math.ceil(area.x1 / side)):
+            rect = fitz.Rect(col * side, row * side, (col + 1) * side, (row + 1) * side) & page_rect
+            if not rect.is_empty:
+                tiles.append((col, row, rect))
+    return tiles
+
+
+def main():
+    from PyQt5.QtGui import QGuiApplication
+
+    parser = argparse.ArgumentParser(description='Замер копирования памяти при рендере страниц PDF')
+    parser.add_argument('pdf', help='путь к PDF')
+    parser.add_argument('--zoom', type=float, default=2)
+    parser.add_argument('--pages', type=int, default=20, help='сколько первых страниц отрисовать')
+    args = parser.parse_args()
+
+    app = QGuiApplication(sys.argv[:1])
+    doc = fitz.open(args.pdf)
+    started = time.perf_counter()
+    for page_num in range(min(args.pages, doc.page_count)):
+        render_pixmap(doc, page_num, args.zoom)
+    seconds = time.perf_counter() - started
+    doc.close()
+    print(render_stats)
+    print(f'{seconds / max(render_stats.renders, 1) * 1000:.1f} мс на страницу')
+    del app
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+import argparse
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+from typing import Callable, List, NamedTuple, Optional
+
+# PDF книг хранятся по SHA-256 содержимого: <root>/ab/cd/<sha256>.pdf.
+# Одинаковые издания занимают место один раз, а книги ссылаются на общий файл.
+# Число ссылок на файл считают триггеры по books.pdf_path, поэтому оно не расходится с таблицей,
+# а файлы без ссылок удаляет collect_garbage().
+# Между store() и записью книги ссылки ещё нет: файл защищён меткой в памяти процесса (pins),
+# которую снимает release() - после записи книги или при отказе от выбранного файла.
+
+HASH_CHUNK = 1024 * 1024
+
+
+class StoredPdf(NamedTuple):
+    sha256: str
+    path: str
+    size: int
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class IngestCancelled(Exception):
+    pass
+
+
+def copy_and_hash(src: str, dst: str, progress: Optional[Callable[[int, int], None]] = None,
+                  cancelled: Optional[Callable[[], bool]] = None) -> str:
+    # Один проход по исходному файлу: каждый фрагмент хэшируется и тот же буфер пишется в копию,
+    # так что копия совпадает с хэшем, даже если оригинал меняют во время копирования.
+    # Перед возвратом данные сброшены на диск (fsync)
+    digest = hashlib.sha256()
+    total = os.path.getsize(src)
+    view = memoryview(bytearray(HASH_CHUNK))
+    # Без буферизации: фрагменты читаются прямо в view, а запись идёт по дескрипторам
+    with open(src, 'rb', buffering=0) as source, open(dst, 'wb', buffering=0) as target:
+        fd = target.fileno()
+        done = 0
+        while True:
+            if cancelled is not None and cancelled():
+                raise IngestCancelled()
+            count = source.readinto(view)
+            if not count:
+                break
+            data = view[:count]
+            digest.update(data)
+            while data:
+                data = data[os.write(fd, data):]
+            done += count
+            if progress is not None:
+                progress(done, total)
+        os.fsync(target.fileno())
+    return digest.hexdigest()
+
+
+def _fsync_directory(path: str):
+    # Переименование становится надёжным только после fsync каталога (POSIX)
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class PdfStorage:
+    def __init__(self, root: str):
+        self.root = root
+        # Путь -> число незавершённых добавлений; сборщик такие файлы не трогает
+        self.pins = {}
+        self.lock = threading.Lock()
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4], f'{digest}.pdf')
+
+    def is_managed(self, path: str) -> bool:
+        return os.path.abspath(path).startswith(os.path.abspath(self.root) + os.sep)
+
+    def store(self, src: str, progress: Optional[Callable[[int, int], None]] = None,
+              cancelled: Optional[Callable[[], bool]] = None,
+              validate: Optional[Callable[[str], None]] = None) -> StoredPdf:
+        # Кладёт файл в хранилище (если такого содержимого там ещё нет). Ссылку на него
+        # нужно записать register() в той же транзакции, что и строку книги, а затем снять
+        # метку release(). Жёсткую ссылку на внешний файл не делаем: правка оригинала изменила бы хранилище
+        os.makedirs(self.root, exist_ok=True)
+        temp = os.path.join(self.root, f'.ingest-{os.getpid()}-{threading.get_ident()}.tmp')
+        try:
+            digest = copy_and_hash(src, temp, progress, cancelled)
+            # Проверка идёт по уже скопированному файлу, пока он ещё не виден в хранилище
+            if validate is not None:
+                validate(temp)
+            target = self.blob_path(digest)
+            # Метка и проверка существования - под той же блокировкой, что и сборка мусора:
+            # иначе сборщик мог бы удалить уже существующий файл сразу после проверки
+            with self.lock:
+                self.pins[target] = self.pins.get(target, 0) + 1
+                if not os.path.exists(target):
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    os.replace(temp, target)
+                    _fsync_directory(os.path.dirname(target))
+            return StoredPdf(digest, target, os.path.getsize(target))
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
+
+    def release(self, db, stored: StoredPdf):
+        # Снимает метку store(). Файл, на который так и не сослалась книга (выбор отменён или
+        # запись не удалась), регистрируется с нулевым счётчиком, и его удалит collect_garbage()
+        with self.lock:
+            count = self.pins.get(stored.path, 0) - 1
+            if count > 0:
+                self.pins[stored.path] = count
+            else:
+                self.pins.pop(stored.path, None)
+        with db.transaction() as conn:
+            self.register(conn, stored)
+
+    def adopt(self, path: str) -> StoredPdf:
+        # Файл уже лежит в каталоге приложения: переносим его жёсткой ссылкой без копирования
+        digest = file_sha256(path)
+        target = self.blob_path(digest)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            try:
+                os.link(path, target)
+            except OSError:
+                shutil.copyfile(path, target)
+        return StoredPdf(digest, target, os.path.getsize(target))
+
+    @staticmethod
+    def register(conn: sqlite3.Connection, stored: StoredPdf):
+        conn.execute('''
+            INSERT INTO pdf_blobs (sha256, path, size, refcount) VALUES (?, ?, ?, 0)
+            ON CONFLICT (sha256) DO NOTHING
+        ''', stored)
+
+    def collect_garbage(self, db, before_remove: Optional[Callable[[str], None]] = None) -> List[str]:
+        # Строки удаляются в транзакции, файлы - после неё: при сбое между шагами
+        # остаётся лишь файл-сирота, которого не видит ни одна книга (его уберёт orphans()).
+        # Файлы с меткой store() пропускаются: книга на них ещё только записывается
+        with self.lock:
+            with db.transaction() as conn:
+                paths = [row[0] for row in conn.execute('SELECT path FROM pdf_blobs WHERE refcount <= 0')
+                         if row[0] not in self.pins]
+                conn.executemany('DELETE FROM pdf_blobs WHERE path = ?', ((path,) for path in paths))
+            for path in paths:
+                if before_remove is not None:
+                    before_remove(path)
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return paths
+
+    def orphans(self, conn: sqlite3.Connection) -> List[str]:
+        known = {os.path.abspath(row[0]) for row in conn.execute('SELECT path FROM pdf_blobs')}
+        found = []
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.abspath(os.path.join(directory, name))
+                if len(name) == 68 and name.endswith('.pdf') and path not in known:
+                    found.append(path)
+        return found
+
+
+def main():
+    from repository import Database
+
+    parser = argparse.ArgumentParser(description='Обслуживание хранилища PDF по SHA-256')
+    parser.add_argument('database', help='books.db | library.db | bookstore.db')
+    parser.add_argument('root', help='каталог хранилища (pdfs, library_pdfs, book_pdfs)')
+    parser.add_argument('--adopt', action='store_true',
+                        help='перенести PDF, на которые ссылаются книги, в хранилище')
+    parser.add_argument('--gc', action='store_true', help='удалить файлы без ссылок')
+    args = parser.parse_args()
+
+    storage = PdfStorage(args.root)
+    db = Database(args.database)
+    try:
+        if args.adopt:
+            with db.reader() as conn:
+                paths = [row[0] for row in conn.execute('''
+                    SELECT DISTINCT pdf_path FROM books
+                    WHERE pdf_path IS NOT NULL AND pdf_path != ''
+                      AND pdf_path NOT IN (SELECT path FROM pdf_blobs)
+                ''')]
+            moved = 0
+            for path in paths:
+                if not os.path.exists(path):
+                    continue
+                inside = storage.is_managed(path)
+                stored = storage.adopt(path) if inside else storage.store(path)
+                with db.transaction() as conn:
+                    storage.register(conn, stored)
+                    conn.execute('UPDATE books SET pdf_path = ? WHERE pdf_path = ?', (stored.path, path))
+                if inside:
+                    os.remove(path)
+                else:
+                    storage.release(db, stored)
+                moved += 1
+            print(f'Перенесено файлов: {moved}')
+        if args.gc:
+            removed = storage.collect_garbage(db)
+            with db.reader() as conn:
+                orphans = storage.orphans(conn)
+            for path in orphans:
+                os.remove(path)
+            print(f'Удалено файлов без ссылок: {len(removed) + len(orphans)}')
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+# Запросы статистики и экспорта, которые выполняют приложения.
+# Вынесены сюда, чтобы query_plan.py мог проверить их планы на реальной базе.
+# Статистика читает сводные таблицы из sales_summary.py, а не всю историю продаж.
+
+# Gemini-Project.py (books.db)
+GEMINI_SALES_BY_BOOK = '''
+    SELECT b.title, sales_by_book.sales_count, sales_by_book.sales_count * COALESCE(b.price, 0)
+    FROM sales_by_book
+    JOIN books b ON b.id = sales_by_book.book_id
+'''
+
+GEMINI_EXPORT = '''
+    SELECT s.date AS "Дата продажи", s.book_id AS "ID книги", b.title AS "Название книги",
+           b.author AS "Автор", b.price AS "Цена"
+    FROM sales s
+    LEFT JOIN books b ON b.id = s.book_id
+    ORDER BY s.date DESC
+'''
+
+GEMINI_EXPORT_COUNT = 'SELECT COALESCE(SUM(sales_count), 0) FROM sales_by_book'
+
+# Grok-project.py (library.db)
+GROK_TOTALS = 'SELECT amount, sales_count FROM sales_totals WHERE id = 1'
+
+GROK_TOP_BOOKS = '''
+    SELECT b.title, sales_by_book.sales_count, sales_by_book.amount
+    FROM sales_by_book
+    JOIN books b ON b.id = sales_by_book.book_id
+    ORDER BY sales_by_book.sales_count DESC
+    LIMIT 5
+'''
+
+GROK_HAS_SALES = 'SELECT EXISTS (SELECT 1 FROM sales)'
+
+GROK_EXPORT = '''
+    SELECT b.title AS "Title", s.sale_date AS "Sale Date", s.amount AS "Amount"
+    FROM sales s
+    JOIN books b ON s.book_id = b.id
+    ORDER BY s.sale_date DESC
+'''
+
+# Число выгружаемых строк для индикатора экспорта - из сводной таблицы, без подсчёта продаж
+GROK_EXPORT_COUNT = 'SELECT COALESCE((SELECT sales_count FROM sales_totals WHERE id = 1), 0)'
+
+# Qwen-project.py (bookstore.db)
+# Агрегаты по пустой таблице дают одну строку с нулями, как и прежний запрос по sales
+QWEN_TOTALS = '''
+    SELECT COALESCE(SUM(sales_count), 0) as total_sales,
+           COALESCE(SUM(quantity), 0)    as total_books,
+           COALESCE(SUM(total), 0)       as total_amount,
+           COALESCE(SUM(total) / NULLIF(SUM(sales_count), 0), 0) as avg_check
+    FROM sales_totals
+'''
+
+QWEN_TOP_BOOKS = '''
+    SELECT book_title, quantity as total_qty, total as total_sum
+    FROM sales_by_book
+    ORDER BY quantity DESC LIMIT 5
+'''
+
+QWEN_DAILY = '''
+    SELECT day, total as daily_total
+    FROM sales_by_day
+    ORDER BY day
+'''
+
+# Видимое окно графика при масштабировании: диапазон по первичному ключу сводной таблицы
+QWEN_DAILY_WINDOW = '''
+    SELECT day, total as daily_total
+    FROM sales_by_day
+    WHERE day BETWEEN ? AND ?
+    ORDER BY day
+'''
+
+QWEN_EXPORT = '''
+    SELECT
+        date as "Дата продажи", book_id as "ID книги", book_title as "Название книги",
+        price as "Цена", quantity as "Количество", total as "Сумма"
+    FROM sales
+    ORDER BY date DESC
+'''
+
+QWEN_EXPORT_COUNT = 'SELECT COALESCE(SUM(sales_count), 0) FROM sales_totals'
+
+# Сводные листы отчёта (sales_export.py). Группируются сводные таблицы или дни, а не строки продаж,
+# поэтому временное B-дерево здесь строится по O(книг) или O(дней) строк; в SHIPPED_QUERIES не входят.
+# Выручка в books.db считается по текущей цене книги, как и в статистике приложения.
+GEMINI_REPORT_BY_BOOK = '''
+    SELECT b.title AS "Название книги", b.author AS "Автор", s.sales_count AS "Продаж",
+           s.sales_count * COALESCE(b.price, 0) AS "Выручка (₽)"
+    FROM sales_by_book s
+    JOIN books b ON b.id = s.book_id
+    ORDER BY 4 DESC
+'''
+
+GEMINI_REPORT_BY_AUTHOR = '''
+    SELECT b.author AS "Автор", COUNT(*) AS "Книг", SUM(s.sales_count) AS "Продаж",
+           SUM(s.sales_count * COALESCE(b.price, 0)) AS "Выручка (₽)"
+    FROM sales_by_book s
+    JOIN books b ON b.id = s.book_id
+    GROUP BY b.author
+    ORDER BY 4 DESC
+'''
+
+# Продажи за день по книгам читаются из индекса idx_sales_day уже упорядоченными,
+# а с ценами соединяются O(дней x книг) строк, а не каждая продажа
+_GEMINI_DAY_BOOK = '''
+    SELECT date(date) AS day, book_id, COUNT(*) AS sales_count
+    FROM sales
+    GROUP BY date(date), book_id
+'''
+
+GEMINI_REPORT_BY_DAY = f'''
+    SELECT d.day AS "День", SUM(d.sales_count) AS "Продаж",
+           SUM(d.sales_count * COALESCE(b.price, 0)) AS "Выручка (₽)"
+    FROM ({_GEMINI_DAY_BOOK}) d
+    LEFT JOIN books b ON b.id = d.book_id
+    GROUP BY d.day
+    ORDER BY d.day
+'''
+
+GEMINI_REPORT_BY_MONTH = f'''
+    SELECT substr(d.day, 1, 7) AS "Месяц", SUM(d.sales_count) AS "Продаж",
+           SUM(d.sales_count * COALESCE(b.price, 0)) AS "Выручка (₽)"
+    FROM ({_GEMINI_DAY_BOOK}) d
+    LEFT JOIN books b ON b.id = d.book_id
+    GROUP BY 1
+    ORDER BY 1
+'''
+
+QWEN_REPORT_BY_BOOK = '''
+    SELECT book_title AS "Название книги", sales_count AS "Продаж", quantity AS "Количество",
+           total AS "Сумма"
+    FROM sales_by_book
+    ORDER BY total DESC
+'''
+
+# Сводка по книгам хранится по названию; автор берётся у книги с тем же названием
+QWEN_REPORT_BY_AUTHOR = '''
+    SELECT COALESCE(b.author, 'Неизвестен') AS "Автор", COUNT(*) AS "Книг", SUM(s.sales_count) AS "Продаж",
+           SUM(s.quantity) AS "Количество", SUM(s.total) AS "Сумма"
+    FROM sales_by_book s
+    LEFT JOIN (SELECT title, MIN(author) AS author FROM books GROUP BY title) b ON b.title = s.book_title
+    GROUP BY 1
+    ORDER BY 5 DESC
+'''
+
+QWEN_REPORT_BY_DAY = '''
+    SELECT day AS "День", sales_count AS "Продаж", quantity AS "Количество", total AS "Сумма"
+    FROM sales_by_day
+    ORDER BY day
+'''
+
+QWEN_REPORT_BY_MONTH = '''
+    SELECT substr(day, 1, 7) AS "Месяц", SUM(sales_count) AS "Продаж", SUM(quantity) AS "Количество",
+           SUM(total) AS "Сумма"
+    FROM sales_by_day
+    GROUP BY 1
+    ORDER BY 1
+'''
+
+GEMINI_PIVOTS = (
+    ('По книгам', GEMINI_REPORT_BY_BOOK),
+    ('По авторам', GEMINI_REPORT_BY_AUTHOR),
+    ('По дням', GEMINI_REPORT_BY_DAY),
+    ('По месяцам', GEMINI_REPORT_BY_MONTH),
+)
+
+QWEN_PIVOTS = (
+    ('По книгам', QWEN_REPORT_BY_BOOK),
+    ('По авторам', QWEN_REPORT_BY_AUTHOR),
+    ('По дням', QWEN_REPORT_BY_DAY),
+    ('По месяцам', QWEN_REPORT_BY_MONTH),
+)
+
+# Запросы, из которых складывается один снимок статистики (stats_service.py)
+GEMINI_STATS = {'by_book': GEMINI_SALES_BY_BOOK}
+GROK_STATS = {'totals': GROK_TOTALS, 'top_books': GROK_TOP_BOOKS}
+QWEN_STATS = {'totals': QWEN_TOTALS, 'top_books': QWEN_TOP_BOOKS, 'daily': QWEN_DAILY}
+
+# Запросы приложений для проверки планов (query_plan.py): пары (SQL, пример параметров)
+SHIPPED_QUERIES = {
+    'books.db': (
+        (GEMINI_SALES_BY_BOOK, ()),
+        (GEMINI_EXPORT, ()),
+        (GEMINI_EXPORT_COUNT, ()),
+    ),
+    'library.db': (
+        (GROK_TOTALS, ()),
+        (GROK_TOP_BOOKS, ()),
+        (GROK_HAS_SALES, ()),
+        (GROK_EXPORT, ()),
+        (GROK_EXPORT_COUNT, ()),
+    ),
+    'bookstore.db': (
+        (QWEN_TOTALS, ()),
+        (QWEN_TOP_BOOKS, ()),
+        (QWEN_DAILY, ()),
+        (QWEN_DAILY_WINDOW, ('2024-01-01', '2024-12-31')),
+        (QWEN_EXPORT, ()),
+        (QWEN_EXPORT_COUNT, ()),
+    ),
+}
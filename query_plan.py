@@ -0,0 +1,62 @@
+import os
+import re
+import sqlite3
+import sys
+from typing import List, Sequence
+
+from queries import SHIPPED_QUERIES
+from sales_summary import SUMMARY_TABLES
+
+_SCAN_RE = re.compile(r'^SCAN (\w+)')
+_SUBQUERY_RE = re.compile(r'^(?:MATERIALIZE|CO-ROUTINE) (\w+)')
+
+
+def explain(conn: sqlite3.Connection, sql: str, params: Sequence = ()) -> List[str]:
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+
+
+def plan_problems(conn: sqlite3.Connection, sql: str, params: Sequence = ()) -> List[str]:
+    plan = explain(conn, sql, params)
+    # Просмотр уже вычисленного подзапроса, константной строки или сводной таблицы
+    # (в ней O(книг) или O(дней) строк) не считается полным просмотром
+    subqueries = {'CONSTANT', *SUMMARY_TABLES}
+    subqueries.update(m.group(1) for m in map(_SUBQUERY_RE.match, plan) if m)
+    problems = []
+    for detail in plan:
+        match = _SCAN_RE.match(detail)
+        if match and match.group(1) not in subqueries and 'INDEX' not in detail:
+            problems.append(f'полный просмотр таблицы: {detail}')
+        if 'USE TEMP B-TREE FOR GROUP BY' in detail:
+            problems.append(f'группировка через временное B-дерево: {detail}')
+    return problems
+
+
+def check_database(path: str) -> List[str]:
+    queries = SHIPPED_QUERIES[os.path.basename(path)]
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        problems = []
+        for sql, params in queries:
+            for problem in plan_problems(conn, sql, params):
+                problems.append(f'{" ".join(sql.split())[:80]}...\n    {problem}')
+        return problems
+    finally:
+        conn.close()
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(f'Использование: python query_plan.py {" | ".join(SHIPPED_QUERIES)}')
+        sys.exit(2)
+    failed = False
+    for path in sys.argv[1:]:
+        problems = check_database(path)
+        print(f'{path}: {"OK" if not problems else f"проблем: {len(problems)}"}')
+        for problem in problems:
+            print(f'  {problem}')
+        failed = failed or bool(problems)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+import argparse
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Optional, Sequence
+
+import fitz  # PyMuPDF
+from PyQt5 import sip
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap
+
+from pdf_render import image_format, image_to_pixmap, render_stats
+
+# Растеризация PDF в отдельных процессах: рендер упирается в CPU и под GIL в потоках не масштабируется.
+# Результат возвращается через разделяемую память, а не сериализацией растра через pipe.
+
+# Сколько документов каждый рабочий процесс держит открытыми
+WORKER_DOCUMENTS = 8
+
+# Состояние рабочего процесса
+_documents: 'OrderedDict[str, fitz.Document]' = OrderedDict()
+_cancelled_before = None
+
+
+def _init_worker(cancelled_before):
+    global _cancelled_before
+    _cancelled_before = cancelled_before
+
+
+def _document(path: str) -> fitz.Document:
+    # Повторные задания по той же книге не разбирают PDF заново
+    doc = _documents.pop(path, None)
+    if doc is None:
+        doc = fitz.open(path)
+    _documents[path] = doc
+    while len(_documents) > WORKER_DOCUMENTS:
+        _documents.popitem(last=False)[1].close()
+    return doc
+
+
+def _render(path: str, page_num: int, zoom: float, clip: Optional[tuple], fit_width: Optional[int],
+            generation: int):
+    # Задание могли отменить, пока оно ждало в очереди процесса
+    if generation < _cancelled_before.value:
+        return None
+    page = _document(path).load_page(page_num)
+    if fit_width:
+        zoom = fit_width / page.rect.width
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=fitz.Rect(clip) if clip else None)
+    size = pix.stride * pix.height
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    shm.buf[:size] = pix.samples_mv if hasattr(pix, 'samples_mv') else pix.samples
+    shm.close()
+    # Сегмент удаляет получатель (RenderResult.release)
+    return shm.name, pix.width, pix.height, pix.stride, pix.n, bool(pix.alpha)
+
+
+class RenderResult:
+    shm = None
+
+    def __init__(self, name: str, width: int, height: int, stride: int, n: int, alpha: bool):
+        self.shm = shared_memory.SharedMemory(name=name)
+        self.width = width
+        self.height = height
+        self.stride = stride
+        self.n = n
+        self.alpha = alpha
+        self.image = None
+        render_stats.record(raster_bytes=stride * height, bytes_copied=stride * height, renders=1)
+
+    @property
+    def size(self) -> int:
+        return self.stride * self.height
+
+    def buffer(self) -> memoryview:
+        return self.shm.buf[:self.size]
+
+    def to_image(self) -> QImage:
+        # QImage смотрит прямо в разделяемую память; она живёт, пока не вызван release()
+        if self.image is None:
+            self.image = QImage(sip.voidptr(self.shm.buf), self.width, self.height, self.stride,
+                                image_format(self.n, self.alpha))
+        return self.image
+
+    def to_pixmap(self, device_ratio: float = 1.0) -> QPixmap:
+        pixmap = image_to_pixmap(self.to_image(), device_ratio)
+        self.release()
+        return pixmap
+
+    def release(self):
+        if self.shm is None:
+            return
+        self.image = None
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
+
+    def __del__(self):
+        self.release()
+
+
+class RenderJob:
+    def __init__(self, future):
+        self.future = future
+        self.cancelled = False
+        self.lock = threading.Lock()
+
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+        self.future.cancel()
+
+    def add_done_callback(self, callback: Callable[[Optional[RenderResult]], None]):
+        # callback вызывается в служебном потоке пула; отменённые задания до него не доходят
+        def on_done(future):
+            try:
+                raw = future.result()
+            except CancelledError:
+                return
+            except Exception:
+                raw = None
+            with self.lock:
+                cancelled = self.cancelled
+            result = RenderResult(*raw) if raw else None
+            if cancelled:
+                if result is not None:
+                    result.release()
+                return
+            callback(result)
+        self.future.add_done_callback(on_done)
+
+    def result(self, timeout: Optional[float] = None) -> Optional[RenderResult]:
+        raw = self.future.result(timeout)
+        return RenderResult(*raw) if raw else None
+
+
+class RenderPool:
+    def __init__(self, workers: Optional[int] = None):
+        # spawn, а не fork: копировать процесс с запущенными потоками Qt небезопасно
+        context = multiprocessing.get_context('spawn')
+        self.cancelled_before = context.Value('i', 0)
+        self.generation = 0
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count(), mp_context=context,
+            initializer=_init_worker, initargs=(self.cancelled_before,),
+        )
+
+    def submit(self, path: str, page_num: int, zoom: float = 1.0, clip: Optional[Sequence[float]] = None,
+               fit_width: Optional[int] = None) -> RenderJob:
+        clip = tuple(clip) if clip is not None else None
+        future = self.executor.submit(_render, path, page_num, zoom, clip, fit_width, self.generation)
+        return RenderJob(future)
+
+    def run(self, fn: Callable, *args):
+        # Произвольная функция уровня модуля в рабочем процессе (например, генерация обложки)
+        return self.executor.submit(fn, *args)
+
+    def cancel_all(self):
+        # Задания, отправленные до этого момента, процессы пропускают не рендеря
+        self.generation += 1
+        with self.cancelled_before.get_lock():
+            self.cancelled_before.value = self.generation
+
+    def shutdown(self):
+        self.cancel_all()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+_shared_pool = None
+# shared_pool() зовут и GUI-поток, и фоновый индексатор текста: без блокировки оба могли бы создать пул
+_shared_pool_lock = threading.Lock()
+
+
+def shared_pool() -> RenderPool:
+    # Процессы запускаются при первом обращении, а не при старте приложения
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = RenderPool()
+        return _shared_pool
+
+
+def shutdown_shared_pool():
+    # При закрытии приложения: отменяет задания в очереди и останавливает процессы.
+    # Если пул так и не понадобился, процессы не запускаются ради остановки
+    global _shared_pool
+    with _shared_pool_lock:
+        pool, _shared_pool = _shared_pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+class RenderService(QObject):
+    # (ключ, RenderResult или None при ошибке рендера); доставляется в поток владельца объекта
+    rendered = pyqtSignal(object, object)
+
+    def __init__(self, pool: Optional[RenderPool] = None, parent=None):
+        super().__init__(parent)
+        self.pool = pool or shared_pool()
+
+    def submit(self, key, path: str, page_num: int, zoom: float = 1.0, clip=None,
+               fit_width: Optional[int] = None) -> RenderJob:
+        job = self.pool.submit(path, page_num, zoom, clip, fit_width)
+        job.add_done_callback(lambda result: self.rendered.emit(key, result))
+        return job
+
+
+def render_thumbnails(pool: RenderPool, directory: str, out_dir: str, width: int) -> int:
+    paths = [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+             if name.lower().endswith('.pdf')]
+    jobs = [(path, pool.submit(path, 0, fit_width=width)) for path in paths]
+    os.makedirs(out_dir, exist_ok=True)
+    done = 0
+    for path, job in jobs:
+        try:
+            result = job.result()
+        except Exception as e:
+            print(f'{path}: {e}')
+            continue
+        if result is None:
+            continue
+        try:
+            colorspace = fitz.csGRAY if result.n - result.alpha == 1 else fitz.csRGB
+            pix = fitz.Pixmap(colorspace, result.width, result.height, result.buffer(), result.alpha)
+            pix.save(os.path.join(out_dir, os.path.splitext(os.path.basename(path))[0] + '.png'))
+            done += 1
+        finally:
+            result.release()
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Генерация обложек для всех PDF каталога на всех ядрах')
+    parser.add_argument('directory', help='каталог с PDF (pdfs, book_pdfs)')
+    parser.add_argument('--out', default='thumbnails')
+    parser.add_argument('--width', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=None, help='по умолчанию - число ядер')
+    args = parser.parse_args()
+
+    pool = RenderPool(args.workers)
+    started = time.perf_counter()
+    try:
+        done = render_thumbnails(pool, args.directory, args.out, args.width)
+    finally:
+        pool.shutdown()
+    seconds = time.perf_counter() - started
+    print(f'Обложек: {done} за {seconds:.1f} с ({done / seconds if seconds else 0:.1f} в секунду, '
+          f'процессов: {args.workers or os.cpu_count()})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+from urllib.parse import quote
+
+READ_POOL_SIZE = 4
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KB = 64 * 1024
+MMAP_SIZE = 256 * 1024 * 1024
+
+
+def configure_connection(conn: sqlite3.Connection):
+    # Отрицательный cache_size задаётся в килобайтах, а не в страницах
+    conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA cache_size = -{CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+    conn.execute('PRAGMA temp_store = MEMORY')
+
+
+class Database:
+    def __init__(self, path: str, pool_size: int = READ_POOL_SIZE):
+        self.path = os.path.abspath(path)
+        self.pool_size = pool_size
+
+        # Соединение на запись принадлежит потоку, создавшему Database (GUI-потоку);
+        # фоновые задачи пишут через собственные соединения. WAL позволяет читателям не ждать писателя
+        self.writer = sqlite3.connect(self.path)
+        self.writer.execute('PRAGMA journal_mode = WAL')
+        configure_connection(self.writer)
+
+        self.readers: 'queue.LifoQueue[sqlite3.Connection]' = queue.LifoQueue()
+        self.opened_readers = 0
+        self.pool_lock = threading.Lock()
+
+    def _open_reader(self) -> sqlite3.Connection:
+        uri = f'file:{quote(self.path)}?mode=ro'
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        configure_connection(conn)
+        conn.execute('PRAGMA query_only = 1')
+        return conn
+
+    def _acquire_reader(self) -> sqlite3.Connection:
+        try:
+            return self.readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self.pool_lock:
+            if self.opened_readers < self.pool_size:
+                self.opened_readers += 1
+                return self._open_reader()
+        return self.readers.get()
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            conn.set_progress_handler(None, 0)
+            if conn.in_transaction:
+                conn.rollback()
+            self.readers.put(conn)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        try:
+            yield self.writer
+            self.writer.commit()
+        except BaseException:
+            self.writer.rollback()
+            raise
+
+    def close(self):
+        while True:
+            try:
+                self.readers.get_nowait().close()
+            except queue.Empty:
+                break
+        self.writer.close()
@@ -0,0 +1,277 @@
+import csv
+import os
+import re
+import sqlite3
+import tempfile
+import time
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from background_job import BackgroundJob
+
+# Экспорт продаж потоком: строки читаются из курсора порциями fetchmany и сразу уходят в файл,
+# поэтому в памяти одновременно не больше BATCH_ROWS строк, сколько бы продаж ни было в базе.
+# Excel пишется xlsxwriter в режиме constant_memory (строка листа сбрасывается на диск, как только
+# начата следующая), CSV - модулем csv, Parquet - пакетами записей pyarrow.
+# Отчёт в Excel - несколько листов за один проход: сводные листы считает SQLite (запросы
+# *_PIVOTS в queries.py), а сырые продажи идут следом; всё читается в одной транзакции.
+# Файл собирается во временном файле рядом с целевым и переименовывается только после успешного
+# завершения: отменённый или упавший экспорт не оставляет обрезанного файла.
+
+BATCH_ROWS = 10000
+# Строк на листе Excel вместе с заголовком; остальное продолжается на следующем листе
+EXCEL_MAX_ROWS = 1048576
+# Сколько строк Parquet может придержать в памяти, пока у какого-то столбца нет ни одного значения
+PARQUET_PENDING_ROWS = 100000
+
+FORMATS = {
+    '.xlsx': 'xlsx',
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+}
+
+# Фильтр для QFileDialog; формат определяется по расширению выбранного файла
+FILE_FILTER = 'Excel Files (*.xlsx);;CSV (*.csv);;Parquet (*.parquet)'
+
+
+class ExportError(Exception):
+    pass
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+class SheetResult(NamedTuple):
+    sheet: str
+    rows: int
+    seconds: float
+
+
+def export_format(path: str) -> str:
+    fmt = FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ExportError(f'неизвестный формат файла: {os.path.basename(path)}')
+    return fmt
+
+
+def report_sheets(path: str, pivots: Sequence[Tuple[str, str]], raw: Tuple[str, str]) -> list:
+    # Сводные листы возможны только в Excel; CSV и Parquet получают одни сырые продажи
+    if WRITERS[export_format(path)].multi_sheet:
+        return [*pivots, raw]
+    return [raw]
+
+
+def with_extension(path: str, selected_filter: str) -> str:
+    # Если расширение не введено, берётся из выбранного в диалоге фильтра
+    if os.path.splitext(path)[1]:
+        return path
+    match = re.search(r'\*(\.\w+)', selected_filter or '')
+    return path + (match.group(1) if match else '.xlsx')
+
+
+class _XlsxWriter:
+    multi_sheet = True
+
+    def __init__(self, path: str):
+        try:
+            import xlsxwriter
+        except ImportError:
+            raise ExportError('для экспорта в Excel нужен пакет xlsxwriter')
+        self.workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+        self.header_format = self.workbook.add_format({
+            'bold': True,
+            'text_wrap': True,
+            'valign': 'top',
+            'border': 1
+        })
+
+    def begin(self, sheet: str, columns: Sequence[str]):
+        self.columns = columns
+        self.sheet = sheet
+        self.sheets = 0
+        self._add_sheet()
+
+    def _add_sheet(self):
+        # В режиме constant_memory строки пишутся строго по порядку, поэтому заголовок и ширина
+        # столбцов задаются сразу при создании листа
+        self.sheets += 1
+        name = self.sheet if self.sheets == 1 else f'{self.sheet} ({self.sheets})'
+        self.worksheet = self.workbook.add_worksheet(name[:31])
+        for col_num, value in enumerate(self.columns):
+            self.worksheet.write(0, col_num, value, self.header_format)
+            self.worksheet.set_column(col_num, col_num, max(len(value), 12))
+        self.row = 1
+
+    def write(self, rows: List[tuple]):
+        for values in rows:
+            if self.row == EXCEL_MAX_ROWS:
+                self._add_sheet()
+            self.worksheet.write_row(self.row, 0, values)
+            self.row += 1
+
+    def close(self):
+        self.workbook.close()
+
+
+class _CsvWriter:
+    multi_sheet = False
+
+    def __init__(self, path: str):
+        # BOM, чтобы Excel открыл кириллицу без выбора кодировки
+        self.file = open(path, 'w', newline='', encoding='utf-8-sig')
+        self.writer = csv.writer(self.file)
+
+    def begin(self, sheet: str, columns: Sequence[str]):
+        self.writer.writerow(columns)
+
+    def write(self, rows: List[tuple]):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetWriter:
+    multi_sheet = False
+
+    def __init__(self, path: str):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ExportError('для экспорта в Parquet нужен пакет pyarrow')
+        self.pa = pyarrow
+        self.path = path
+        self.columns = []
+        # Типы Python, встреченные в каждом столбце до создания схемы
+        self.kinds = []
+        self.pending = []
+        self.pending_rows = 0
+        self.schema = None
+        self.writer = None
+
+    def begin(self, sheet: str, columns: Sequence[str]):
+        self.columns = list(columns)
+        self.kinds = [set() for _ in self.columns]
+
+    def write(self, rows: List[tuple]):
+        if self.writer is not None:
+            self._write_batch(rows)
+            return
+        # Тип столбца определяется по первому непустому значению, а не по первой порции целиком:
+        # столбец без значений в первой порции получил бы тип null, и следующие порции не привелись бы.
+        # Пока такие столбцы есть, порции придерживаются в памяти
+        for kinds, column in zip(self.kinds, zip(*rows)):
+            kinds.update(type(value) for value in column if value is not None)
+        self.pending.append(rows)
+        self.pending_rows += len(rows)
+        if all(self.kinds) or self.pending_rows >= PARQUET_PENDING_ROWS:
+            self._open()
+
+    def _arrow_type(self, kinds: set):
+        # Столбец SQLite может смешивать целые и дробные значения; пустой до конца - строковый
+        if float in kinds:
+            return self.pa.float64()
+        if int in kinds:
+            return self.pa.int64()
+        if bytes in kinds:
+            return self.pa.binary()
+        return self.pa.string()
+
+    def _open(self):
+        self.schema = self.pa.schema([(name, self._arrow_type(kinds))
+                                      for name, kinds in zip(self.columns, self.kinds)])
+        self.writer = self.pa.parquet.ParquetWriter(self.path, self.schema)
+        pending, self.pending = self.pending, []
+        for rows in pending:
+            self._write_batch(rows)
+
+    def _write_batch(self, rows: List[tuple]):
+        arrays = [self.pa.array(column, type=field.type) for column, field in zip(zip(*rows), self.schema)]
+        self.writer.write_batch(self.pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        # Продаж нет или столбцы так и остались пустыми: схема по тому, что встретилось
+        if self.writer is None:
+            self._open()
+        self.writer.close()
+
+
+WRITERS = {
+    'xlsx': _XlsxWriter,
+    'csv': _CsvWriter,
+    'parquet': _ParquetWriter,
+}
+
+
+def export_sheets(conn: sqlite3.Connection, sheets: Sequence[Tuple[str, str]], path: str,
+                  count_sql: Optional[str] = None, progress: Optional[Callable[[int, int], None]] = None,
+                  cancelled: Optional[Callable[[], bool]] = None,
+                  batch_rows: int = BATCH_ROWS) -> List[SheetResult]:
+    # sheets - пары (лист, запрос); имена столбцов - псевдонимы из запроса.
+    # count_sql (число строк для индикатора) и все листы читаются в одной транзакции
+    writer_class = WRITERS[export_format(path)]
+    if len(sheets) > 1 and not writer_class.multi_sheet:
+        raise ExportError('несколько листов можно сохранить только в Excel (.xlsx)')
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.export-', suffix=os.path.splitext(path)[1])
+    os.close(fd)
+    results = []
+    rows_written = 0
+    try:
+        conn.execute('BEGIN')
+        try:
+            total = conn.execute(count_sql).fetchone()[0] if count_sql else 0
+            writer = writer_class(tmp_path)
+            try:
+                for sheet, sql in sheets:
+                    started = time.perf_counter()
+                    cursor = conn.execute(sql)
+                    writer.begin(sheet, [desc[0] for desc in cursor.description])
+                    sheet_rows = 0
+                    while True:
+                        if cancelled is not None and cancelled():
+                            raise ExportCancelled()
+                        rows = cursor.fetchmany(batch_rows)
+                        if not rows:
+                            break
+                        writer.write(rows)
+                        sheet_rows += len(rows)
+                        rows_written += len(rows)
+                        if progress is not None:
+                            progress(rows_written, max(total, rows_written))
+                    results.append(SheetResult(sheet, sheet_rows, time.perf_counter() - started))
+            finally:
+                writer.close()
+        finally:
+            conn.rollback()
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return results
+
+
+def export_query(conn: sqlite3.Connection, sql: str, path: str, sheet: str = 'Продажи',
+                 count_sql: Optional[str] = None, progress: Optional[Callable[[int, int], None]] = None,
+                 cancelled: Optional[Callable[[], bool]] = None, batch_rows: int = BATCH_ROWS) -> int:
+    results = export_sheets(conn, [(sheet, sql)], path, count_sql, progress, cancelled, batch_rows)
+    return results[0].rows
+
+
+class ExportJob(BackgroundJob):
+    cancelled_errors = (ExportCancelled,)
+
+    def __init__(self, db, sheets: Sequence[Tuple[str, str]], path: str, count_sql: Optional[str] = None,
+                 parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.sheets = list(sheets)
+        self.path = path
+        self.count_sql = count_sql
+
+    def work(self, cancelled) -> int:
+        with self.db.reader() as conn:
+            results = export_sheets(conn, self.sheets, self.path, self.count_sql, self.report_percent, cancelled)
+        return sum(result.rows for result in results)
@@ -0,0 +1,260 @@
+import argparse
+import math
+import os
+import sqlite3
+import sys
+from typing import Dict, List
+
+# Сводные таблицы продаж обновляются триггерами в той же транзакции, что и сама продажа,
+# поэтому статистика читает O(книг + дней) строк вместо всей истории продаж.
+# Для каждой сводной таблицы хранится запрос, который считает её заново по сырым продажам:
+# он используется при первичном заполнении, пересборке и сверке.
+
+SUMMARY_TABLES = ('sales_totals', 'sales_by_book', 'sales_by_day')
+
+# Gemini-Project.py (books.db): выручка считается по текущей цене книги,
+# поэтому достаточно количества продаж
+GEMINI_SUMMARY = {
+    'schema': '''
+        CREATE TABLE IF NOT EXISTS sales_by_book (
+            book_id INTEGER PRIMARY KEY,
+            sales_count INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_sales_by_book_count ON sales_by_book(sales_count);
+
+        CREATE TRIGGER IF NOT EXISTS sales_summary_ai AFTER INSERT ON sales BEGIN
+            INSERT INTO sales_by_book (book_id, sales_count) VALUES (new.book_id, 1)
+            ON CONFLICT (book_id) DO UPDATE SET sales_count = sales_count + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS sales_summary_ad AFTER DELETE ON sales BEGIN
+            UPDATE sales_by_book SET sales_count = sales_count - 1 WHERE book_id = old.book_id;
+            DELETE FROM sales_by_book WHERE book_id = old.book_id AND sales_count <= 0;
+        END;
+    ''',
+    'tables': {
+        'sales_by_book': 'SELECT book_id, COUNT(*) FROM sales GROUP BY book_id',
+    },
+}
+
+# Grok-project.py (library.db)
+GROK_SUMMARY = {
+    'schema': '''
+        CREATE TABLE IF NOT EXISTS sales_totals (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            sales_count INTEGER NOT NULL,
+            amount REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS sales_by_book (
+            book_id INTEGER PRIMARY KEY,
+            sales_count INTEGER NOT NULL,
+            amount REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_sales_by_book_count ON sales_by_book(sales_count);
+        CREATE TABLE IF NOT EXISTS sales_by_day (
+            day TEXT PRIMARY KEY,
+            sales_count INTEGER NOT NULL,
+            amount REAL NOT NULL
+        );
+
+        CREATE TRIGGER IF NOT EXISTS sales_summary_ai AFTER INSERT ON sales BEGIN
+            INSERT INTO sales_totals (id, sales_count, amount) VALUES (1, 1, COALESCE(new.amount, 0))
+            ON CONFLICT (id) DO UPDATE SET
+                sales_count = sales_count + 1, amount = amount + excluded.amount;
+            INSERT INTO sales_by_book (book_id, sales_count, amount) VALUES (new.book_id, 1, COALESCE(new.amount, 0))
+            ON CONFLICT (book_id) DO UPDATE SET
+                sales_count = sales_count + 1, amount = amount + excluded.amount;
+            INSERT INTO sales_by_day (day, sales_count, amount) VALUES (date(new.sale_date), 1, COALESCE(new.amount, 0))
+            ON CONFLICT (day) DO UPDATE SET
+                sales_count = sales_count + 1, amount = amount + excluded.amount;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS sales_summary_ad AFTER DELETE ON sales BEGIN
+            UPDATE sales_totals SET
+                sales_count = sales_count - 1, amount = amount - COALESCE(old.amount, 0)
+            WHERE id = 1;
+            UPDATE sales_by_book SET
+                sales_count = sales_count - 1, amount = amount - COALESCE(old.amount, 0)
+            WHERE book_id = old.book_id;
+            DELETE FROM sales_by_book WHERE book_id = old.book_id AND sales_count <= 0;
+            UPDATE sales_by_day SET
+                sales_count = sales_count - 1, amount = amount - COALESCE(old.amount, 0)
+            WHERE day = date(old.sale_date);
+            DELETE FROM sales_by_day WHERE day = date(old.sale_date) AND sales_count <= 0;
+        END;
+    ''',
+    'tables': {
+        'sales_totals': 'SELECT 1, COUNT(*), COALESCE(SUM(amount), 0) FROM sales',
+        'sales_by_book': 'SELECT book_id, COUNT(*), COALESCE(SUM(amount), 0) FROM sales GROUP BY book_id',
+        'sales_by_day': '''
+            SELECT date(sale_date), COUNT(*), COALESCE(SUM(amount), 0)
+            FROM sales GROUP BY date(sale_date)
+        ''',
+    },
+}
+
+# Qwen-project.py (bookstore.db): топ книг в приложении строится по названию;
+# продажи без названия собираются в одну строку с пустым ключом
+QWEN_SUMMARY = {
+    'schema': '''
+        CREATE TABLE IF NOT EXISTS sales_totals (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            sales_count INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            total REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS sales_by_book (
+            book_title TEXT NOT NULL PRIMARY KEY,
+            sales_count INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            total REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_sales_by_book_quantity ON sales_by_book(quantity);
+        CREATE TABLE IF NOT EXISTS sales_by_day (
+            day TEXT PRIMARY KEY,
+            sales_count INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            total REAL NOT NULL
+        );
+
+        CREATE TRIGGER IF NOT EXISTS sales_summary_ai AFTER INSERT ON sales BEGIN
+            INSERT INTO sales_totals (id, sales_count, quantity, total)
+            VALUES (1, 1, COALESCE(new.quantity, 0), COALESCE(new.total, 0))
+            ON CONFLICT (id) DO UPDATE SET
+                sales_count = sales_count + 1,
+                quantity = quantity + excluded.quantity,
+                total = total + excluded.total;
+            INSERT INTO sales_by_book (book_title, sales_count, quantity, total)
+            VALUES (COALESCE(new.book_title, ''), 1, COALESCE(new.quantity, 0), COALESCE(new.total, 0))
+            ON CONFLICT (book_title) DO UPDATE SET
+                sales_count = sales_count + 1,
+                quantity = quantity + excluded.quantity,
+                total = total + excluded.total;
+            INSERT INTO sales_by_day (day, sales_count, quantity, total)
+            VALUES (date(new.date), 1, COALESCE(new.quantity, 0), COALESCE(new.total, 0))
+            ON CONFLICT (day) DO UPDATE SET
+                sales_count = sales_count + 1,
+                quantity = quantity + excluded.quantity,
+                total = total + excluded.total;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS sales_summary_ad AFTER DELETE ON sales BEGIN
+            UPDATE sales_totals SET
+                sales_count = sales_count - 1,
+                quantity = quantity - COALESCE(old.quantity, 0),
+                total = total - COALESCE(old.total, 0)
+            WHERE id = 1;
+            UPDATE sales_by_book SET
+                sales_count = sales_count - 1,
+                quantity = quantity - COALESCE(old.quantity, 0),
+                total = total - COALESCE(old.total, 0)
+            WHERE book_title = COALESCE(old.book_title, '');
+            DELETE FROM sales_by_book WHERE book_title = COALESCE(old.book_title, '') AND sales_count <= 0;
+            UPDATE sales_by_day SET
+                sales_count = sales_count - 1,
+                quantity = quantity - COALESCE(old.quantity, 0),
+                total = total - COALESCE(old.total, 0)
+            WHERE day = date(old.date);
+            DELETE FROM sales_by_day WHERE day = date(old.date) AND sales_count <= 0;
+        END;
+    ''',
+    'tables': {
+        'sales_totals': '''
+            SELECT 1, COUNT(*), COALESCE(SUM(quantity), 0), COALESCE(SUM(total), 0) FROM sales
+        ''',
+        'sales_by_book': '''
+            SELECT COALESCE(book_title, ''), COUNT(*), COALESCE(SUM(quantity), 0), COALESCE(SUM(total), 0)
+            FROM sales GROUP BY 1
+        ''',
+        'sales_by_day': '''
+            SELECT date(date), COUNT(*), COALESCE(SUM(quantity), 0), COALESCE(SUM(total), 0)
+            FROM sales GROUP BY date(date)
+        ''',
+    },
+}
+
+SUMMARIES = {
+    'books.db': GEMINI_SUMMARY,
+    'library.db': GROK_SUMMARY,
+    'bookstore.db': QWEN_SUMMARY,
+}
+
+# Счётчики версий данных: растут при каждом изменении продаж и каталога (но не остатков),
+# по ним кэш статистики понимает, что снимок устарел, не пересчитывая агрегаты
+DATA_VERSIONS = ('sales', 'books')
+
+def data_version(conn: sqlite3.Connection) -> tuple:
+    versions = dict(conn.execute('SELECT name, version FROM data_versions'))
+    return tuple(versions.get(name, 0) for name in DATA_VERSIONS)
+
+
+def rebuild_script(summary: Dict) -> str:
+    # Пересчёт с нуля для команды --rebuild; первичное заполнение записано в migrations.py
+    return ''.join(
+        f'DELETE FROM {table}; INSERT INTO {table} {select};'
+        for table, select in summary['tables'].items()
+    )
+
+
+def rebuild(conn: sqlite3.Connection, summary: Dict):
+    conn.executescript(f'BEGIN IMMEDIATE; {rebuild_script(summary)} COMMIT;')
+
+
+def _same(stored: tuple, actual: tuple) -> bool:
+    if len(stored) != len(actual):
+        return False
+    for left, right in zip(stored, actual):
+        if isinstance(left, float) or isinstance(right, float):
+            if left is None or right is None or not math.isclose(left, right, rel_tol=1e-9, abs_tol=1e-6):
+                return False
+        elif left != right:
+            return False
+    return True
+
+
+def verify(conn: sqlite3.Connection, summary: Dict) -> List[str]:
+    mismatches = []
+    # Одна транзакция чтения: сводки и сырые продажи сравниваются на одном снимке
+    conn.execute('BEGIN')
+    try:
+        for table, select in summary['tables'].items():
+            stored = {row[0]: row for row in conn.execute(f'SELECT * FROM {table}')}
+            actual = {row[0]: row for row in conn.execute(select)}
+            for key in stored.keys() | actual.keys():
+                if key not in stored:
+                    if any(actual[key][1:]):
+                        mismatches.append(f'{table}[{key}]: нет строки, ожидалось {actual[key]}')
+                elif key not in actual:
+                    if any(stored[key][1:]):
+                        mismatches.append(f'{table}[{key}]: лишняя строка {stored[key]}')
+                elif not _same(stored[key], actual[key]):
+                    mismatches.append(f'{table}[{key}]: {stored[key]} != {actual[key]}')
+    finally:
+        conn.rollback()
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сверка и пересборка сводных таблиц продаж')
+    parser.add_argument('database', help=' | '.join(SUMMARIES))
+    parser.add_argument('--rebuild', action='store_true', help='пересчитать сводки по сырым продажам')
+    args = parser.parse_args()
+
+    summary = SUMMARIES[os.path.basename(args.database)]
+    conn = sqlite3.connect(args.database, isolation_level=None)
+    try:
+        if args.rebuild:
+            rebuild(conn, summary)
+            print('Сводные таблицы пересобраны')
+        mismatches = verify(conn, summary)
+    finally:
+        conn.close()
+
+    for mismatch in mismatches:
+        print(mismatch)
+    print('Расхождений нет' if not mismatches else f'Расхождений: {len(mismatches)}')
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
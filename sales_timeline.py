@@ -0,0 +1,155 @@
+from datetime import date, timedelta
+from itertools import groupby
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import matplotlib.dates as mdates
+from PyQt5.QtCore import QObject, QTimer
+
+# График продаж за годы истории. Шаг (день, неделя, месяц) выбирается по видимому диапазону,
+# так что точек не больше MAX_BUCKETS, а линия дополнительно прореживается LTTB до числа,
+# которое различимо по ширине виджета: пики и провалы сохраняются, а рисуется в разы меньше точек.
+# При масштабировании и прокрутке перечитывается только видимое окно сводной таблицы по дням.
+
+MAX_BUCKETS = 1000
+# Точек на линии, если ширина виджета неизвестна
+MAX_POINTS = 400
+# Задержка перед запросом окна: при прокрутке мышью xlim меняется на каждом движении
+RELOAD_DELAY_MS = 150
+
+BUCKET_TITLES = {
+    'day': 'Продажи по дням',
+    'week': 'Продажи по неделям',
+    'month': 'Продажи по месяцам',
+}
+
+
+class Timeline(NamedTuple):
+    bucket: str
+    # Первый день каждого шага в формате SQLite ('YYYY-MM-DD')
+    days: List[str]
+    values: List[float]
+
+
+def choose_bucket(first: str, last: str, max_buckets: int = MAX_BUCKETS) -> str:
+    span = (date.fromisoformat(last) - date.fromisoformat(first)).days + 1
+    if span <= max_buckets:
+        return 'day'
+    if span / 7 <= max_buckets:
+        return 'week'
+    return 'month'
+
+
+def bucket_start(day: str, bucket: str) -> str:
+    if bucket == 'day':
+        return day
+    d = date.fromisoformat(day)
+    if bucket == 'week':
+        return (d - timedelta(days=d.weekday())).isoformat()
+    return d.replace(day=1).isoformat()
+
+
+def aggregate(rows: Sequence[Tuple[str, float]], bucket: str) -> Tuple[List[str], List[float]]:
+    # Строки уже отсортированы по дню (первичный ключ сводной таблицы), поэтому хватает одного прохода
+    days, values = [], []
+    for start, group in groupby(rows, key=lambda row: bucket_start(row[0], bucket)):
+        days.append(start)
+        values.append(sum(value or 0 for _, value in group))
+    return days, values
+
+
+def lttb(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    # Largest-Triangle-Three-Buckets: из каждой корзины берётся точка, образующая наибольший
+    # треугольник с уже выбранной точкой и средним следующей корзины. Возвращает индексы точек
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    every = (n - 2) / (threshold - 2)
+    picked = [0]
+    a = 0
+    for i in range(threshold - 2):
+        start = int((i + 1) * every) + 1
+        end = min(int((i + 2) * every) + 1, n)
+        avg_x = sum(xs[start:end]) / (end - start)
+        avg_y = sum(ys[start:end]) / (end - start)
+
+        ax, ay = xs[a], ys[a]
+        best, best_area = start - 1, -1.0
+        for j in range(int(i * every) + 1, start):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        picked.append(best)
+        a = best
+    picked.append(n - 1)
+    return picked
+
+
+def build_timeline(rows: Sequence[Tuple[str, float]], first: Optional[str] = None, last: Optional[str] = None,
+                   points: int = MAX_POINTS) -> Timeline:
+    # rows - (день, сумма) по возрастанию дня; first/last - видимый диапазон (по умолчанию - все данные)
+    if not rows:
+        return Timeline('day', [], [])
+    bucket = choose_bucket(first or rows[0][0], last or rows[-1][0])
+    days, values = aggregate(rows, bucket)
+    if len(days) > points:
+        indices = lttb([date.fromisoformat(day).toordinal() for day in days], values, points)
+        days = [days[i] for i in indices]
+        values = [values[i] for i in indices]
+    return Timeline(bucket, days, values)
+
+
+class TimelineNavigator(QObject):
+    # Связывает SeriesPanel панели статистики с окном сводной таблицы: при смене видимого
+    # диапазона (панель инструментов matplotlib) перечитываются только дни внутри него
+    def __init__(self, db, window_sql: str, dashboard, panel, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.window_sql = window_sql
+        self.dashboard = dashboard
+        self.panel = panel
+        # Пользователь менял масштаб: новый снимок не сбрасывает выбранное окно
+        self.zoomed = False
+        self.updating = False
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(RELOAD_DELAY_MS)
+        self.timer.timeout.connect(self.load_visible)
+        panel.ax.callbacks.connect('xlim_changed', self.on_xlim_changed)
+
+    def points(self) -> int:
+        # Больше точки на два пикселя на глаз не различить
+        return max(self.dashboard.width() // 2, 50) if self.dashboard.width() > 0 else MAX_POINTS
+
+    def show(self, timeline: Timeline):
+        # Полный диапазон приходит готовым из снимка статистики (посчитан в фоне)
+        if self.zoomed:
+            self.load_visible()
+        else:
+            self.apply(timeline)
+
+    def on_xlim_changed(self, ax):
+        if self.updating:
+            return
+        self.zoomed = True
+        self.timer.start()
+
+    def load_visible(self):
+        lo, hi = self.panel.ax.get_xlim()
+        first = mdates.num2date(lo).date().isoformat()
+        last = mdates.num2date(hi).date().isoformat()
+        # Диапазон по первичному ключу сводной таблицы: O(дней в окне) строк
+        with self.db.reader() as conn:
+            rows = conn.execute(self.window_sql, (first, last)).fetchall()
+        self.apply(build_timeline(rows, first, last, self.points()), (lo, hi))
+
+    def apply(self, timeline: Timeline, xlim: Optional[Tuple[float, float]] = None):
+        # Собственные set_xlim панели не должны снова запускать перечитывание
+        self.updating = True
+        try:
+            self.panel.set_title(BUCKET_TITLES[timeline.bucket])
+            self.panel.update(timeline.days, timeline.values, xlim)
+        finally:
+            self.updating = False
+        self.dashboard.refresh()
+
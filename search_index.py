@@ -0,0 +1,135 @@
+import re
+import sqlite3
+from typing import List, Optional, Sequence, Tuple
+
+FTS_TABLE = 'books_fts'
+SEARCH_LIMIT = 1000
+
+# Вес колонок для bm25: совпадение в названии важнее, чем в описании
+TITLE_WEIGHT = 10.0
+AUTHOR_WEIGHT = 5.0
+DESCRIPTION_WEIGHT = 1.0
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_NUMERIC_RE = re.compile(r'[\d.,\s]+')
+
+_TRIGGERS = (
+    f'''
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON books
+    WHEN NOT EXISTS (SELECT 1 FROM import_state WHERE active) BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, title, author, description)
+        VALUES (new.id, new.title, new.author, new.description);
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON books BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, title, author, description)
+        VALUES ('delete', old.id, old.title, old.author, old.description);
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, author, description ON books BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, title, author, description)
+        VALUES ('delete', old.id, old.title, old.author, old.description);
+        INSERT INTO {FTS_TABLE} (rowid, title, author, description)
+        VALUES (new.id, new.title, new.author, new.description);
+    END
+    ''',
+)
+
+
+def fts5_available(conn: sqlite3.Connection) -> bool:
+    try:
+        conn.execute('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)')
+        conn.execute('DROP TABLE temp.fts5_probe')
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def has_search_index(conn: sqlite3.Connection) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+    ).fetchone()
+    return row is not None
+
+
+def init_search_index(conn: sqlite3.Connection) -> bool:
+    if not fts5_available(conn):
+        return False
+    created = not has_search_index(conn)
+    conn.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+            title, author, description,
+            content='books', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+    create_triggers(conn)
+    if created:
+        # Индекс появился у уже заполненной базы - проиндексировать существующие книги
+        rebuild_search_index(conn)
+    conn.commit()
+    return True
+
+
+def create_triggers(conn: sqlite3.Connection):
+    for sql in _TRIGGERS:
+        conn.execute(sql)
+
+
+def drop_triggers(conn: sqlite3.Connection):
+    for suffix in ('ai', 'ad', 'au'):
+        conn.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+
+
+def rebuild_search_index(conn: sqlite3.Connection):
+    conn.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def build_match_query(text: str) -> Optional[str]:
+    tokens = _TOKEN_RE.findall(text.lower())
+    if not tokens:
+        return None
+    # Каждое слово - префиксный поиск, все слова должны встретиться
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def build_phrase_query(text: str) -> Optional[str]:
+    tokens = _TOKEN_RE.findall(text.lower())
+    if not tokens:
+        return None
+    # Слова идут подряд, как во фразе; последнее может быть недописанным
+    return '"' + ' '.join(tokens) + '"*'
+
+
+def search_books(conn: sqlite3.Connection, columns: Sequence[str], text: str,
+                 limit: int = SEARCH_LIMIT) -> List[Tuple]:
+    text = text.strip()
+    match = build_match_query(text)
+    if match is None or _NUMERIC_RE.fullmatch(text) or not has_search_index(conn):
+        return like_search(conn, columns, text, limit)
+
+    select = ', '.join(f'b.{column}' for column in columns)
+    return conn.execute(f'''
+        SELECT {select}
+        FROM {FTS_TABLE} f
+        JOIN books b ON b.id = f.rowid
+        WHERE {FTS_TABLE} MATCH ?
+        ORDER BY bm25({FTS_TABLE}, ?, ?, ?)
+        LIMIT ?
+    ''', (match, TITLE_WEIGHT, AUTHOR_WEIGHT, DESCRIPTION_WEIGHT, limit)).fetchall()
+
+
+def like_search(conn: sqlite3.Connection, columns: Sequence[str], text: str,
+                limit: int = SEARCH_LIMIT) -> List[Tuple]:
+    # Запасной путь без FTS5, а также для поиска по цене и количеству
+    select = ', '.join(columns)
+    pattern = f'%{text.lower()}%'
+    return conn.execute(f'''
+        SELECT {select}
+        FROM books
+        WHERE LOWER(title) LIKE ? OR LOWER(author) LIKE ? OR LOWER(description) LIKE ?
+        OR CAST(price AS TEXT) LIKE ? OR CAST(quantity AS TEXT) LIKE ?
+        LIMIT ?
+    ''', (pattern, pattern, pattern, pattern, pattern, limit)).fetchall()
@@ -0,0 +1,92 @@
+import sqlite3
+from typing import Sequence
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+
+from search_index import search_books
+
+DEBOUNCE_MS = 250
+# Как часто (в инструкциях виртуальной машины SQLite) проверять, не устарел ли запрос
+PROGRESS_STEPS = 1000
+
+
+class _SearchSignals(QObject):
+    finished = pyqtSignal(int, list)
+    failed = pyqtSignal(int, str)
+
+
+class _SearchTask(QRunnable):
+    def __init__(self, search, generation: int, text: str):
+        super().__init__()
+        self.search = search
+        self.generation = generation
+        self.text = text
+
+    def is_stale(self) -> bool:
+        return self.generation != self.search.generation
+
+    def run(self):
+        if self.is_stale():
+            return
+        try:
+            # Соединение только для чтения из пула: не мешает записи продаж (WAL)
+            with self.search.db.reader() as conn:
+                conn.set_progress_handler(lambda: 1 if self.is_stale() else 0, PROGRESS_STEPS)
+                rows = search_books(conn, self.search.columns, self.text)
+        except sqlite3.Error as e:
+            if not self.is_stale():
+                self.search.signals.failed.emit(self.generation, str(e))
+            return
+        if not self.is_stale():
+            self.search.signals.finished.emit(self.generation, rows)
+
+
+class BookSearch(QObject):
+    results_ready = pyqtSignal(list)
+    # Пустой фильтр: показать полный каталог, который модель подгружает сама
+    cleared = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, db, columns: Sequence[str], parent=None, delay: int = DEBOUNCE_MS):
+        super().__init__(parent)
+        self.db = db
+        self.columns = tuple(columns)
+        self.generation = 0
+        self.text = ''
+
+        self.signals = _SearchSignals()
+        self.signals.finished.connect(self._on_finished)
+        self.signals.failed.connect(self._on_failed)
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self._start)
+
+    def request(self, text: str):
+        # Новая версия запроса сразу делает устаревшим тот, что уже выполняется
+        self.text = text
+        self.generation += 1
+        if not text.strip():
+            self.timer.stop()
+            self.cleared.emit()
+            return
+        self.timer.start()
+
+    def cancel(self):
+        self.timer.stop()
+        self.generation += 1
+
+    def _start(self):
+        self.pool.start(_SearchTask(self, self.generation, self.text))
+
+    def _on_finished(self, generation: int, rows: list):
+        if generation == self.generation:
+            self.results_ready.emit(rows)
+
+    def _on_failed(self, generation: int, message: str):
+        if generation == self.generation:
+            self.failed.emit(message)
@@ -0,0 +1,220 @@
+import math
+from typing import List, Optional, Sequence, Tuple
+
+import matplotlib.dates as mdates
+import numpy as np
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.figure import Figure
+
+# Панель статистики, которая живёт всё время работы приложения. Фигура создаётся без pyplot
+# (не попадает в его реестр и освобождается вместе с виджетом), столбцы, сектора и линии
+# создаются один раз, а при новом снимке меняются только их высоты, углы и данные.
+# Если оси и подписи остались прежними, кадр собирается блиттингом: восстанавливается фон
+# без данных и поверх него рисуются только изменившиеся элементы. Полная перерисовка нужна,
+# лишь когда меняется число столбцов, подписи или масштаб осей.
+
+# Запас сверху, чтобы рост значений не менял масштаб оси на каждой продаже
+HEADROOM = 1.2
+
+
+def _y_limit(peak: float, current: float) -> float:
+    # Масштаб меняется, только если значения вышли за ось или сжались вдвое
+    if peak <= 0:
+        return current or 1.0
+    if current and current * 0.5 <= peak <= current:
+        return current
+    return peak * HEADROOM
+
+
+class BarPanel:
+    def __init__(self, ax, title: str, ylabel: str = '', xlabel: str = '', rotation: int = 45):
+        self.ax = ax
+        self.rotation = rotation
+        self.bars = None
+        self.labels: tuple = ()
+        self.top = 0.0
+        self.stale = True
+        ax.set_title(title)
+        ax.set_ylabel(ylabel)
+        if xlabel:
+            ax.set_xlabel(xlabel)
+
+    def artists(self) -> list:
+        return list(self.bars) if self.bars is not None else []
+
+    def update(self, labels: Sequence[str], values: Sequence[float]):
+        labels = tuple(labels)
+        values = [value or 0 for value in values]
+        if self.bars is None or len(self.bars) != len(values):
+            # Число столбцов изменилось - единственный случай, когда прямоугольники создаются заново
+            if self.bars is not None:
+                self.bars.remove()
+            self.bars = self.ax.bar(range(len(values)), values, animated=True)
+            self.ax.set_xticks(range(len(values)))
+            self.ax.set_xlim(-0.5, max(len(values), 1) - 0.5)
+            self.stale = True
+        else:
+            for bar, value in zip(self.bars, values):
+                bar.set_height(value)
+        if labels != self.labels:
+            self.labels = labels
+            self.ax.set_xticklabels(labels, rotation=self.rotation, ha='right' if self.rotation else 'center')
+            self.stale = True
+        top = _y_limit(max(values, default=0), self.top)
+        if top != self.top:
+            self.top = top
+            self.ax.set_ylim(0, top)
+            self.stale = True
+
+
+class PiePanel:
+    def __init__(self, ax, slots: int, title: str, labeldistance: float = 1.1, pctdistance: float = 0.6):
+        self.labeldistance = labeldistance
+        self.pctdistance = pctdistance
+        self.stale = True
+        ax.set_title(title)
+        # Сектора создаются на максимальное число долей; лишние просто скрываются
+        self.wedges, self.texts, self.autotexts = ax.pie(
+            [1] * slots, labels=[''] * slots, autopct='%1.1f%%',
+            labeldistance=labeldistance, pctdistance=pctdistance)
+        for artist in self.artists():
+            artist.set_animated(True)
+
+    def artists(self) -> list:
+        return [*self.wedges, *self.texts, *self.autotexts]
+
+    def update(self, labels: Sequence[str], values: Sequence[float]):
+        # Масштаб круга не зависит от данных, поэтому доли всегда обновляются блиттингом
+        values = [max(value or 0, 0) for value in values][:len(self.wedges)]
+        total = sum(values)
+        angle = 0.0
+        for i, wedge in enumerate(self.wedges):
+            value = values[i] if i < len(values) else 0
+            visible = total > 0 and value > 0
+            for artist in (wedge, self.texts[i], self.autotexts[i]):
+                artist.set_visible(visible)
+            if not visible:
+                continue
+            sweep = 360.0 * value / total
+            wedge.set_theta1(angle)
+            wedge.set_theta2(angle + sweep)
+            middle = math.radians(angle + sweep / 2)
+            x, y = math.cos(middle), math.sin(middle)
+            self.texts[i].set_text(labels[i])
+            self.texts[i].set_position((self.labeldistance * x, self.labeldistance * y))
+            self.texts[i].set_horizontalalignment('left' if x > 0 else 'right')
+            self.autotexts[i].set_text(f'{100 * value / total:.1f}%')
+            self.autotexts[i].set_position((self.pctdistance * x, self.pctdistance * y))
+            angle += sweep
+
+
+class SeriesPanel:
+    def __init__(self, ax, title: str, xlabel: str = '', ylabel: str = '', dates: bool = False):
+        self.ax = ax
+        self.dates = dates
+        self.xlim = None
+        self.top = 0.0
+        self.stale = True
+        (self.line,) = ax.plot([], [], animated=True)
+        ax.set_title(title)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        if dates:
+            locator = mdates.AutoDateLocator()
+            ax.xaxis.set_major_locator(locator)
+            ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+
+    def artists(self) -> list:
+        return [self.line]
+
+    def set_title(self, title: str):
+        if title != self.ax.get_title():
+            self.ax.set_title(title)
+            self.stale = True
+
+    def update(self, x: Sequence, y: Sequence[float], xlim: Optional[Tuple[float, float]] = None):
+        # dates=True: x - строки дат 'YYYY-MM-DD' в том виде, в каком их отдаёт SQLite.
+        # xlim - видимый диапазон при масштабировании, иначе ось подгоняется под данные
+        x = list(x)
+        y = [value or 0 for value in y]
+        if self.dates and x:
+            # Формат фиксирован, поэтому разбор через numpy, а не dateutil (в десятки раз быстрее)
+            x = mdates.date2num(np.array(x, dtype='datetime64[D]'))
+        self.line.set_data(x, y)
+        if xlim is None and len(x):
+            xlim = (float(min(x)), float(max(x)))
+            if xlim[0] == xlim[1]:
+                xlim = (xlim[0] - 1, xlim[1] + 1)
+        if xlim is not None and xlim != self.xlim:
+            self.xlim = xlim
+            self.ax.set_xlim(*xlim)
+            self.stale = True
+        top = _y_limit(max(y, default=0), self.top)
+        if top != self.top:
+            self.top = top
+            self.ax.set_ylim(0, top)
+            self.stale = True
+
+
+class StatsDashboard(FigureCanvas):
+    def __init__(self, figsize=(10, 5), parent=None):
+        super().__init__(Figure(figsize=figsize))
+        self.setParent(parent)
+        self.panels: list = []
+        self.caption = None
+        # Кадр без анимируемых элементов: снимается после каждой полной перерисовки
+        self.background = None
+        self.draw_pending = False
+        self.draws = 0
+        self.blits = 0
+        self.mpl_connect('draw_event', self._on_draw)
+
+    def add(self, panel):
+        self.panels.append(panel)
+        return panel
+
+    def set_caption(self, text: str, **kwargs):
+        if self.caption is None:
+            self.caption = self.figure.text(0.5, 0.99, text, ha='center', va='top', animated=True, **kwargs)
+        else:
+            self.caption.set_text(text)
+
+    def animated(self) -> List:
+        artists = [artist for panel in self.panels for artist in panel.artists()]
+        if self.caption is not None:
+            artists.append(self.caption)
+        return artists
+
+    def refresh(self):
+        # Вызывается после update() панелей
+        stale = any(panel.stale for panel in self.panels)
+        if self.background is None or stale or self.draw_pending:
+            # draw_idle схлопывает повторные вызовы: запланированная перерисовка покажет последние значения
+            if stale or self.background is None:
+                for panel in self.panels:
+                    panel.stale = False
+                self.figure.tight_layout(rect=(0, 0, 1, 0.94) if self.caption is not None else None)
+            self.draw_pending = True
+            self.draw_idle()
+            return
+        self.restore_region(self.background)
+        self._draw_animated()
+        self.blit(self.figure.bbox)
+        self.blits += 1
+
+    def resizeEvent(self, event):
+        # После смены размера фон снимется заново при полной перерисовке
+        self.background = None
+        super().resizeEvent(event)
+
+    def _on_draw(self, event):
+        self.draw_pending = False
+        self.draws += 1
+        self.background = self.copy_from_bbox(self.figure.bbox)
+        self._draw_animated()
+
+    def _draw_animated(self):
+        for artist in self.animated():
+            if artist.get_visible():
+                self.figure.draw_artist(artist)
+
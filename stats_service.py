@@ -0,0 +1,107 @@
+import sqlite3
+import time
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, NamedTuple, Optional
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from sales_summary import data_version
+
+# Статистика считается в фоновом потоке и отдаётся неизменяемым снимком вместе с версией данных
+# (счётчики data_versions), на которой он посчитан. Пока продаж и каталога не меняли, повторный
+# показ берёт снимок из кэша; если версия выросла, сразу показывается прежний снимок,
+# а свежий приходит сигналом snapshot_ready.
+
+
+class StatsSnapshot(NamedTuple):
+    version: tuple
+    # имя запроса -> кортеж строк результата
+    results: Mapping[str, tuple]
+    # то, что приложение строит из результатов в фоне (например, DataFrame для экспорта)
+    data: Any
+    seconds: float
+
+
+def compute_snapshot(conn: sqlite3.Connection, queries: Dict[str, str],
+                     prepare: Optional[Callable[[Mapping[str, tuple]], Any]] = None) -> StatsSnapshot:
+    started = time.perf_counter()
+    # Версия и все агрегаты читаются в одной транзакции, то есть из одного состояния базы
+    conn.execute('BEGIN')
+    try:
+        version = data_version(conn)
+        results = MappingProxyType({name: tuple(conn.execute(sql).fetchall()) for name, sql in queries.items()})
+    finally:
+        conn.rollback()
+    data = prepare(results) if prepare is not None else None
+    return StatsSnapshot(version, results, data, time.perf_counter() - started)
+
+
+class _StatsSignals(QObject):
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+
+class _StatsTask(QRunnable):
+    def __init__(self, service):
+        super().__init__()
+        self.service = service
+
+    def run(self):
+        try:
+            with self.service.db.reader() as conn:
+                snapshot = compute_snapshot(conn, self.service.queries, self.service.prepare)
+        except sqlite3.Error as e:
+            self.service.signals.failed.emit(str(e))
+            return
+        self.service.signals.finished.emit(snapshot)
+
+
+class StatsService(QObject):
+    snapshot_ready = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, db, queries: Dict[str, str], prepare=None, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.queries = dict(queries)
+        self.prepare = prepare
+        self.snapshot: Optional[StatsSnapshot] = None
+        # Версия, для которой уже считается снимок
+        self.computing = None
+
+        self.signals = _StatsSignals(self)
+        self.signals.finished.connect(self._on_finished)
+        self.signals.failed.connect(self._on_failed)
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+
+    def current_version(self) -> tuple:
+        with self.db.reader() as conn:
+            return data_version(conn)
+
+    def request(self) -> Optional[StatsSnapshot]:
+        # Снимок из кэша возвращается сразу (None - его ещё нет); если данные изменились,
+        # новый снимок считается в фоне
+        version = self.current_version()
+        if self.snapshot is not None and self.snapshot.version == version:
+            return self.snapshot
+        if self.computing != version:
+            self.computing = version
+            self.pool.start(_StatsTask(self))
+        return self.snapshot
+
+    def refreshing(self) -> bool:
+        return self.computing is not None
+
+    def _on_finished(self, snapshot: StatsSnapshot):
+        if self.computing is not None and snapshot.version >= self.computing:
+            self.computing = None
+        # Снимки приходят по порядку, но более старый не должен заменить более новый
+        if self.snapshot is None or snapshot.version >= self.snapshot.version:
+            self.snapshot = snapshot
+        self.snapshot_ready.emit(self.snapshot)
+
+    def _on_failed(self, message: str):
+        self.computing = None
+        self.failed.emit(message)
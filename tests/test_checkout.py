@@ -0,0 +1,128 @@
+import sqlite3
+import threading
+
+import pytest
+
+from checkout import QWEN_SALES, OutOfStock, apply_basket, checkout
+from repository import BUSY_TIMEOUT_MS, configure_connection
+from sales_summary import QWEN_SUMMARY, verify
+
+SCHEMA = '''
+    CREATE TABLE books (
+        id INTEGER PRIMARY KEY,
+        title TEXT NOT NULL,
+        price REAL,
+        quantity INTEGER NOT NULL
+    );
+    CREATE TABLE sales (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        book_id INTEGER,
+        book_title TEXT,
+        date TEXT,
+        quantity INTEGER,
+        price REAL,
+        total REAL
+    );
+'''
+
+BOOKS = 3
+STOCK = 20
+
+
+def connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None, check_same_thread=False)
+    configure_connection(conn)
+    return conn
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'bookstore.db')
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.executescript(SCHEMA + QWEN_SUMMARY['schema'])
+    conn.executemany('INSERT INTO books (id, title, price, quantity) VALUES (?, ?, 100, ?)',
+                     ((i, f'Книга {i}', STOCK) for i in range(1, BOOKS + 1)))
+    conn.commit()
+    conn.close()
+    return path
+
+
+def stock(conn: sqlite3.Connection) -> dict:
+    return dict(conn.execute('SELECT id, quantity FROM books'))
+
+
+def test_concurrent_baskets_do_not_oversell(db_path):
+    # Кассы продают больше, чем есть на складе: часть корзин получает OutOfStock
+    sold = []
+    lock = threading.Lock()
+    start = threading.Barrier(4)
+
+    def till():
+        conn = connect(db_path)
+        try:
+            start.wait()
+            for _ in range(15):
+                try:
+                    lines = checkout(conn, QWEN_SALES, [(1, 1), (2, 2), (3, 1)])
+                except OutOfStock:
+                    continue
+                with lock:
+                    sold.extend(lines)
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=till) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    conn = connect(db_path)
+    try:
+        remaining = stock(conn)
+        for book_id in range(1, BOOKS + 1):
+            copies = sum(line.quantity for line in sold if line.book_id == book_id)
+            assert remaining[book_id] >= 0
+            assert copies + remaining[book_id] == STOCK
+            (recorded,) = conn.execute('SELECT COALESCE(SUM(quantity), 0) FROM sales WHERE book_id = ?',
+                                       (book_id,)).fetchone()
+            assert recorded == copies
+        # Книги 2 по две штуки - на складе на десять корзин
+        assert remaining[2] == 0
+        assert verify(conn, QWEN_SUMMARY) == []
+    finally:
+        conn.close()
+
+
+def test_partial_basket_rolls_back(db_path):
+    conn = connect(db_path)
+    try:
+        with pytest.raises(OutOfStock) as error:
+            checkout(conn, QWEN_SALES, [(1, 2), (2, STOCK + 1), (3, 1)])
+        assert (error.value.book_id, error.value.requested, error.value.available) == (2, STOCK + 1, STOCK)
+        # Уже списанная первая позиция вернулась на склад, продажи не записаны
+        assert stock(conn) == {1: STOCK, 2: STOCK, 3: STOCK}
+        assert conn.execute('SELECT COUNT(*) FROM sales').fetchone() == (0,)
+        assert conn.execute('SELECT COUNT(*) FROM sales_by_book').fetchone() == (0,)
+        assert not conn.in_transaction
+    finally:
+        conn.close()
+
+
+def test_apply_basket_inside_savepoint(db_path):
+    # Так корзину применяет очередь записи: ошибка откатывает только её точку сохранения
+    conn = connect(db_path)
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        apply_basket(conn, QWEN_SALES, [(3, 1)])
+        conn.execute('SAVEPOINT operation')
+        with pytest.raises(OutOfStock):
+            apply_basket(conn, QWEN_SALES, [(1, 1), (4, 1)])
+        conn.execute('ROLLBACK TO operation')
+        conn.execute('RELEASE operation')
+        conn.execute('COMMIT')
+        assert stock(conn) == {1: STOCK, 2: STOCK, 3: STOCK - 1}
+        assert conn.execute('SELECT book_id, quantity FROM sales').fetchall() == [(3, 1)]
+    finally:
+        conn.close()
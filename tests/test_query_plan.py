@@ -0,0 +1,124 @@
+import sqlite3
+
+import pytest
+
+from migrations import GEMINI_MIGRATIONS, GROK_MIGRATIONS, QWEN_MIGRATIONS, migrate
+from queries import SHIPPED_QUERIES
+from query_plan import check_database, plan_problems
+
+# Таблицы в том виде, в каком их создают приложения до миграций (init_db / create_tables)
+GEMINI_SCHEMA = '''
+    CREATE TABLE books (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        author TEXT NOT NULL,
+        price REAL,
+        description TEXT,
+        pdf_path TEXT,
+        quantity INTEGER DEFAULT 0
+    );
+    CREATE TABLE sales (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        book_id INTEGER,
+        date TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+'''
+
+GROK_SCHEMA = '''
+    CREATE TABLE books (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        author TEXT NOT NULL,
+        price REAL,
+        quantity INTEGER,
+        description TEXT,
+        pdf_path TEXT
+    );
+    CREATE TABLE sales (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        book_id INTEGER,
+        sale_date TEXT,
+        amount REAL,
+        FOREIGN KEY (book_id) REFERENCES books(id)
+    );
+'''
+
+QWEN_SCHEMA = '''
+    CREATE TABLE books (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        author TEXT NOT NULL,
+        price REAL NOT NULL,
+        description TEXT,
+        pdf_path TEXT,
+        quantity INTEGER DEFAULT 0,
+        added_date TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE sales (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        book_id INTEGER,
+        book_title TEXT,
+        date TEXT,
+        quantity INTEGER,
+        price REAL,
+        total REAL,
+        FOREIGN KEY (book_id) REFERENCES books(id)
+    );
+'''
+
+GEMINI_SALE = 'INSERT INTO sales (book_id, date) VALUES (?, ?)'
+GROK_SALE = 'INSERT INTO sales (book_id, sale_date, amount) VALUES (?, ?, 100)'
+QWEN_SALE = '''
+    INSERT INTO sales (book_id, book_title, date, quantity, price, total)
+    VALUES (?, 'Книга ' || ?1, ?, 1, 100, 100)
+'''
+
+APPS = {
+    'books.db': (GEMINI_SCHEMA, GEMINI_MIGRATIONS, GEMINI_SALE),
+    'library.db': (GROK_SCHEMA, GROK_MIGRATIONS, GROK_SALE),
+    'bookstore.db': (QWEN_SCHEMA, QWEN_MIGRATIONS, QWEN_SALE),
+}
+
+BOOKS = 50
+SALES = 2000
+
+
+def build_database(conn: sqlite3.Connection, name: str):
+    schema, migrations, sale = APPS[name]
+    conn.executescript(schema)
+    assert migrate(conn, migrations) == len(migrations)
+    with conn:
+        conn.executemany('INSERT INTO books (id, title, author, price, quantity) VALUES (?, ?, ?, 100, 10)',
+                         ((i, f'Книга {i}', f'Автор {i % 7}') for i in range(1, BOOKS + 1)))
+        # Продажи через триггеры заполняют и сводные таблицы
+        conn.executemany(sale, ((i % BOOKS + 1, f'2024-{i % 12 + 1:02d}-{i % 28 + 1:02d} 12:00:00')
+                                for i in range(SALES)))
+    # Планировщик выбирает индексы по статистике, как на базе, где уже есть продажи
+    conn.execute('ANALYZE')
+
+
+def shipped_queries():
+    return [pytest.param(name, sql, params, id=f'{name}-{i}')
+            for name, queries in SHIPPED_QUERIES.items()
+            for i, (sql, params) in enumerate(queries)]
+
+
+@pytest.mark.parametrize('name, sql, params', shipped_queries())
+def test_shipped_query_uses_indexes(name, sql, params):
+    conn = sqlite3.connect(':memory:')
+    try:
+        build_database(conn, name)
+        assert plan_problems(conn, sql, params) == []
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize('name', sorted(SHIPPED_QUERIES))
+def test_check_database(tmp_path, name):
+    path = str(tmp_path / name)
+    conn = sqlite3.connect(path)
+    try:
+        build_database(conn, name)
+    finally:
+        conn.close()
+    assert check_database(path) == []
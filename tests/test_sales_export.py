@@ -0,0 +1,34 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip('PyQt5.QtCore')
+pq = pytest.importorskip('pyarrow.parquet')
+
+from sales_export import export_query  # noqa: E402
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE sales (id INTEGER, date TEXT, note TEXT, total REAL)')
+    # Примечание появляется только в третьей порции, сумма - смесь целых и дробных
+    conn.executemany('INSERT INTO sales VALUES (?, ?, ?, ?)',
+                     ((i, '2024-01-01', f'№{i}' if i >= 25 else None, i + (0.5 if i % 2 else 0)) for i in range(30)))
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_parquet_column_empty_in_first_batch(conn, tmp_path):
+    path = str(tmp_path / 'sales.parquet')
+    assert export_query(conn, 'SELECT * FROM sales ORDER BY id', path, batch_rows=10) == 30
+    table = pq.read_table(path)
+    assert [str(field.type) for field in table.schema] == ['int64', 'string', 'string', 'double']
+    assert table.column('note').to_pylist()[24:] == [None, '№25', '№26', '№27', '№28', '№29']
+
+
+def test_parquet_without_rows(conn, tmp_path):
+    path = str(tmp_path / 'sales.parquet')
+    assert export_query(conn, 'SELECT * FROM sales WHERE id < 0', path) == 0
+    assert pq.read_table(path).column_names == ['id', 'date', 'note', 'total']
@@ -0,0 +1,61 @@
+from datetime import date, timedelta
+
+import pytest
+
+pytest.importorskip('PyQt5.QtCore')
+pytest.importorskip('matplotlib')
+
+from sales_timeline import aggregate, build_timeline, choose_bucket, lttb  # noqa: E402
+
+
+def daily(first: str, count: int, value=lambda i: 1.0):
+    start = date.fromisoformat(first)
+    return [((start + timedelta(days=i)).isoformat(), value(i)) for i in range(count)]
+
+
+def test_aggregate_by_week_and_month():
+    # 2024-01-01 - понедельник
+    rows = daily('2024-01-01', 40)
+    assert aggregate(rows, 'week') == (
+        ['2024-01-01', '2024-01-08', '2024-01-15', '2024-01-22', '2024-01-29', '2024-02-05'],
+        [7.0, 7.0, 7.0, 7.0, 7.0, 5.0],
+    )
+    assert aggregate(rows, 'month') == (['2024-01-01', '2024-02-01'], [31.0, 9.0])
+
+
+def test_aggregate_skips_gaps_and_nulls():
+    rows = [('2024-01-30', 2.0), ('2024-01-31', None), ('2024-03-15', 4.0)]
+    assert aggregate(rows, 'day') == (['2024-01-30', '2024-01-31', '2024-03-15'], [2.0, 0, 4.0])
+    assert aggregate(rows, 'month') == (['2024-01-01', '2024-03-01'], [2.0, 4.0])
+
+
+def test_choose_bucket():
+    assert choose_bucket('2024-01-01', '2024-12-31', max_buckets=366) == 'day'
+    assert choose_bucket('2024-01-01', '2024-12-31', max_buckets=100) == 'week'
+    assert choose_bucket('2015-01-01', '2024-12-31', max_buckets=100) == 'month'
+
+
+def test_lttb_returns_all_points_below_threshold():
+    assert lttb([0, 1, 2], [5, 6, 7], 10) == [0, 1, 2]
+    assert lttb([0, 1, 2, 3], [5, 6, 7, 8], 2) == [0, 1, 2, 3]
+
+
+def test_lttb_keeps_ends_and_extremes():
+    n = 1000
+    xs = list(range(n))
+    ys = [0.0] * n
+    ys[250], ys[700] = 100.0, -100.0
+    picked = lttb(xs, ys, 50)
+    assert len(picked) == 50
+    assert picked[0] == 0 and picked[-1] == n - 1
+    assert picked == sorted(set(picked))
+    assert 250 in picked and 700 in picked
+
+
+def test_build_timeline_thins_to_points():
+    rows = daily('2020-01-01', 900, value=lambda i: float(i % 30))
+    timeline = build_timeline(rows, points=100)
+    assert timeline.bucket == 'day'
+    assert len(timeline.days) == len(timeline.values) == 100
+    assert timeline.days[0] == '2020-01-01' and timeline.days[-1] == rows[-1][0]
+    assert build_timeline([]) == ('day', [], [])
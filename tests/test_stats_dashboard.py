@@ -0,0 +1,88 @@
+import gc
+import os
+import random
+from datetime import date, timedelta
+
+import pytest
+
+# Без дисплея: окно панели рисуется в памяти
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+pytest.importorskip('matplotlib')
+QtWidgets = pytest.importorskip('PyQt5.QtWidgets')
+
+import matplotlib.pyplot as plt  # noqa: E402 - только чтобы убедиться, что фигуры pyplot не создаются
+
+from stats_dashboard import BarPanel, PiePanel, SeriesPanel, StatsDashboard  # noqa: E402
+
+REFRESHES = 1000
+WARMUP = 50
+# Допустимый рост RSS за все обновления
+RSS_LIMIT = 5 * 2 ** 20
+
+
+def rss_bytes() -> int:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        # Не Linux: пиковое значение (в килобайтах на Linux, в байтах на macOS)
+        resource = pytest.importorskip('resource')
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def artist_count(figure) -> int:
+    return sum(len(ax.patches) + len(ax.lines) + len(ax.texts) for ax in figure.axes)
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def test_refreshes_reuse_artists(app):
+    # Панель как в приложениях: топ-5 столбцами, доли выручки и продажи по дням
+    dashboard = StatsDashboard(figsize=(12, 5))
+    bars = dashboard.add(BarPanel(dashboard.figure.add_subplot(1, 3, 1), 'Топ-5 книг', ylabel='Шт.'))
+    pie = dashboard.add(PiePanel(dashboard.figure.add_subplot(1, 3, 2), 5, 'Доля выручки'))
+    series = dashboard.add(SeriesPanel(dashboard.figure.add_subplot(1, 3, 3), 'Продажи по дням', dates=True))
+    dashboard.show()
+
+    rng = random.Random(0)
+    titles = [f'Книга {i}' for i in range(20)]
+    start = date(2020, 1, 1)
+    days = [(start + timedelta(days=i)).isoformat() for i in range(365)]
+    amounts = [rng.uniform(100, 1000) for _ in days]
+    top = titles[:5]
+
+    def step(i: int):
+        nonlocal top
+        # Изредка меняется состав топа (полная перерисовка), обычно - только значения (блиттинг)
+        if i % 50 == 0:
+            top = rng.sample(titles, 5)
+        counts = sorted((rng.randint(1, 100) for _ in top), reverse=True)
+        amounts[-1] += rng.uniform(0, 50)
+        bars.update(top, counts)
+        pie.update(top, counts)
+        series.update(days, amounts)
+        dashboard.set_caption(f'Продаж: {sum(counts)}')
+        dashboard.refresh()
+        app.processEvents()
+
+    try:
+        for i in range(WARMUP):
+            step(i)
+        gc.collect()
+        rss_before = rss_bytes()
+        artists_before = artist_count(dashboard.figure)
+        blits = dashboard.blits
+        for i in range(REFRESHES):
+            step(i)
+        gc.collect()
+
+        assert plt.get_fignums() == []
+        assert artist_count(dashboard.figure) == artists_before
+        assert rss_bytes() - rss_before <= RSS_LIMIT
+        # Большая часть обновлений обходится без полной перерисовки
+        assert dashboard.blits - blits > REFRESHES // 2
+    finally:
+        dashboard.close()
@@ -0,0 +1,107 @@
+import sqlite3
+import threading
+
+import pytest
+
+pytest.importorskip('PyQt5.QtCore')
+
+from write_queue import WriteQueue  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'sales.db')
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.executescript('''
+        CREATE TABLE books (id INTEGER PRIMARY KEY);
+        CREATE TABLE sales (
+            id INTEGER PRIMARY KEY,
+            book_id INTEGER REFERENCES books(id) DEFERRABLE INITIALLY DEFERRED
+        );
+        INSERT INTO books (id) VALUES (1);
+    ''')
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def write_queue(db_path):
+    write_queue = WriteQueue(db_path)
+    yield write_queue
+    write_queue.close()
+
+
+def sell(conn, book_id):
+    return conn.execute('INSERT INTO sales (book_id) VALUES (?)', (book_id,)).lastrowid
+
+
+def submit_group(write_queue, operations):
+    # Пока поток записи занят первой операцией, остальные копятся в очереди и уходят одной группой
+    started = threading.Event()
+    release = threading.Event()
+
+    def hold(conn):
+        started.set()
+        release.wait(5)
+
+    blocker = write_queue.submit(hold)
+    started.wait(5)
+    futures = [write_queue.submit(fn, *args) for fn, *args in operations]
+    release.set()
+    blocker.result(5)
+    return futures
+
+
+def count_sales(db_path) -> int:
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM sales').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_failed_operation_rolls_back_only_itself(db_path, write_queue):
+    def fail(conn):
+        sell(conn, 1)
+        raise ValueError('нет в наличии')
+
+    futures = submit_group(write_queue, [(sell, 1), (fail,), (sell, 1)])
+    assert futures[0].result(5) and futures[2].result(5)
+    with pytest.raises(ValueError):
+        futures[1].result(5)
+    assert count_sales(db_path) == 2
+
+
+def test_failed_commit_resolves_every_future(db_path, write_queue):
+    # Отложенный внешний ключ проверяется только при COMMIT: падает вся группа,
+    # и каждая операция, в том числе выполненная успешно, получает ошибку
+    write_queue.conn.execute('PRAGMA foreign_keys = ON')
+    futures = submit_group(write_queue, [(sell, 1), (sell, 404), (sell, 1)])
+    for future in futures:
+        with pytest.raises(sqlite3.IntegrityError):
+            future.result(5)
+    assert count_sales(db_path) == 0
+    assert not write_queue.conn.in_transaction
+    # Очередь продолжает работать после отката
+    assert write_queue.submit(sell, 1).result(5)
+    assert count_sales(db_path) == 1
+
+
+def test_failed_begin_resolves_every_future(db_path, write_queue):
+    # База занята другим писателем: BEGIN IMMEDIATE не получает блокировку,
+    # и ни одна операция группы не остаётся без ответа
+    write_queue.conn.execute('PRAGMA busy_timeout = 10')
+    other = sqlite3.connect(db_path)
+    try:
+        other.execute('BEGIN IMMEDIATE')
+        futures = [write_queue.submit(sell, 1) for _ in range(3)]
+        for future in futures:
+            with pytest.raises(sqlite3.OperationalError):
+                future.result(5)
+    finally:
+        other.rollback()
+        other.close()
+    assert write_queue.submit(sell, 1).result(5)
+    assert count_sales(db_path) == 1
@@ -0,0 +1,321 @@
+import argparse
+import os
+import sqlite3
+import threading
+from collections import deque
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+import fitz  # PyMuPDF
+from PyQt5.QtCore import QObject, QRunnable, Qt, QThreadPool, pyqtSignal
+from PyQt5.QtWidgets import QDialog, QListWidget, QListWidgetItem, QVBoxLayout
+
+from render_pool import shared_pool
+from repository import BUSY_TIMEOUT_MS, configure_connection
+from search_index import build_phrase_query, fts5_available
+
+# Текст страниц PDF для поиска по содержимому книг. Извлечение (page.get_text) идёт в процессах
+# пула рендера порциями страниц, а запись - в фоновом потоке через собственное соединение,
+# так что GUI-поток не ждёт ни PyMuPDF, ни SQLite.
+# book_text помнит, из какого файла извлечён текст книги: при смене PDF книга индексируется заново.
+
+PAGES_TABLE = 'book_pages'
+FTS_TABLE = 'book_pages_fts'
+PAGES_PER_TASK = 32
+# Сколько книг извлекается одновременно: процессы пула заняты, а в памяти не копится текст всего каталога
+BOOKS_IN_FLIGHT = 4
+SNIPPET_TOKENS = 12
+TEXT_SEARCH_LIMIT = 200
+
+SCHEMA = f'''
+    CREATE TABLE IF NOT EXISTS {PAGES_TABLE} (
+        id INTEGER PRIMARY KEY,
+        book_id INTEGER NOT NULL,
+        page INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        UNIQUE (book_id, page)
+    );
+    CREATE TABLE IF NOT EXISTS book_text (
+        book_id INTEGER PRIMARY KEY,
+        pdf_path TEXT NOT NULL,
+        pages INTEGER NOT NULL
+    );
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text, content='{PAGES_TABLE}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    );
+
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {PAGES_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, text) VALUES (new.id, new.text);
+    END;
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {PAGES_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS book_text_ad AFTER DELETE ON books BEGIN
+        DELETE FROM {PAGES_TABLE} WHERE book_id = old.id;
+        DELETE FROM book_text WHERE book_id = old.id;
+    END;
+    -- Текст прежнего PDF не должен находиться, пока новый ещё не проиндексирован
+    CREATE TRIGGER IF NOT EXISTS book_text_au AFTER UPDATE OF pdf_path ON books
+    WHEN old.pdf_path IS NOT new.pdf_path BEGIN
+        DELETE FROM {PAGES_TABLE} WHERE book_id = old.id;
+        DELETE FROM book_text WHERE book_id = old.id;
+    END;
+'''
+
+PENDING = '''
+    SELECT b.id, b.pdf_path
+    FROM books b
+    LEFT JOIN book_text t ON t.book_id = b.id
+    WHERE b.pdf_path IS NOT NULL AND b.pdf_path != ''
+      AND (t.book_id IS NULL OR t.pdf_path != b.pdf_path)
+    ORDER BY b.id
+'''
+
+
+class TextHit(NamedTuple):
+    book_id: int
+    title: str
+    author: str
+    pdf_path: str
+    page: int
+    snippet: str
+
+
+def has_text_index(conn: sqlite3.Connection) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+    ).fetchone()
+    return row is not None
+
+
+def init_text_index(conn: sqlite3.Connection) -> bool:
+    if not fts5_available(conn):
+        return False
+    conn.executescript(f'BEGIN; {SCHEMA}; COMMIT;')
+    return True
+
+
+def extract_text(pdf_path: str, first: int, last: int) -> List[Tuple[int, str]]:
+    # Выполняется в процессе пула рендера. Пробелы и переносы строк схлопываются:
+    # фрагменты результатов поиска показываются одной строкой
+    pages = []
+    with fitz.open(pdf_path) as doc:
+        for page_num in range(first, last):
+            text = ' '.join(doc.load_page(page_num).get_text('text').split())
+            if text:
+                pages.append((page_num, text))
+    return pages
+
+
+def search_text(conn: sqlite3.Connection, text: str, limit: int = TEXT_SEARCH_LIMIT,
+                marks: Tuple[str, str] = ('[', ']')) -> List[TextHit]:
+    match = build_phrase_query(text)
+    if match is None or not has_text_index(conn):
+        return []
+    rows = conn.execute(f'''
+        SELECT b.id, b.title, b.author, b.pdf_path, p.page,
+               snippet({FTS_TABLE}, 0, ?, ?, '…', ?)
+        FROM {FTS_TABLE} f
+        JOIN {PAGES_TABLE} p ON p.id = f.rowid
+        JOIN books b ON b.id = p.book_id
+        WHERE {FTS_TABLE} MATCH ?
+        ORDER BY f.rank
+        LIMIT ?
+    ''', (marks[0], marks[1], SNIPPET_TOKENS, match, limit)).fetchall()
+    return [TextHit(*row) for row in rows]
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    # Своё соединение на запись: транзакции индексатора короткие (одна книга),
+    # а писатель приложения при конфликте ждёт busy_timeout
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+    configure_connection(conn)
+    return conn
+
+
+def _submit(pool, pdf_path: str) -> list:
+    try:
+        with fitz.open(pdf_path) as doc:
+            count = doc.page_count
+    except Exception:
+        return []
+    return [pool.run(extract_text, pdf_path, first, min(first + PAGES_PER_TASK, count))
+            for first in range(0, count, PAGES_PER_TASK)]
+
+
+def _store(conn: sqlite3.Connection, pdf_path: str, book_ids: Sequence[int],
+           pages: List[Tuple[int, str]]) -> List[int]:
+    stored = []
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        for book_id in book_ids:
+            # PDF книги могли заменить, пока шло извлечение: такую книгу проиндексирует следующий проход
+            row = conn.execute('SELECT pdf_path FROM books WHERE id = ?', (book_id,)).fetchone()
+            if row is None or row[0] != pdf_path:
+                continue
+            conn.execute(f'DELETE FROM {PAGES_TABLE} WHERE book_id = ?', (book_id,))
+            conn.executemany(f'INSERT INTO {PAGES_TABLE} (book_id, page, text) VALUES (?, ?, ?)',
+                             ((book_id, page, text) for page, text in pages))
+            conn.execute('''
+                INSERT INTO book_text (book_id, pdf_path, pages) VALUES (?, ?, ?)
+                ON CONFLICT (book_id) DO UPDATE SET pdf_path = excluded.pdf_path, pages = excluded.pages
+            ''', (book_id, pdf_path, len(pages)))
+            stored.append(book_id)
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    return stored
+
+
+def _cancel(in_flight):
+    # Задания в очереди пула отменяются; уже запущенное дорабатывает свою порцию страниц
+    for _, _, futures in in_flight:
+        for future in futures:
+            future.cancel()
+
+
+def index_pending(db_path: str, pool=None, cancelled: Optional[Callable[[], bool]] = None,
+                  on_indexed: Optional[Callable[[int], None]] = None) -> int:
+    pool = pool or shared_pool()
+    conn = _connect(db_path)
+    try:
+        # Одинаковые PDF (общий файл хранилища) извлекаются один раз для всех книг
+        books = {}
+        for book_id, pdf_path in conn.execute(PENDING):
+            if os.path.exists(pdf_path):
+                books.setdefault(pdf_path, []).append(book_id)
+        queue = deque(books.items())
+        in_flight = deque()
+        indexed = 0
+        while queue or in_flight:
+            while queue and len(in_flight) < BOOKS_IN_FLIGHT:
+                pdf_path, book_ids = queue.popleft()
+                in_flight.append((pdf_path, book_ids, _submit(pool, pdf_path)))
+            pdf_path, book_ids, futures = in_flight[0]
+            pages = []
+            try:
+                for future in futures:
+                    # Отмена проверяется перед каждым ожиданием: stop() ждёт не дольше одной порции
+                    if cancelled is not None and cancelled():
+                        break
+                    pages.extend(future.result())
+            except Exception:
+                # Повреждённый PDF записывается без текста, чтобы не извлекать его при каждом запуске
+                pages = []
+            if cancelled is not None and cancelled():
+                # Недочитанные книги проиндексирует следующий запуск
+                _cancel(in_flight)
+                break
+            in_flight.popleft()
+            for book_id in _store(conn, pdf_path, book_ids, pages):
+                indexed += 1
+                if on_indexed is not None:
+                    on_indexed(book_id)
+        return indexed
+    finally:
+        conn.close()
+
+
+class _IndexSignals(QObject):
+    book_indexed = pyqtSignal(int)
+    failed = pyqtSignal(str)
+
+
+class _IndexTask(QRunnable):
+    def __init__(self, indexer):
+        super().__init__()
+        self.indexer = indexer
+
+    def run(self):
+        # Запросы, пришедшие во время прохода, обработает следующий проход
+        self.indexer.queued.clear()
+        try:
+            index_pending(self.indexer.db_path, cancelled=self.indexer.stopped.is_set,
+                          on_indexed=self.indexer.signals.book_indexed.emit)
+        except (sqlite3.Error, OSError) as e:
+            self.indexer.signals.failed.emit(str(e))
+
+
+class TextIndexer(QObject):
+    book_indexed = pyqtSignal(int)
+    failed = pyqtSignal(str)
+
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db_path = db.path
+        self.queued = threading.Event()
+        self.stopped = threading.Event()
+
+        self.signals = _IndexSignals(self)
+        self.signals.book_indexed.connect(self.book_indexed)
+        self.signals.failed.connect(self.failed)
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+
+    def schedule(self, *args):
+        # Вызывается при старте и после сохранения книги; лишние вызовы схлопываются в один проход
+        if self.stopped.is_set() or self.queued.is_set():
+            return
+        self.queued.set()
+        self.pool.start(_IndexTask(self))
+
+    def stop(self):
+        self.stopped.set()
+        self.pool.clear()
+        self.pool.waitForDone()
+
+
+class TextHitsDialog(QDialog):
+    hit_activated = pyqtSignal(object)
+
+    def __init__(self, hits: Sequence[TextHit], title: str, page_format: str, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.resize(700, 500)
+
+        layout = QVBoxLayout(self)
+        self.list = QListWidget()
+        self.list.setWordWrap(True)
+        for hit in hits:
+            page = page_format.format(page=hit.page + 1)
+            item = QListWidgetItem(f"{hit.title} — {hit.author}, {page}\n{hit.snippet}")
+            item.setData(Qt.UserRole, hit)
+            self.list.addItem(item)
+        self.list.itemActivated.connect(lambda item: self.hit_activated.emit(item.data(Qt.UserRole)))
+        layout.addWidget(self.list)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Индексация текста PDF книг и поиск по нему')
+    parser.add_argument('database', help='books.db | library.db | bookstore.db')
+    parser.add_argument('--search', help='фраза для поиска после индексации')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.database)
+    try:
+        if not init_text_index(conn):
+            print('SQLite собран без FTS5')
+            return
+    finally:
+        conn.close()
+
+    pool = shared_pool()
+    try:
+        print(f'Проиндексировано книг: {index_pending(os.path.abspath(args.database), pool)}')
+    finally:
+        pool.shutdown()
+
+    if args.search:
+        conn = sqlite3.connect(args.database)
+        try:
+            for hit in search_text(conn, args.search):
+                print(f'{hit.book_id}\t{hit.title}\tстр. {hit.page + 1}\t{hit.snippet}')
+        finally:
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
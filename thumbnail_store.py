@@ -0,0 +1,239 @@
+import argparse
+import os
+import sqlite3
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import fitz  # PyMuPDF
+from PyQt5.QtCore import QObject, QRunnable, QSize, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap
+
+from pdf_storage import file_sha256
+from render_pool import shared_pool
+
+# Обложки (первая страница PDF) хранятся на диске по SHA-256 содержимого файла:
+# одинаковые издания делят одну картинку, а изменённый PDF получает новую.
+# Индекс path -> (size, mtime, sha256) позволяет не хэшировать файл при каждом показе таблицы.
+
+THUMB_DIR = 'thumbnails'
+THUMB_WIDTH = 96
+# Размер обложки в таблице (логические пиксели); файл хранится вдвое крупнее для HiDPI
+COVER_SIZE = QSize(36, 48)
+COVER_CACHE = 512
+
+
+def thumbnail_path(root: str, digest: str) -> str:
+    return os.path.join(root, digest[:2], f'{digest}.png')
+
+
+def make_thumbnail(pdf_path: str, root: str = THUMB_DIR, width: int = THUMB_WIDTH) -> Tuple[int, int, str]:
+    # Выполняется в процессе пула рендера: и хэширование, и растеризация нагружают CPU
+    stat = os.stat(pdf_path)
+    digest = file_sha256(pdf_path)
+    target = thumbnail_path(root, digest)
+    if not os.path.exists(target):
+        with fitz.open(pdf_path) as doc:
+            page = doc.load_page(0)
+            zoom = width / page.rect.width
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Запись во временный файл и переименование: читатели не увидят недописанную картинку
+        temp = f'{target}.{os.getpid()}.tmp'
+        pix.save(temp, 'png')
+        os.replace(temp, target)
+    return stat.st_size, stat.st_mtime_ns, digest
+
+
+class ThumbnailStore:
+    def __init__(self, root: str = THUMB_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.index_path = os.path.join(root, 'index.db')
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    sha256 TEXT NOT NULL
+                )
+            ''')
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Своё соединение на каждый вызов: индекс читают фоновые потоки загрузки обложек
+        return sqlite3.connect(self.index_path, timeout=5, isolation_level=None)
+
+    def lookup(self, pdf_path: str) -> Optional[str]:
+        # Только кэш: если PDF изменился или обложки ещё нет, возвращается None
+        try:
+            stat = os.stat(pdf_path)
+        except OSError:
+            return None
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT size, mtime_ns, sha256 FROM files WHERE path = ?',
+                               (os.path.abspath(pdf_path),)).fetchone()
+        finally:
+            conn.close()
+        if row is None or (row[0], row[1]) != (stat.st_size, stat.st_mtime_ns):
+            return None
+        path = thumbnail_path(self.root, row[2])
+        return path if os.path.exists(path) else None
+
+    def record(self, pdf_path: str, size: int, mtime_ns: int, digest: str):
+        conn = self._connect()
+        try:
+            conn.execute('''
+                INSERT INTO files (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)
+                ON CONFLICT (path) DO UPDATE SET
+                    size = excluded.size, mtime_ns = excluded.mtime_ns, sha256 = excluded.sha256
+            ''', (os.path.abspath(pdf_path), size, mtime_ns, digest))
+        finally:
+            conn.close()
+
+    def generate(self, pdf_path: str):
+        # Future с (size, mtime_ns, sha256); вызывающий записывает результат через record()
+        return shared_pool().run(make_thumbnail, os.path.abspath(pdf_path), self.root, THUMB_WIDTH)
+
+
+class _CoverSignals(QObject):
+    loaded = pyqtSignal(int, QImage)
+    missing = pyqtSignal(int, str)
+
+
+class _CoverTask(QRunnable):
+    def __init__(self, db, store: ThumbnailStore, book_id: int, signals: _CoverSignals):
+        super().__init__()
+        self.db = db
+        self.store = store
+        self.book_id = book_id
+        self.signals = signals
+
+    def run(self):
+        with self.db.reader() as conn:
+            row = conn.execute('SELECT pdf_path FROM books WHERE id = ?', (self.book_id,)).fetchone()
+        pdf_path = row[0] if row and row[0] else ''
+        path = self.store.lookup(pdf_path) if pdf_path else None
+        image = QImage(path) if path else QImage()
+        if image.isNull():
+            self.signals.missing.emit(self.book_id, pdf_path)
+        else:
+            self.signals.loaded.emit(self.book_id, image)
+
+
+class CoverLoader(QObject):
+    cover_ready = pyqtSignal(int)
+    _generated = pyqtSignal(str, object)
+
+    def __init__(self, db, store: Optional[ThumbnailStore] = None, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.store = store or ThumbnailStore()
+        # id книги -> QPixmap или None (у книги нет PDF); ограничено COVER_CACHE записями
+        self.covers: 'OrderedDict[int, Optional[QPixmap]]' = OrderedDict()
+        self.pending = set()
+        # путь PDF -> книги, ждущие генерации обложки
+        self.generating = {}
+        self.priority = 0
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(2)
+        self.signals = _CoverSignals(self)
+        self.signals.loaded.connect(self.on_loaded)
+        self.signals.missing.connect(self.on_missing)
+        self._generated.connect(self.on_generated)
+
+    def cover(self, book_id: int) -> Optional[QPixmap]:
+        # Вызывается моделью таблицы только для видимых строк; загрузка идёт в фоне
+        if book_id in self.covers:
+            self.covers.move_to_end(book_id)
+            return self.covers[book_id]
+        if book_id not in self.pending:
+            self.pending.add(book_id)
+            # Более поздние запросы важнее: при быстрой прокрутке сначала грузятся строки на экране
+            self.priority += 1
+            self.pool.start(_CoverTask(self.db, self.store, book_id, self.signals), self.priority)
+        return None
+
+    def invalidate(self, book_id: int):
+        # Книгу сохранили (мог смениться PDF): обложка будет проверена и при необходимости создана заново
+        self.covers.pop(book_id, None)
+        self.cover(book_id)
+
+    def put(self, book_id: int, pixmap: Optional[QPixmap]):
+        self.covers[book_id] = pixmap
+        self.covers.move_to_end(book_id)
+        while len(self.covers) > COVER_CACHE:
+            self.covers.popitem(last=False)
+
+    def on_loaded(self, book_id: int, image: QImage):
+        self.pending.discard(book_id)
+        self.put(book_id, QPixmap.fromImage(image))
+        self.cover_ready.emit(book_id)
+
+    def on_missing(self, book_id: int, pdf_path: str):
+        if not pdf_path or not os.path.exists(pdf_path):
+            self.pending.discard(book_id)
+            self.put(book_id, None)
+            return
+        # Обложки нет в кэше (книга добавлена до появления кэша или PDF заменён): создаём её
+        waiting = self.generating.get(pdf_path)
+        if waiting is not None:
+            waiting.add(book_id)
+            return
+        self.generating[pdf_path] = {book_id}
+        future = self.store.generate(pdf_path)
+        future.add_done_callback(lambda done: self._generated.emit(pdf_path, done))
+
+    def on_generated(self, pdf_path: str, future):
+        waiting = self.generating.pop(pdf_path, set())
+        try:
+            self.store.record(pdf_path, *future.result())
+        except Exception:
+            # Повреждённый PDF: не пытаемся снова при каждой перерисовке
+            for book_id in waiting:
+                self.pending.discard(book_id)
+                self.put(book_id, None)
+            return
+        for book_id in waiting:
+            self.pending.discard(book_id)
+            self.cover(book_id)
+
+
+def main():
+    from repository import Database
+
+    parser = argparse.ArgumentParser(description='Создание недостающих обложек для всех книг базы')
+    parser.add_argument('database', help='books.db | library.db | bookstore.db')
+    parser.add_argument('--root', default=THUMB_DIR)
+    args = parser.parse_args()
+
+    store = ThumbnailStore(args.root)
+    db = Database(args.database)
+    try:
+        with db.reader() as conn:
+            paths = [row[0] for row in conn.execute(
+                "SELECT DISTINCT pdf_path FROM books WHERE pdf_path IS NOT NULL AND pdf_path != ''")]
+    finally:
+        db.close()
+
+    missing = [path for path in paths if os.path.exists(path) and store.lookup(path) is None]
+    pool = shared_pool()
+    futures = [(path, store.generate(path)) for path in missing]
+    failed = 0
+    for path, future in futures:
+        try:
+            store.record(path, *future.result())
+        except Exception as e:
+            failed += 1
+            print(f'{path}: {e}')
+    pool.shutdown()
+    print(f'Книг с PDF: {len(paths)}, создано обложек: {len(missing) - failed}, ошибок: {failed}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from repository import BUSY_TIMEOUT_MS, configure_connection
+
+# Единственный писатель продаж: операции из любых потоков ставятся в очередь, а поток записи
+# собирает их в группу и фиксирует одной транзакцией. fsync журнала (synchronous=FULL) один на группу,
+# а не на каждую продажу. Каждая операция выполняется в своей точке сохранения: ошибка одной
+# (например, нет в наличии) откатывает только её. Future операции завершается после COMMIT,
+# то есть когда продажа уже надёжно записана на диск.
+
+# Сколько поток записи может ждать следующих операций после первой в группе
+MAX_DELAY = 0.005
+MAX_BATCH = 512
+
+
+class WriteQueue:
+    def __init__(self, path: str, max_delay: float = MAX_DELAY, max_batch: int = MAX_BATCH):
+        self.path = path
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.queue: 'queue.Queue' = queue.Queue()
+        self.lock = threading.Lock()
+        self.closed = False
+        self.commits = 0
+        self.operations = 0
+        # Размер прошлой группы - оценка числа одновременно пишущих касс
+        self.last_batch = 1
+        # Соединение открывается до запуска потока, чтобы ошибка открытия базы была видна сразу
+        self.conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None,
+                                    check_same_thread=False)
+        configure_connection(self.conn)
+        self.conn.execute('PRAGMA synchronous = FULL')
+        self.thread = threading.Thread(target=self._run, name='write-queue', daemon=True)
+        self.thread.start()
+
+    def submit(self, fn: Callable, *args) -> Future:
+        # fn(conn, *args) выполняется в потоке записи внутри групповой транзакции
+        future = Future()
+        with self.lock:
+            if self.closed:
+                raise RuntimeError('очередь записи закрыта')
+            self.queue.put((future, fn, args))
+        return future
+
+    def close(self):
+        # Уже поставленные операции дописываются до остановки потока
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.queue.put(None)
+        self.thread.join()
+        self.conn.close()
+
+    def _collect(self, first) -> tuple:
+        # Группа закрывается по окну max_delay или раньше, когда набралось столько операций,
+        # сколько было в прошлой группе: если все кассы уже ждут ответа, ждать больше некого
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        stop = False
+        while len(batch) < self.max_batch:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                timeout = deadline - time.monotonic()
+                if len(batch) >= self.last_batch or timeout <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+            if item is None:
+                stop = True
+                break
+            batch.append(item)
+        self.last_batch = len(batch)
+        return batch, stop
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self.queue.get()
+            if item is None:
+                break
+            batch, stop = self._collect(item)
+            self._commit(batch)
+
+    def _commit(self, batch: list):
+        conn = self.conn
+        results = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for future, fn, args in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute('SAVEPOINT operation')
+                try:
+                    value = fn(conn, *args)
+                except Exception as e:
+                    conn.execute('ROLLBACK TO operation')
+                    conn.execute('RELEASE operation')
+                    results.append((future, False, e))
+                else:
+                    conn.execute('RELEASE operation')
+                    results.append((future, True, value))
+            conn.execute('COMMIT')
+        except Exception as e:
+            # Не зафиксировалась вся группа: ни одна операция не считается выполненной.
+            # Ошибка могла случиться и до них (BEGIN при занятой базе), и посреди группы,
+            # поэтому ответ получают все ещё не завершённые операции, а не только начатые
+            try:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+            finally:
+                for future, _, _ in batch:
+                    if future.done():
+                        continue
+                    if future.running() or future.set_running_or_notify_cancel():
+                        future.set_exception(e)
+            return
+        self.commits += 1
+        self.operations += len(results)
+        for future, ok, value in results:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+
+class MainThreadCallbacks(QObject):
+    # Future завершается в потоке записи; обработчик вызывается в потоке владельца объекта (GUI)
+    _done = pyqtSignal(object, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._done.connect(lambda callback, future: callback(future))
+
+    def watch(self, future: Future, callback: Callable[[Future], None]):
+        future.add_done_callback(lambda done: self._done.emit(callback, done))
+